@@ -0,0 +1,80 @@
+"""
+ADK model classes for the non-Gemini backends and the call policy. Kept apart
+from `backend.py` because importing ADK takes seconds: this module loads the
+first time a backend's `adk_model()` is called, i.e. when the research agent
+is built, not when the server starts.
+"""
+import asyncio
+from typing import Any, AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from utils.resilience import within_deadline
+
+
+class FakeLlm(BaseLlm):
+    """ADK model driven by a `FakeBackend`; streams the canned research JSON in chunks."""
+    model: str = "fake-llm"
+    backend: Any = None
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        prompt = _last_user_text(llm_request)
+        text = await self.backend.generate_async(prompt, kind="research", json_mode=True)
+        if stream:
+            # Like ADK's Gemini SSE path: partial chunks, then the aggregated turn
+            size = self.backend.RESEARCH_CHUNK_CHARS
+            for i in range(0, len(text), size):
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text[i:i + size])]),
+                                  partial=True)
+                await asyncio.sleep(0)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]),
+                          turn_complete=True)
+
+
+def _last_user_text(llm_request: LlmRequest) -> str:
+    for content in reversed(llm_request.contents or []):
+        if content.role == "user" and content.parts:
+            return "".join(part.text or "" for part in content.parts)
+    return ""
+
+
+class BoundedLlm(BaseLlm):
+    """
+    ADK model applying its BoundedBackend's policy: the circuit breaker, a
+    backend slot held for the whole streamed response, and the deadline and
+    call timeout applied to each response chunk.
+    """
+    inner: Any = None
+    backend: Any = None
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        backend = self.backend
+        probe = backend.check_circuit()
+        try:
+            ticket = await within_deadline(backend.limiter.acquire())
+        except BaseException:
+            if probe:
+                backend.breaker.release_probe()
+            raise
+        responses = self.inner.generate_content_async(llm_request, stream=stream)
+        try:
+            while True:
+                try:
+                    response = await within_deadline(responses.__anext__(), cap=backend.call_timeout)
+                except StopAsyncIteration:
+                    break
+                yield response
+        except Exception as e:
+            backend.record_failure(e)
+            raise
+        else:
+            backend.record_success()
+        finally:
+            # Cancelled, closed or out of request time: the probe recorded nothing, so the next call probes
+            if probe:
+                backend.breaker.release_probe()
+            ticket.release()
+            await responses.aclose()
@@ -1,41 +1,29 @@
-import google.generativeai as genai
-import os
 import json
 from dtos import AnalysisResult, SearchResult
 from typing import List
 import logging
+import time
+from agents.backend import LLMBackend, get_backend
+from agents.prompts import PromptBuilder, Template
+from tools.correspondence import get_correspondence
+from utils import metrics
 from utils.tracing import trace_span
 
 logger = logging.getLogger(__name__)
 
-class AnalyzerAgent:
-    def __init__(self):
-        self.api_key = os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file")
-        
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
-
-    @trace_span("AnalyzerAgent", "analyze_query")
-    def analyze_query(self, query: str, history: list[dict] = []) -> AnalysisResult:
-        """
-        Step 1: Analyze user query to determine intent and generate search queries.
-        """
-        history_text = "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in history[-5:]]) # Last 5 messages
-        
-        prompt = f"""<system_role>
+# Prompt templates, parsed once (see agents/prompts.py)
+QUERY_TEMPLATE = Template("""<system_role>
 You are an expert Legal Analyst for India (LegalAdviser-AI). Your goal is to understand the user's need and generate precise search queries to find the right information across various Indian Laws (IPC, CrPC, BNS, RTI, etc.).
 </system_role>
 
 <chat_history>
-{history_text}
+{history}
 </chat_history>
 
 <user_query>
 {query}
 </user_query>
-
+{mappings}
 <task>
 1. **Analyze Intent**: Determine if the user wants "info" (general queries), "legal_advice" (seeking solutions/judgments for a problem), or needs to "clarify" (vague query).
    - **"legal_advice"**: If the user describes a specific problem (e.g., "Police refused FIR", "Marks not given", "Cheque bounced") and seeks a solution or remedy.
@@ -66,40 +54,9 @@ Respond with valid JSON only:
     "priority_domains": ["indiankanoon.org", "devgan.in"],
     "reasoning": "..."
 }}
-</output_format>"""
-        
-        try:
-            response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
-            data = json.loads(response.text)
-            
-            # Print what the analyzer understood
-            print("\nANALYZER AGENT - analyze_query()")
-            print(f"User Query: {query}")
-            print(f"Intent Detected: {data.get('intent', 'info')}")
-            print(f"Search Queries Generated:")
-            for sq in data.get("search_queries", []):
-                print(f"  - {sq}")
-            print(f"Reasoning: {data.get('reasoning', '')}")
-            
-            return AnalysisResult(
-                intent=data.get("intent", "info"),
-                search_queries=data.get("search_queries", [query]),
-                priority_domains=data.get("priority_domains", ["indiankanoon.org", "devgan.in"]),
-                key_facts=[],
-                relevant_judgments=[],
-                reasoning=data.get("reasoning", "")
-            )
-        except Exception as e:
-            logger.error(f"Query analysis failed: {e}")
-            return AnalysisResult(intent="info", search_queries=[query], key_facts=[], relevant_judgments=[], reasoning="Error in analysis")
+</output_format>""")
 
-    @trace_span("AnalyzerAgent", "analyze_results")
-    def analyze_results(self, current_analysis: AnalysisResult, search_context: str, search_results: List[SearchResult]) -> AnalysisResult:
-        """
-        Step 2: Analyze search results to extract key facts and relevant judgments.
-        STRICT RULE: Do not assume or predict. Use ONLY the provided search_context.
-        """
-        prompt = f"""You are an expert Legal Analyst extracting information from search results.
+RESULTS_TEMPLATE = Template("""You are an expert Legal Analyst extracting information from search results.
 
 <search_context>
 {search_context}
@@ -131,20 +88,121 @@ Respond with ONLY valid JSON:
     "key_facts": ["fact 1", "fact 2", "fact 3"],
     "relevant_judgments_indices": [0, 2]
 }}
-</output_format>"""
-        
+</output_format>""")
+
+QUERY_PROMPT = PromptBuilder("analyze_query", "analyzer", default_tokens=2500)
+RESULTS_PROMPT = PromptBuilder("analyze_results", "analyzer", default_tokens=2500)
+
+class AnalyzerAgent:
+    def __init__(self, backend: LLMBackend = None):
+        # Gemini by default; LLM_BACKEND=fake swaps in canned responses for load testing
+        self.backend = backend or get_backend()
+
+    @trace_span("AnalyzerAgent", "analyze_query")
+    def analyze_query(self, query: str, history: list[dict] = []) -> AnalysisResult:
+        """
+        Step 1: Analyze user query to determine intent and generate search queries.
+        """
+        prompt = self._build_query_prompt(query, history)
+        start = time.perf_counter()
         try:
-            response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
-            data = json.loads(response.text)
-            
-            # Update the analysis object
-            current_analysis.key_facts = data.get("key_facts", [])
-            # For simplicity, we just pass all search results as relevant for now, 
-            # or we could filter based on the indices if the LLM was perfect.
-            # Let's just pass the top results that were actually fetched.
-            current_analysis.relevant_judgments = search_results 
+            text = self.backend.generate(prompt, kind="analyze_query", json_mode=True)
+            return self._parse_query_response(query, text)
+        except Exception as e:
+            logger.error(f"Query analysis failed: {e}")
+            metrics.ANALYZER_ERRORS.inc()
+            return self._fallback_analysis(query)
+        finally:
+            metrics.ANALYZER_LATENCY.since(start)
+
+    @trace_span("AnalyzerAgent", "analyze_query")
+    async def analyze_query_async(self, query: str, history: list[dict] = []) -> AnalysisResult:
+        """
+        Non-blocking variant of `analyze_query` for use from the event loop.
+        """
+        prompt = self._build_query_prompt(query, history)
+        start = time.perf_counter()
+        try:
+            text = await self.backend.generate_async(prompt, kind="analyze_query", json_mode=True)
+            return self._parse_query_response(query, text)
+        except Exception as e:
+            logger.error(f"Query analysis failed: {e}")
+            metrics.ANALYZER_ERRORS.inc()
+            return self._fallback_analysis(query)
+        finally:
+            metrics.ANALYZER_LATENCY.since(start)
+
+    def _build_query_prompt(self, query: str, history: list[dict]) -> str:
+        # Old/new code equivalents of the sections mentioned, so queries can cover both
+        table = get_correspondence()
+        mappings = table.describe(query) if table else None
+        mappings_block = f"\n<section_mappings>\n{mappings}\n</section_mappings>\n" if mappings else ""
+        
+        history_text = QUERY_PROMPT.history(history, fixed_chars=QUERY_TEMPLATE.static_chars + len(query) + len(mappings_block))
+        return QUERY_PROMPT.finish(QUERY_TEMPLATE.render(history=history_text, query=query, mappings=mappings_block))
+
+    def _parse_query_response(self, query: str, text: str) -> AnalysisResult:
+        data = json.loads(text)
             
+        # Print what the analyzer understood
+        print("\nANALYZER AGENT - analyze_query()")
+        print(f"User Query: {query}")
+        print(f"Intent Detected: {data.get('intent', 'info')}")
+        print(f"Search Queries Generated:")
+        for sq in data.get("search_queries", []):
+            print(f"  - {sq}")
+        print(f"Reasoning: {data.get('reasoning', '')}")
+        
+        return AnalysisResult(
+            intent=data.get("intent", "info"),
+            search_queries=data.get("search_queries", [query]),
+            priority_domains=data.get("priority_domains", ["indiankanoon.org", "devgan.in"]),
+            key_facts=[],
+            relevant_judgments=[],
+            reasoning=data.get("reasoning", "")
+        )
+
+    def _fallback_analysis(self, query: str) -> AnalysisResult:
+        return AnalysisResult(intent="info", search_queries=[query], key_facts=[], relevant_judgments=[], reasoning="Error in analysis")
+
+    @trace_span("AnalyzerAgent", "analyze_results")
+    def analyze_results(self, current_analysis: AnalysisResult, search_context: str, search_results: List[SearchResult]) -> AnalysisResult:
+        """
+        Step 2: Analyze search results to extract key facts and relevant judgments.
+        STRICT RULE: Do not assume or predict. Use ONLY the provided search_context.
+        """
+        prompt = self._build_results_prompt(search_context)
+        try:
+            text = self.backend.generate(prompt, kind="analyze_results", json_mode=True)
+            return self._apply_results_response(current_analysis, search_results, text)
+        except Exception as e:
+            logger.error(f"Result analysis failed: {e}")
             return current_analysis
+
+    @trace_span("AnalyzerAgent", "analyze_results")
+    async def analyze_results_async(self, current_analysis: AnalysisResult, search_context: str, search_results: List[SearchResult]) -> AnalysisResult:
+        """
+        Non-blocking variant of `analyze_results` for use from the event loop.
+        """
+        prompt = self._build_results_prompt(search_context)
+        try:
+            text = await self.backend.generate_async(prompt, kind="analyze_results", json_mode=True)
+            return self._apply_results_response(current_analysis, search_results, text)
         except Exception as e:
             logger.error(f"Result analysis failed: {e}")
             return current_analysis
+
+    def _build_results_prompt(self, search_context: str) -> str:
+        return RESULTS_PROMPT.finish(RESULTS_TEMPLATE.render(search_context=search_context))
+
+    def _apply_results_response(self, current_analysis: AnalysisResult, search_results: List[SearchResult], text: str) -> AnalysisResult:
+        data = json.loads(text)
+        
+        # Update the analysis object
+        current_analysis.key_facts = data.get("key_facts", [])
+        # For simplicity, we just pass all search results as relevant for now, 
+        # or we could filter based on the indices if the LLM was perfect.
+        # Let's just pass the top results that were actually fetched.
+        current_analysis.relevant_judgments = search_results 
+        
+        return current_analysis
@@ -0,0 +1,380 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+import zlib
+from typing import TYPE_CHECKING, Dict, Optional
+
+from utils import metrics
+from utils.admission import ConcurrencyLimiter
+from utils.resilience import CallTimeout, CircuitBreaker, CircuitOpen, DeadlineExceeded, LatencyTracker, hedged, within_deadline
+
+if TYPE_CHECKING:  # The Google SDKs take seconds to import; they load on first use
+    from google.adk.models.base_llm import BaseLlm
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-2.5-flash"
+
+
+class LLMBackend:
+    """
+    What the agents need from a model provider. `kind` names the call site
+    ("analyze_query", "analyze_results", "summarize", "research") so backends that
+    do not call a real model can answer in the format that call site expects.
+    """
+    name = "base"
+
+    def generate(self, prompt: str, kind: str, json_mode: bool = False) -> str:
+        raise NotImplementedError
+
+    async def generate_async(self, prompt: str, kind: str, json_mode: bool = False) -> str:
+        raise NotImplementedError
+
+    def adk_model(self) -> "BaseLlm":
+        """The model handed to the ADK research agent."""
+        raise NotImplementedError
+
+    def adk_tools(self) -> list:
+        """Tools for the ADK research agent (built-in tools only work on Gemini models)."""
+        return []
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through `google.generativeai`, and ADK's `Gemini` model for the researcher."""
+    name = "gemini"
+
+    def __init__(self, model_name: str = MODEL_NAME):
+        self.api_key = os.getenv("GOOGLE_API_KEY")
+        if not self.api_key:
+            raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file")
+
+        import google.generativeai as genai
+
+        genai.configure(api_key=self.api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def _config(self, json_mode: bool) -> Optional[dict]:
+        return {"response_mime_type": "application/json"} if json_mode else None
+
+    def generate(self, prompt: str, kind: str, json_mode: bool = False) -> str:
+        return self.model.generate_content(prompt, generation_config=self._config(json_mode)).text
+
+    async def generate_async(self, prompt: str, kind: str, json_mode: bool = False) -> str:
+        response = await self.model.generate_content_async(prompt, generation_config=self._config(json_mode))
+        return response.text
+
+    def adk_model(self) -> "BaseLlm":
+        from google.adk.models.google_llm import Gemini
+        return Gemini(model=self.model_name)
+
+    def adk_tools(self) -> list:
+        from google.adk.tools import google_search
+        return [google_search]
+
+
+class FakeBackendError(RuntimeError):
+    """Injected failure of the fake backend."""
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic stand-in for load testing: no network, canned answers in each
+    call site's `<output_format>`, after a log-normally distributed latency.
+
+    - `latency_ms` is the median latency; `latency_sigma` the log-normal shape
+      (0 gives a fixed latency).
+    - `slow_rate` of the calls take `slow_factor` times longer, for a heavy
+      tail like an upstream's occasional stuck request.
+    - `error_rate` is the fraction of calls that raise `FakeBackendError`.
+    - The analyzer intent is derived from a CRC of the prompt, so the same
+      query always gets the same intent (about 45% info, 45% legal_advice, 10% clarify),
+      unless `intent` pins it.
+    """
+    name = "fake"
+    RESEARCH_CHUNK_CHARS = 48
+
+    def __init__(self, latency_ms: float = 200, latency_sigma: float = 0.3, error_rate: float = 0.0,
+                 seed: Optional[int] = None, intent: Optional[str] = None, slow_rate: float = 0.0,
+                 slow_factor: float = 20.0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.error_rate = error_rate
+        self.intent = intent
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeBackend":
+        seed = os.getenv("FAKE_LLM_SEED")
+        return cls(
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "200")),
+            latency_sigma=float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.3")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            seed=int(seed) if seed is not None else None,
+            intent=os.getenv("FAKE_LLM_INTENT") or None,
+            slow_rate=float(os.getenv("FAKE_LLM_SLOW_RATE", "0")),
+            slow_factor=float(os.getenv("FAKE_LLM_SLOW_FACTOR", "20")),
+        )
+
+    def sample_latency(self) -> float:
+        """Seconds to wait before answering."""
+        if self.latency_ms <= 0:
+            return 0.0
+        latency = self.latency_ms / 1000
+        if self.latency_sigma > 0:
+            latency *= math.exp(self._rng.gauss(0, self.latency_sigma))
+        if self.slow_rate and self._rng.random() < self.slow_rate:
+            latency *= self.slow_factor
+        return latency
+
+    def _maybe_fail(self, kind: str):
+        self.calls += 1
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.errors += 1
+            raise FakeBackendError(f"Injected fake backend failure ({kind})")
+
+    def generate(self, prompt: str, kind: str, json_mode: bool = False) -> str:
+        time.sleep(self.sample_latency())
+        self._maybe_fail(kind)
+        return self.respond(prompt, kind)
+
+    async def generate_async(self, prompt: str, kind: str, json_mode: bool = False) -> str:
+        await asyncio.sleep(self.sample_latency())
+        self._maybe_fail(kind)
+        return self.respond(prompt, kind)
+
+    def respond(self, prompt: str, kind: str) -> str:
+        """The canned answer for a call site."""
+        digest = zlib.crc32(prompt.encode("utf-8"))
+        if kind == "analyze_query":
+            bucket = digest % 20
+            intent = self.intent or ("clarify" if bucket < 2 else "legal_advice" if bucket < 11 else "info")
+            return json.dumps({
+                "intent": intent,
+                "search_queries": [
+                    "site:indiankanoon.org cheating section 420 judgment",
+                    "site:devgan.in ipc section 420",
+                    "cheating punishment india legal rules",
+                ],
+                "priority_domains": ["indiankanoon.org", "devgan.in"],
+                "reasoning": "Fake backend response",
+            })
+        if kind == "analyze_results":
+            return json.dumps({
+                "key_facts": ["Section 420 IPC covers cheating and dishonestly inducing delivery of property.",
+                              "It is punishable with up to 7 years' imprisonment and a fine."],
+                "relevant_judgments_indices": [0],
+            })
+        if kind == "research":
+            return json.dumps({
+                "key_facts": ["Section 420 IPC (Section 318 BNS) covers cheating.",
+                              "The offence is cognizable and non-bailable."],
+                "summary": ("**Short answer:** cheating is punishable under Section 420 IPC "
+                            "(now Section 318(4) BNS).\n\n"
+                            "- File a complaint at the police station with your evidence.\n"
+                            "- If the police refuse, approach the Magistrate under Section 156(3) CrPC.\n"
+                            "- Keep copies of all payments and messages.\n\n"
+                            f"_Fake backend reference #{digest % 10000}_"),
+                "relevant_judgments": [
+                    {"title": "Hridaya Ranjan Prasad Verma v. State of Bihar (2000)",
+                     "url": "https://indiankanoon.org/doc/1447196/",
+                     "snippet": "Intention to deceive must exist at the time of the promise.",
+                     "source": "Indian Kanoon"},
+                ],
+            })
+        return ("Could you share a few more details, such as **when** this happened and "
+                "**which state** you are in? That will help me point you to the right law.")
+
+    def adk_model(self) -> "BaseLlm":
+        from agents.adk_models import FakeLlm
+        return FakeLlm(backend=self)
+
+
+# Idempotent call sites that may be hedged (research runs tools and is never duplicated)
+HEDGED_KINDS = frozenset({"analyze_query", "analyze_results", "summarize"})
+
+
+class BoundedBackend(LLMBackend):
+    """
+    Call policy in front of another backend, for async calls including the ADK
+    research model's:
+
+    - at most `max_concurrent` calls in flight; the rest wait in FIFO order
+      rather than piling onto the provider's rate limit
+    - each call ends by the request deadline (`utils.resilience`), and after
+      `call_timeout` seconds at most
+    - a circuit breaker fails calls fast (`CircuitOpen`) while the error rate is high
+    - optional hedging of idempotent calls (`HEDGED_KINDS`): a second attempt
+      starts once the first has run longer than the recent p95 latency
+
+    Other attributes pass through to the inner backend.
+    """
+    def __init__(self, inner: LLMBackend, max_concurrent: int, call_timeout: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None, hedge_quantile: Optional[float] = None,
+                 hedge_min_delay: float = 0.1):
+        self.inner = inner
+        self.name = inner.name
+        self.limiter = ConcurrencyLimiter(
+            max_concurrent if max_concurrent > 0 else math.inf, name=f"{inner.name} backend",
+            queue_gauge=metrics.LLM_QUEUE_DEPTH.labels(inner.name),
+            active_gauge=metrics.LLM_ACTIVE.labels(inner.name),
+            wait_histogram=metrics.LLM_SLOT_WAIT.labels(inner.name),
+        )
+        self.call_timeout = call_timeout
+        self.breaker = breaker
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._hedges = metrics.LLM_HEDGES.labels(inner.name)
+        self._short_circuited = metrics.LLM_SHORT_CIRCUITED.labels(inner.name)
+        if breaker is not None:
+            metrics.LLM_CIRCUIT_STATE.labels(inner.name).set_function(lambda: breaker.state)
+
+    @classmethod
+    def from_env(cls, inner: LLMBackend) -> "BoundedBackend":
+        breaker = None
+        if os.getenv("LLM_CIRCUIT_ENABLED", "true").lower() == "true":
+            breaker = CircuitBreaker(
+                error_rate=float(os.getenv("LLM_CIRCUIT_ERROR_RATE", "0.5")),
+                min_calls=int(os.getenv("LLM_CIRCUIT_MIN_CALLS", "20")),
+                window=float(os.getenv("LLM_CIRCUIT_WINDOW_SECONDS", "30")),
+                cooldown=float(os.getenv("LLM_CIRCUIT_COOLDOWN_SECONDS", "10")),
+            )
+        call_timeout = float(os.getenv("LLM_CALL_TIMEOUT_MS", "60000")) / 1000
+        hedging = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+        return cls(
+            inner,
+            max_concurrent=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+            call_timeout=call_timeout if call_timeout > 0 else None,
+            breaker=breaker,
+            hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")) if hedging else None,
+            hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "100")) / 1000,
+        )
+
+    def __getattr__(self, name: str):
+        return getattr(self.inner, name)
+
+    def generate(self, prompt: str, kind: str, json_mode: bool = False) -> str:
+        # Blocking calls run on worker threads and are not counted
+        return self.inner.generate(prompt, kind, json_mode)
+
+    async def generate_async(self, prompt: str, kind: str, json_mode: bool = False) -> str:
+        probe = self.check_circuit()
+        try:
+            delay = self._hedge_delay(kind)
+            if delay is None:
+                return await self._attempt(prompt, kind, json_mode)
+            return await hedged(lambda: self._attempt(prompt, kind, json_mode), delay, on_hedge=self._hedges.inc)
+        finally:
+            # Cancelled or out of request time: the probe recorded nothing, so the next call probes
+            if probe:
+                self.breaker.release_probe()
+
+    async def _attempt(self, prompt: str, kind: str, json_mode: bool) -> str:
+        # Waiting for a slot counts against the deadline but not against the upstream's health
+        ticket = await within_deadline(self.limiter.acquire())
+        try:
+            start = time.perf_counter()
+            text = await within_deadline(self.inner.generate_async(prompt, kind, json_mode), cap=self.call_timeout)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        finally:
+            ticket.release()
+        self.record_success()
+        self._latency.setdefault(kind, LatencyTracker()).observe(time.perf_counter() - start)
+        return text
+
+    def _hedge_delay(self, kind: str) -> Optional[float]:
+        """Seconds before hedging this call, or None to run it once."""
+        if self.hedge_quantile is None or kind not in HEDGED_KINDS:
+            return None
+        # Extra attempts would only deepen a queue or hit a failing upstream
+        if self.limiter.queue_depth or (self.breaker is not None and self.breaker.state != CircuitBreaker.CLOSED):
+            return None
+        tracker = self._latency.get(kind)
+        quantile = tracker.quantile(self.hedge_quantile) if tracker else None
+        return None if quantile is None else max(quantile, self.hedge_min_delay)
+
+    def check_circuit(self) -> bool:
+        """Raises CircuitOpen while the circuit is open; True when this call is the half-open probe."""
+        if self.breaker is None:
+            return False
+        try:
+            return self.breaker.check()
+        except CircuitOpen:
+            self._short_circuited.inc()
+            raise
+
+    def record_success(self):
+        if self.breaker is not None:
+            self.breaker.record(True)
+
+    def record_failure(self, error: Exception):
+        if isinstance(error, DeadlineExceeded):
+            metrics.DEADLINE_ERRORS.inc()
+            if not isinstance(error, CallTimeout):
+                # The request ran out of time (its deadline may come from the client): not the upstream's fault
+                return
+        if self.breaker is not None:
+            self.breaker.record(False)
+
+    def stats(self) -> dict:
+        stats = {f"slots_{k}": v for k, v in self.limiter.stats().items()}
+        if self.breaker is not None:
+            stats.update({f"circuit_{k}": v for k, v in self.breaker.stats().items()})
+        for kind, tracker in self._latency.items():
+            p95 = tracker.quantile(0.95)
+            if p95 is not None:
+                stats[f"p95_ms_{kind}"] = round(p95 * 1000, 1)
+        return stats
+
+    def adk_model(self) -> "BaseLlm":
+        from agents.adk_models import BoundedLlm
+        inner = self.inner.adk_model()
+        return BoundedLlm(model=inner.model, inner=inner, backend=self)
+
+    def adk_tools(self) -> list:
+        return self.inner.adk_tools()
+
+
+_backend: Optional[LLMBackend] = None
+
+
+def create_backend(kind: str) -> LLMBackend:
+    """Builds a backend by name: "gemini", "fake" or "cassette" (record/replay, see `agents/cassette.py`)."""
+    kind = kind.lower()
+    if kind == "gemini":
+        return GeminiBackend()
+    if kind == "fake":
+        logger.warning("Using the fake LLM backend: responses are canned")
+        return FakeBackend.from_env()
+    if kind == "cassette":
+        from agents.cassette import CassetteBackend
+        return CassetteBackend.from_env()
+    raise ValueError(f"Unknown LLM_BACKEND: {kind}")
+
+
+def get_backend() -> LLMBackend:
+    """
+    The process-wide backend selected by `LLM_BACKEND` ("gemini" by default), shared by all agents,
+    behind the `BoundedBackend` call policy (concurrency cap, deadlines, circuit breaker, hedging).
+    """
+    global _backend
+    if _backend is None:
+        _backend = BoundedBackend.from_env(create_backend(os.getenv("LLM_BACKEND", "gemini")))
+    return _backend
+
+
+def set_backend(backend: Optional[LLMBackend]):
+    """Overrides the shared backend (benchmarks, scripts); `None` re-reads `LLM_BACKEND` on next use."""
+    global _backend
+    _backend = backend
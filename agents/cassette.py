@@ -0,0 +1,264 @@
+import asyncio
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from collections import defaultdict, deque
+from typing import Any, AsyncGenerator, Deque, Dict, List, Optional, Tuple
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from agents.adk_models import _last_user_text
+from agents.backend import LLMBackend
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recording for a request (strict mode)."""
+
+
+class ReplayedError(RuntimeError):
+    """A model error that was recorded and is being replayed."""
+
+
+def _key(kind: str, prompt: str) -> str:
+    return hashlib.sha1(f"{kind}\0{prompt}".encode("utf-8")).hexdigest()[:16]
+
+
+def _open(path: str, mode: str, compressed: Optional[bool] = None):
+    if path.endswith(".gz") if compressed is None else compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Cassette:
+    """
+    On-disk recording of model traffic: one compact JSON object per line (gzip
+    when the file name ends in `.gz`). Text calls store the latency and text;
+    research calls store every `LlmResponse` of the ADK model stream with the
+    delay before it, so replay reproduces long streams chunk by chunk.
+
+    Lookups match on (kind, prompt). Repeated prompts are served round-robin;
+    prompts that were never recorded fall back to the next recording of the same
+    kind, unless `strict` is set.
+
+    A record cut off by a crash (a torn last line, or a gzip stream without its
+    end marker) is skipped on load, and cut away before recording resumes.
+    """
+    def __init__(self, path: str, strict: bool = False):
+        self.path = path
+        self.strict = strict
+        self._by_key: Dict[str, Deque[dict]] = defaultdict(deque)
+        self._by_kind: Dict[str, Deque[dict]] = defaultdict(deque)
+        self._writer = None
+        self.hits = 0
+        self.fallbacks = 0
+
+    def load(self) -> int:
+        records, torn = self._read()
+        if torn:
+            logger.warning(f"Skipping the torn tail of cassette {self.path} after {len(records)} recordings")
+        for record in records:
+            self._by_key[record["key"]].append(record)
+            self._by_kind[record["kind"]].append(record)
+        logger.info(f"Loaded {len(records)} recordings from cassette {self.path}")
+        return len(records)
+
+    def _read(self) -> Tuple[List[dict], bool]:
+        """The complete records on disk, and whether a torn or corrupt one ended the file."""
+        records = []
+        try:
+            with _open(self.path, "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    if not line.endswith("\n"):
+                        return records, True
+                    records.append(json.loads(line))
+        except (EOFError, gzip.BadGzipFile, zlib.error, ValueError):
+            # Gzip stream cut off mid-member, or a line that is not JSON
+            return records, True
+        return records, False
+
+    def _repair(self):
+        """Rewrites the cassette without its torn tail, so appended records stay readable."""
+        records, torn = self._read()
+        if not torn:
+            return
+        logger.warning(f"Truncating the torn tail of cassette {self.path} after {len(records)} recordings")
+        tmp_file = f"{self.path}.tmp"
+        with _open(tmp_file, "w", compressed=self.path.endswith(".gz")) as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(tmp_file, self.path)
+
+    def lookup(self, kind: str, prompt: str) -> dict:
+        queue = self._by_key.get(_key(kind, prompt))
+        if queue:
+            self.hits += 1
+        else:
+            queue = self._by_kind.get(kind)
+            if self.strict or not queue:
+                raise CassetteMiss(f"No {kind} recording for prompt of {len(prompt)} chars in {self.path}")
+            self.fallbacks += 1
+        record = queue[0]
+        queue.rotate(-1)
+        return record
+
+    def write(self, record: dict):
+        if self._writer is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            if os.path.exists(self.path):
+                self._repair()
+            self._writer = _open(self.path, "a")
+            atexit.register(self.close)
+        self._writer.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._writer.flush()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class CassetteBackend(LLMBackend):
+    """
+    Record/replay wrapper around another backend.
+
+    - `record`: calls go to `inner`; every request/response (including errors and
+      the ADK model stream of research calls) is appended to the cassette.
+    - `replay`: no network. Responses come from the cassette after the recorded
+      latency multiplied by `time_scale` (0 replays instantly).
+    """
+    name = "cassette"
+
+    def __init__(self, cassette: Cassette, mode: str = "replay", inner: Optional[LLMBackend] = None,
+                 time_scale: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("Recording needs an inner backend")
+        self.cassette = cassette
+        self.mode = mode
+        self.inner = inner
+        self.time_scale = time_scale
+        if mode == "replay":
+            cassette.load()
+
+    @classmethod
+    def from_env(cls) -> "CassetteBackend":
+        from agents.backend import create_backend
+
+        mode = os.getenv("CASSETTE_MODE", "replay").lower()
+        cassette = Cassette(
+            os.getenv("CASSETTE_FILE", "cassettes/traffic.jsonl.gz"),
+            strict=os.getenv("CASSETTE_STRICT", "false").lower() == "true",
+        )
+        inner = create_backend(os.getenv("CASSETTE_RECORD_BACKEND", "gemini")) if mode == "record" else None
+        return cls(cassette, mode=mode, inner=inner, time_scale=float(os.getenv("CASSETTE_TIME_SCALE", "1.0")))
+
+    def _record(self, kind: str, prompt: str, latency: float, text: str = None, error: Exception = None):
+        record = {"kind": kind, "key": _key(kind, prompt), "prompt_chars": len(prompt), "latency": round(latency, 4)}
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        else:
+            record["text"] = text
+        self.cassette.write(record)
+
+    def _replay(self, record: dict) -> str:
+        if "error" in record:
+            raise ReplayedError(record["error"])
+        return record["text"]
+
+    def generate(self, prompt: str, kind: str, json_mode: bool = False) -> str:
+        if self.mode == "replay":
+            record = self.cassette.lookup(kind, prompt)
+            time.sleep(record["latency"] * self.time_scale)
+            return self._replay(record)
+        start = time.perf_counter()
+        try:
+            text = self.inner.generate(prompt, kind, json_mode)
+        except Exception as e:
+            self._record(kind, prompt, time.perf_counter() - start, error=e)
+            raise
+        self._record(kind, prompt, time.perf_counter() - start, text=text)
+        return text
+
+    async def generate_async(self, prompt: str, kind: str, json_mode: bool = False) -> str:
+        if self.mode == "replay":
+            record = self.cassette.lookup(kind, prompt)
+            await asyncio.sleep(record["latency"] * self.time_scale)
+            return self._replay(record)
+        start = time.perf_counter()
+        try:
+            text = await self.inner.generate_async(prompt, kind, json_mode)
+        except Exception as e:
+            self._record(kind, prompt, time.perf_counter() - start, error=e)
+            raise
+        self._record(kind, prompt, time.perf_counter() - start, text=text)
+        return text
+
+    def adk_model(self) -> BaseLlm:
+        if self.mode == "record":
+            inner = self.inner.adk_model()
+            # Keep the inner model name so Gemini-only built-in tools still accept it
+            return CassetteLlm(model=inner.model, backend=self, inner=inner)
+        return CassetteLlm(model="cassette-replay", backend=self)
+
+    def adk_tools(self) -> list:
+        return self.inner.adk_tools() if self.mode == "record" else []
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "hits": self.cassette.hits, "fallbacks": self.cassette.fallbacks}
+
+
+class CassetteLlm(BaseLlm):
+    """ADK model that records the inner model's response stream, or replays a recorded one."""
+    backend: Any = None
+    inner: Any = None
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        prompt = _last_user_text(llm_request)
+        cassette = self.backend.cassette
+        if self.inner is None:
+            record = cassette.lookup("research", prompt)
+            # Sleep against the recorded timeline rather than per chunk, so timer
+            # overshoot on many tiny gaps does not accumulate
+            start = time.perf_counter()
+            due = 0.0
+            for delay, response in record["stream"]:
+                due += delay * self.backend.time_scale
+                wait = due - (time.perf_counter() - start)
+                await asyncio.sleep(wait if wait > 0.001 else 0)
+                yield LlmResponse.model_validate(response)
+            if "error" in record:
+                raise ReplayedError(record["error"])
+            return
+
+        stream_log: List[list] = []
+        record = {"kind": "research", "key": _key("research", prompt), "prompt_chars": len(prompt), "stream": stream_log}
+        last = time.perf_counter()
+        completed = False
+        try:
+            async for response in self.inner.generate_content_async(llm_request, stream=stream):
+                now = time.perf_counter()
+                stream_log.append([round(now - last, 4), response.model_dump(mode="json", exclude_none=True)])
+                last = now
+                yield response
+            completed = True
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            completed = True
+            raise
+        finally:
+            # Streams cut short by the consumer (e.g. cancelled speculation) are not replayable
+            if completed:
+                record["latency"] = round(sum(delay for delay, _ in stream_log), 4)
+                cassette.write(record)
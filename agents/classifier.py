@@ -0,0 +1,140 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from dtos import AnalysisResult
+
+INTENTS = ("info", "legal_advice", "clarify")
+DEFAULT_EXAMPLES = os.path.join(os.path.dirname(__file__), "data", "intent_examples.jsonl")
+
+CLARIFY_MAX_TOKENS = 6
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an the is are was were be to of in on for and or my me i it this that what how can do does "
+    "should under with by from about please tell".split()
+)
+
+# (pattern, intent, confidence). Checked in order; the first match wins.
+_RULES: List[Tuple[re.Pattern, str, float]] = [
+    (re.compile(r"\b(refus\w*|not (register\w*|paying|paid|returning|given|answered)|harass\w*|cheat\w*|"
+                r"bounced|threat\w*|beat(en)?|blackmail\w*|stolen|bribe|evict\w*|arrested|fired|"
+                r"dowry|custody|rejected)\b"), "legal_advice", 0.95),
+    (re.compile(r"\bwhat (should|can) i do\b.{8,}|.{8,}\bwhat (should|can) i do\b"), "legal_advice", 0.9),
+    (re.compile(r"^(what is|what's|explain|define|meaning of)\b.*\b(section|sec|article|order|rule)\s*\d+"), "info", 0.97),
+    (re.compile(r"^(section|sec|s)\s*\d+[a-z]?\b"), "info", 0.95),
+    (re.compile(r"^(my|i was|i got|i received|someone|somebody)\b(\s+\w+){4,}"), "legal_advice", 0.88),
+    (re.compile(r"\b(rti|right to information)\b.*\b(fee|fees|format|time limit|how to file|first appeal)\b"), "info", 0.92),
+]
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _features(tokens: List[str]) -> List[str]:
+    """Unigrams plus bigrams."""
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class IntentClassifier:
+    """
+    Fast local pre-classifier for the analyzer's three intents.
+
+    Keyword/regex rules catch the common unambiguous phrasings; everything else
+    goes through a multinomial naive Bayes model (linear in log space) over
+    token unigrams and bigrams, trained at start-up from a small labelled file.
+    `classify` returns the intent and a confidence; callers fall back to the LLM
+    analyzer when the confidence is below `threshold`.
+    """
+    def __init__(self, examples_file: str = DEFAULT_EXAMPLES, threshold: float = 0.85, alpha: float = 0.5):
+        self.threshold = threshold
+        self._alpha = alpha
+        self._log_prior: Dict[str, float] = {}
+        self._log_likelihood: Dict[str, Dict[str, float]] = {}
+        self._log_unseen: Dict[str, float] = {}
+        self._train(self._load_examples(examples_file))
+
+    @classmethod
+    def from_env(cls) -> Optional["IntentClassifier"]:
+        if os.getenv("INTENT_CLASSIFIER_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            examples_file=os.getenv("INTENT_CLASSIFIER_EXAMPLES", DEFAULT_EXAMPLES),
+            threshold=float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", "0.85")),
+        )
+
+    @staticmethod
+    def _load_examples(path: str) -> List[Tuple[str, str]]:
+        examples = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    examples.append((row["query"], row["intent"]))
+        return examples
+
+    def _train(self, examples: List[Tuple[str, str]]):
+        counts: Dict[str, Counter] = defaultdict(Counter)
+        docs = Counter()
+        for query, intent in examples:
+            docs[intent] += 1
+            counts[intent].update(_features(tokenize(query)))
+        vocab = set()
+        for c in counts.values():
+            vocab.update(c)
+        total_docs = sum(docs.values())
+        for intent in INTENTS:
+            total = sum(counts[intent].values()) + self._alpha * len(vocab)
+            self._log_prior[intent] = math.log((docs[intent] + 1) / (total_docs + len(INTENTS)))
+            self._log_likelihood[intent] = {
+                feature: math.log((n + self._alpha) / total) for feature, n in counts[intent].items()
+            }
+            self._log_unseen[intent] = math.log(self._alpha / total)
+
+    def classify(self, query: str, history: list[dict] = []) -> Tuple[str, float]:
+        tokens = tokenize(query)
+        # The tokenizer only reads Latin letters and digits: a query mostly in another
+        # script (Hindi, Tamil, ...) is not understood here, so leave it to the LLM analyzer
+        if sum(len(t) for t in tokens) * 2 < sum(ch.isalnum() for ch in query):
+            return "clarify", 0.0
+        text = " ".join(tokens)
+        for pattern, intent, confidence in _RULES:
+            if pattern.search(text):
+                return intent, confidence
+
+        if not tokens:
+            return "clarify", 0.0
+        features = _features(tokens)
+        scores = {}
+        for intent in INTENTS:
+            likelihood = self._log_likelihood[intent]
+            unseen = self._log_unseen[intent]
+            scores[intent] = self._log_prior[intent] + sum(likelihood.get(f, unseen) for f in features)
+        best = max(scores, key=scores.get)
+        peak = scores[best]
+        confidence = 1.0 / sum(math.exp(s - peak) for s in scores.values())
+
+        # Only short queries are vague enough to clarify locally. Short replies in an
+        # ongoing conversation ("yes, in public") only look vague without context;
+        # leave both cases to the LLM analyzer.
+        if best == "clarify" and (history or len(tokens) > CLARIFY_MAX_TOKENS):
+            return best, 0.0
+        return best, confidence
+
+    def to_analysis(self, query: str, intent: str, confidence: float) -> AnalysisResult:
+        keywords = " ".join(t for t in tokenize(query) if t not in _STOPWORDS) or query
+        search_queries = [f"site:devgan.in {keywords}", f"{keywords} legal rules"]
+        if intent == "legal_advice":
+            search_queries.insert(0, f"site:indiankanoon.org {keywords} judgment")
+        return AnalysisResult(
+            intent=intent,
+            search_queries=search_queries,
+            priority_domains=["indiankanoon.org", "devgan.in"],
+            key_facts=[],
+            relevant_judgments=[],
+            reasoning=f"Local intent classifier (confidence {confidence:.2f})"
+        )
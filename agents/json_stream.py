@@ -0,0 +1,346 @@
+"""
+Incremental parser for the JSON object a model writes, fed chunk by chunk as
+the output streams in.
+
+The research agent answers with one JSON object, often wrapped in a ```json
+fence or in a sentence or two of prose. `JSONStream` skips to the object's
+first `{` and parses it as the chunks arrive. `feed` returns what completed in
+that chunk:
+
+- `("text", key, delta)`: newly decoded characters of a top-level string
+  field listed in `stream_fields` (the summary), while it is being written
+- `("item", key, value)`: each element of a top-level array, once complete
+  (each judgment)
+- `("field", key, value)`: each top-level field, once complete
+
+Anything after the object (closing fence, trailing prose) is ignored.
+`close` returns the object. Output cut off mid-object, or malformed after part
+of it was reported, is repaired: open strings and containers are closed, a key
+without a value is dropped, and so is an unfinished array element, so a
+half-written judgment never shows up. Output with no object in it gives `None`.
+
+Besides strict JSON it accepts trailing commas and raw control characters
+inside strings, which models produce now and then.
+"""
+import re
+from typing import Any, Iterable, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING_RUN = re.compile(r'[^"\\]*')
+_NUMBER_CHARS = re.compile(r"[-+.0-9eE]*")
+_NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?")
+_LITERALS = {"true": True, "false": False, "null": None}
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+# Parser states
+_SEEK = 0         # Before the object: looking for its `{`
+_VALUE = 1        # Expecting a value
+_KEY = 2          # In an object, expecting a key or `}`
+_COLON = 3        # After a key
+_NEXT = 4         # After a value, expecting `,` or the closing bracket
+_STRING = 5       # Inside a string
+_DONE = 6         # The object is complete
+
+Event = Tuple[str, str, Any]
+
+
+class JSONSyntaxError(ValueError):
+    pass
+
+
+class JSONStream:
+    def __init__(self, stream_fields: Iterable[str] = ()):
+        self.stream_fields = frozenset(stream_fields)
+        self.truncated = False
+        # Malformed after part of the object was reported: parsing stops, `close` keeps what was parsed
+        self.failed = False
+        self._chunks: List[str] = []
+        self._buf = ""          # Text not consumed yet (at most an unfinished token once `feed` returns)
+        self._consumed = 0      # Characters consumed before `_buf`
+        self._start = -1        # Offset of the object's `{` in the whole output
+        self._reset()
+
+    def _reset(self):
+        self._state = _SEEK
+        # One frame per open container: [container, pending key (objects) or own key (top-level arrays)]
+        self._stack: List[list] = []
+        self._root: Optional[dict] = None
+        self._string: List[str] = []
+        self._string_is_key = False
+        self._streaming = None  # Field name while inside a streamed string value
+        self._reported = False
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        if len(self._chunks) > 1:
+            self._chunks[:] = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def feed(self, chunk: str) -> List[Event]:
+        if not chunk:
+            return []
+        self._chunks.append(chunk)
+        if self._state == _DONE or self.failed:
+            return []
+        if self._state == _STRING and not self._buf and '"' not in chunk and "\\" not in chunk:
+            # Most chunks fall inside the summary: nothing to parse
+            self._string.append(chunk)
+            self._consumed += len(chunk)
+            if self._streaming:
+                self._reported = True
+                return [("text", self._streaming, chunk)]
+            return []
+        self._buf += chunk
+        events: List[Event] = []
+        try:
+            self._parse(events, final=False)
+        except JSONSyntaxError:
+            self._recover(events)
+        return events
+
+    def close(self) -> Optional[dict]:
+        """The parsed object, repaired if the output stopped early; `None` when there was none."""
+        if self._state == _SEEK:
+            return None
+        if self._state != _DONE and not self.failed:
+            try:
+                self._parse([], final=True)
+            except JSONSyntaxError:
+                self.failed = True
+        if self._state != _DONE:
+            self.truncated = True
+            self._repair()
+        return self._root
+
+    # Parsing
+
+    def _parse(self, events: List[Event], final: bool):
+        buf, i, n = self._buf, 0, len(self._buf)
+        state = self._state
+        while i < n and state != _DONE:
+            if state == _STRING:
+                i = self._parse_string(buf, i, events)
+                if self._state != _STRING:
+                    state = self._state
+                    continue
+                break
+
+            if state == _SEEK:
+                found = buf.find("{", i)
+                if found < 0:
+                    i = n
+                    break
+                self._start = self._consumed + found
+                self._root = {}
+                self._stack.append([self._root, None])
+                state, i = _KEY, found + 1
+                continue
+
+            i = _WHITESPACE.match(buf, i).end()
+            if i >= n:
+                break
+            ch = buf[i]
+
+            if state == _KEY:
+                if ch == '"':
+                    self._begin_string(is_key=True)
+                    state, i = _STRING, i + 1
+                elif ch == "}":
+                    state, i = self._close_container(events), i + 1
+                else:
+                    raise JSONSyntaxError(f"expected a key at {self._consumed + i}")
+            elif state == _COLON:
+                if ch != ":":
+                    raise JSONSyntaxError(f"expected ':' at {self._consumed + i}")
+                state, i = _VALUE, i + 1
+            elif state == _NEXT:
+                if ch == ",":
+                    state = _KEY if isinstance(self._stack[-1][0], dict) else _VALUE
+                    i += 1
+                elif ch == "}" or ch == "]":
+                    if (ch == "}") != isinstance(self._stack[-1][0], dict):
+                        raise JSONSyntaxError(f"mismatched '{ch}' at {self._consumed + i}")
+                    state, i = self._close_container(events), i + 1
+                else:
+                    raise JSONSyntaxError(f"expected ',' at {self._consumed + i}")
+            elif state == _VALUE:
+                if ch == '"':
+                    self._begin_string(is_key=False)
+                    state, i = _STRING, i + 1
+                elif ch == "{":
+                    self._stack.append([{}, None])
+                    state, i = _KEY, i + 1
+                elif ch == "[":
+                    self._stack.append([[], self._top_level_key()])
+                    state, i = _VALUE, i + 1
+                elif ch == "]" and isinstance(self._stack[-1][0], list):
+                    # Empty array, or a trailing comma before the `]`
+                    state, i = self._close_container(events), i + 1
+                elif ch == "-" or "0" <= ch <= "9":
+                    end = _NUMBER_CHARS.match(buf, i).end()
+                    if end == n and not final:
+                        break  # The number may go on in the next chunk
+                    text = buf[i:end]
+                    if not _NUMBER.fullmatch(text):
+                        raise JSONSyntaxError(f"malformed number at {self._consumed + i}")
+                    state = self._complete(int(text) if text.lstrip("-").isdigit() else float(text), events)
+                    i = end
+                else:
+                    literal = next((word for word in _LITERALS if buf.startswith(word, i)), None)
+                    if literal:
+                        state = self._complete(_LITERALS[literal], events)
+                        i += len(literal)
+                    elif not final and any(word.startswith(buf[i:n]) for word in _LITERALS):
+                        break  # An unfinished literal: wait for the rest
+                    else:
+                        raise JSONSyntaxError(f"unexpected {ch!r} at {self._consumed + i}")
+            self._state = state
+
+        self._state = state
+        if state == _DONE or state == _SEEK:
+            # Trailing prose is never parsed; without an object yet, only a `{` matters
+            self._consumed += n
+            self._buf = ""
+        else:
+            self._consumed += i
+            self._buf = buf[i:]
+
+    def _top_level_key(self) -> Optional[str]:
+        return self._stack[0][1] if len(self._stack) == 1 else None
+
+    def _begin_string(self, is_key: bool):
+        self._string = []
+        self._string_is_key = is_key
+        self._streaming = None
+        if not is_key and len(self._stack) == 1 and self._stack[0][1] in self.stream_fields:
+            self._streaming = self._stack[0][1]
+
+    def _parse_string(self, buf: str, i: int, events: List[Event]) -> int:
+        """Consumes string content from `i`; leaves an escape that is cut off for the next chunk."""
+        n = len(buf)
+        parts = self._string
+        start_parts = len(parts)
+        while i < n:
+            end = _STRING_RUN.match(buf, i).end()
+            if end > i:
+                parts.append(buf[i:end])
+                i = end
+            if i >= n:
+                break
+            if buf[i] == '"':
+                i += 1
+                self._emit_string_delta(parts, start_parts, events)
+                value = "".join(parts)
+                self._string = []
+                if self._string_is_key:
+                    self._stack[-1][1] = value
+                    self._state = _COLON
+                else:
+                    self._state = self._complete(value, events)
+                return i
+            # A backslash escape
+            if i + 1 >= n:
+                break
+            esc = buf[i + 1]
+            if esc == "u":
+                if i + 6 > n:
+                    break
+                code = _hex(buf[i + 2:i + 6])
+                if 0xD800 <= code < 0xDC00:
+                    # A surrogate pair is decoded as one character once both halves are in
+                    if i + 8 > n:
+                        break
+                    if buf.startswith("\\u", i + 6):
+                        if i + 12 > n:
+                            break
+                        low = _hex(buf[i + 8:i + 12])
+                        if 0xDC00 <= low < 0xE000:
+                            parts.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                            i += 12
+                            continue
+                if code < 0 or 0xD800 <= code < 0xE000:
+                    code = 0xFFFD  # Invalid escape or unpaired surrogate
+                parts.append(chr(code))
+                i += 6
+                continue
+            parts.append(_ESCAPES.get(esc, esc))
+            i += 2
+        self._emit_string_delta(parts, start_parts, events)
+        return i
+
+    def _emit_string_delta(self, parts: List[str], start: int, events: List[Event]):
+        if self._streaming and len(parts) > start:
+            delta = "".join(parts[start:])
+            if delta:
+                events.append(("text", self._streaming, delta))
+                self._reported = True
+
+    def _complete(self, value: Any, events: List[Event]) -> int:
+        """Stores a finished value in its container and returns the next state."""
+        frame = self._stack[-1]
+        container = frame[0]
+        if isinstance(container, dict):
+            container[frame[1]] = value
+            if len(self._stack) == 1:
+                events.append(("field", frame[1], value))
+                self._reported = True
+            frame[1] = None
+        else:
+            container.append(value)
+            if len(self._stack) == 2 and frame[1] is not None:
+                events.append(("item", frame[1], value))
+                self._reported = True
+        return _NEXT
+
+    def _close_container(self, events: List[Event]) -> int:
+        container = self._stack.pop()[0]
+        if not self._stack:
+            return _DONE
+        return self._complete(container, events)
+
+    def _recover(self, events: List[Event]):
+        """
+        A syntax error before anything was reported means the `{` was not the
+        object (prose with braces, say): parsing restarts at the next `{`.
+        """
+        while not self._reported:
+            text = self.text
+            restart = text.find("{", self._start + 1)
+            self._reset()
+            if restart < 0:
+                self._consumed, self._buf = len(text), ""
+                return
+            self._consumed, self._buf = restart, text[restart:]
+            try:
+                self._parse(events, final=False)
+                return
+            except JSONSyntaxError:
+                continue
+        self.failed = True
+        self._buf = ""
+
+    def _repair(self):
+        if self._state == _STRING and not self._string_is_key:
+            frame = self._stack[-1]
+            if isinstance(frame[0], dict):
+                frame[0][frame[1]] = "".join(self._string)
+        # Close the open containers from the innermost; an unfinished array element is left out
+        while len(self._stack) > 1:
+            container = self._stack.pop()[0]
+            parent, key = self._stack[-1]
+            if isinstance(parent, dict) and key is not None:
+                parent[key] = container
+        self._stack = []
+        self._state = _DONE
+
+
+def _hex(digits: str) -> int:
+    try:
+        return int(digits, 16)
+    except ValueError:
+        return -1
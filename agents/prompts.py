@@ -0,0 +1,232 @@
+"""
+Prompt assembly shared by the agents.
+
+- `Template` parses a prompt template once. Rendering joins the static text
+  with the per-call values, and the size of the static text is known up front.
+- `PromptBuilder` holds one call site's token budget (`PROMPT_BUDGET_<AGENT>_TOKENS`).
+  It sizes the chat history to the room the rest of the prompt leaves, and
+  records the size of every prompt it finishes.
+- `HistoryCompactor` renders the `<chat_history>` text. The last
+  `PROMPT_HISTORY_MESSAGES` messages appear verbatim, each cut at
+  `PROMPT_MESSAGE_MAX_CHARS`. Older messages are condensed into a rolling
+  summary of one short line each, at most `PROMPT_SUMMARY_MAX_CHARS` long.
+  The summary is extended incrementally and cached on the session's
+  `MessageLog`, so each message is condensed once.
+
+Sizes are estimated at `CHARS_PER_TOKEN` characters per token; no tokenizer is needed.
+"""
+import os
+import re
+import string
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from utils import metrics
+from utils.messages import MessageLog
+from utils.tracing import current_span
+
+CHARS_PER_TOKEN = 4
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class Template:
+    """
+    A `str.format`-style template (`{name}` fields, `{{`/`}}` for braces) parsed
+    once. `render` only joins the pieces, and `static_chars` is the length of
+    the text around the fields.
+    """
+    __slots__ = ("_literals", "_fields", "static_chars")
+
+    def __init__(self, text: str):
+        self._literals: List[str] = []
+        self._fields: List[str] = []
+        pending = ""
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            pending += literal
+            if field is None:
+                continue
+            if spec or conversion or not field.isidentifier():
+                raise ValueError(f"Template fields must be plain names, got {{{field}}}")
+            self._literals.append(pending)
+            self._fields.append(field)
+            pending = ""
+        self._literals.append(pending)
+        self.static_chars = sum(len(literal) for literal in self._literals)
+
+    def render(self, **values: str) -> str:
+        parts = [self._literals[0]]
+        for field, literal in zip(self._fields, self._literals[1:]):
+            parts.append(values[field])
+            parts.append(literal)
+        return "".join(parts)
+
+
+def _format_message(role: str, content: str) -> str:
+    return f"{role.upper()}: {content}"
+
+
+def _clip(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 1)].rstrip() + "…"
+
+
+def _excerpt(text: str, max_chars: int) -> str:
+    """The opening of `text` on one line, ending at a sentence boundary when one falls in its second half."""
+    text = _WHITESPACE.sub(" ", text).strip()
+    if len(text) <= max_chars:
+        return text
+    cut = max(text.rfind(". ", max_chars // 2, max_chars), text.rfind("? ", max_chars // 2, max_chars))
+    return text[:cut + 1] if cut > 0 else _clip(text, max_chars)
+
+
+class RollingSummary:
+    """
+    One condensed line per message, for the messages before the verbatim
+    window. The history only grows, so the summary is extended from `covered`
+    and never rebuilt. The oldest lines are dropped past `max_chars`.
+    """
+    __slots__ = ("covered", "lines", "chars")
+
+    def __init__(self):
+        self.covered = 0
+        self.lines: Deque[str] = deque()
+        self.chars = 0
+
+    def advance(self, history: Sequence[Dict[str, str]], upto: int, line_chars: int, max_chars: int):
+        if upto <= self.covered:
+            return
+        for message in history[self.covered:upto]:
+            line = _format_message(message["role"], _excerpt(message["content"], line_chars))
+            self.lines.append(line)
+            self.chars += len(line) + 1
+        metrics.PROMPT_MESSAGES_SUMMARIZED.inc(upto - self.covered)
+        self.covered = upto
+        while self.lines and self.chars > max_chars:
+            self.chars -= len(self.lines.popleft()) + 1
+
+
+class HistoryCompactor:
+    SUMMARY_HEADER = "[Summary of earlier messages]"
+    RECENT_HEADER = "[Latest messages]"
+    # Verbatim messages are not cut shorter than this to fit a budget
+    MIN_MESSAGE_CHARS = 400
+
+    def __init__(self, recent_messages: int = 5, message_max_chars: int = 2000, summary_max_chars: int = 1200,
+                 summary_line_chars: int = 160):
+        self.recent_messages = recent_messages
+        self.message_max_chars = message_max_chars
+        self.summary_max_chars = summary_max_chars
+        self.summary_line_chars = summary_line_chars
+
+    @classmethod
+    def from_env(cls) -> "HistoryCompactor":
+        return cls(
+            recent_messages=int(os.getenv("PROMPT_HISTORY_MESSAGES", "5")),
+            message_max_chars=int(os.getenv("PROMPT_MESSAGE_MAX_CHARS", "2000")),
+            summary_max_chars=int(os.getenv("PROMPT_SUMMARY_MAX_CHARS", "1200")),
+        )
+
+    def _summary(self, history: Sequence[Dict[str, str]], upto: int) -> List[str]:
+        if self.summary_max_chars <= 0 or upto <= 0:
+            return []
+        if isinstance(history, MessageLog):
+            # Cached on the session's log: only messages that left the window since the last call are condensed
+            summary = history.summary
+            if summary is None:
+                summary = history.summary = RollingSummary()
+        else:
+            summary = RollingSummary()
+        summary.advance(history, upto, self.summary_line_chars, self.summary_max_chars)
+        return list(summary.lines)
+
+    def render(self, history: Sequence[Dict[str, str]], max_chars: Optional[int] = None) -> str:
+        """
+        The history as `ROLE: content` lines, at most `max_chars` long (about;
+        the newest message is always kept). Identical to the plain format while
+        the history fits the window and the budget.
+        """
+        total = len(history)
+        start = max(0, total - self.recent_messages)
+        summary = self._summary(history, start)
+        recent: List[Tuple[str, str]] = [(m["role"], m["content"]) for m in history[start:]]
+
+        per_message = self.message_max_chars
+        if max_chars is not None and recent:
+            summary_chars = sum(len(line) + 1 for line in summary)
+            # Over budget: the verbatim messages are cut to an equal share (down to a floor), then
+            # the oldest summary lines go, then the oldest verbatim messages
+            if summary_chars + self._recent_chars(recent, per_message) > max_chars:
+                share = (max_chars - summary_chars) // len(recent) - 12
+                per_message = min(per_message, max(self.MIN_MESSAGE_CHARS, share))
+            while summary and summary_chars + self._recent_chars(recent, per_message) > max_chars:
+                summary_chars -= len(summary.pop(0)) + 1
+            while len(recent) > 1 and summary_chars + self._recent_chars(recent, per_message) > max_chars:
+                recent.pop(0)
+                metrics.PROMPT_MESSAGES_DROPPED.inc()
+
+        lines = []
+        for role, content in recent:
+            if len(content) > per_message:
+                content = _clip(content, per_message)
+                metrics.PROMPT_MESSAGES_CLIPPED.inc()
+            lines.append(_format_message(role, content))
+        if not summary:
+            return "\n".join(lines)
+        return "\n".join([self.SUMMARY_HEADER, *summary, self.RECENT_HEADER, *lines])
+
+    @staticmethod
+    def _recent_chars(recent: List[Tuple[str, str]], per_message: int) -> int:
+        return sum(len(role) + 3 + min(len(content), per_message) for role, content in recent)
+
+
+_compactor: Optional[HistoryCompactor] = None
+
+
+def get_compactor() -> HistoryCompactor:
+    global _compactor
+    if _compactor is None:
+        _compactor = HistoryCompactor.from_env()
+    return _compactor
+
+
+class PromptBuilder:
+    """
+    A call site's prompt budget and instrumentation:
+
+        QUERY = PromptBuilder("analyze_query", "analyzer", default_tokens=2500)
+        history_text = QUERY.history(history, fixed_chars=TEMPLATE.static_chars + len(query))
+        prompt = QUERY.finish(TEMPLATE.render(history=history_text, query=query))
+    """
+    # The history keeps at least this much, even when the fixed parts use up the budget
+    MIN_HISTORY_CHARS = 800
+
+    def __init__(self, kind: str, agent: str, default_tokens: int):
+        self.kind = kind
+        self.budget_tokens = int(os.getenv(f"PROMPT_BUDGET_{agent.upper()}_TOKENS", str(default_tokens)))
+        self._tokens = metrics.PROMPT_TOKENS.labels(kind)
+
+    @property
+    def budget_chars(self) -> int:
+        return self.budget_tokens * CHARS_PER_TOKEN
+
+    def history(self, history: Sequence[Dict[str, str]], fixed_chars: int = 0) -> str:
+        """The history text, fitted to what the budget leaves after `fixed_chars` of other prompt text."""
+        if not history:
+            return ""
+        room = None if self.budget_tokens <= 0 else max(self.MIN_HISTORY_CHARS, self.budget_chars - fixed_chars)
+        return get_compactor().render(history, room)
+
+    def finish(self, prompt: str) -> str:
+        """Records the prompt's size (histogram and span attributes) and returns it."""
+        tokens = estimate_tokens(prompt)
+        self._tokens.observe(tokens)
+        span = current_span()
+        span.set_attribute("prompt_chars", len(prompt))
+        span.set_attribute("prompt_tokens_est", tokens)
+        return prompt
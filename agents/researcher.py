@@ -1,37 +1,28 @@
 import os
 import logging
-import json
-import re
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 import asyncio
+import time
 
 from google.adk.agents import Agent
-from google.adk.models.google_llm import Gemini
-from google.adk.runners import InMemoryRunner
-from google.adk.tools import google_search
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.memory import InMemoryMemoryService
+from google.adk.runners import Runner
 from google.genai import types
 
 from dtos import ResearchReport, SearchResult
+from agents.backend import LLMBackend, get_backend
+from agents.json_stream import JSONStream
+from agents.prompts import PromptBuilder
+from agents.session_store import BoundedSessionService
+from tools.correspondence import get_correspondence
+from utils import metrics
+from utils.tracing import current_span, trace_span
 
 logger = logging.getLogger(__name__)
 
-class ResearchAgent:
-    def __init__(self):
-        self.api_key = os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file")
-        
-        # Initialize Gemini Model
-        self.model = Gemini(model="gemini-2.5-flash")
-        
-        # System Prompt with Legal Adviser Persona and Acts
-        self.system_prompt = """
-        You are an expert Legal Adviser and Researcher for Indian Law (LegalAdviser-AI).
-        Your goal is to provide accurate, actionable legal advice in a **natural, conversational, and empathetic manner**.
-        
-        **Target Audience:** General Public (Non-lawyers). Use simple, easy-to-understand English.
-        
-        **CRITICAL: You MUST use the google_search tool to find current information, case law, and legal texts.**
+SEARCH_TOOL_DIRECTIVE = """**CRITICAL: You MUST use the google_search tool to find current information, case law, and legal texts.**
         **DO NOT rely on your training data alone. ALWAYS search for:**
         - Recent court judgments and case law
         - Current legal provisions and amendments  
@@ -40,7 +31,25 @@ class ResearchAgent:
         
         You have access to Google Search to find the latest information, judgments, and legal texts.
         
-        Your capabilities cover the following Acts and Laws:
+"""
+
+# Used instead of the directive above when search already ran before the model call
+SEARCH_RESULTS_DIRECTIVE = """**CRITICAL: Base your answer on the <search_results> given with the question.**
+        They were retrieved for this question from several searches and are numbered [1], [2], ...
+        - Cite judgments and sections from those results, copying their URLs exactly into "relevant_judgments"
+        - Prefer results from devgan.in and indiankanoon.org when they cover the question
+        - If the results do not answer the question, say so briefly and give general guidance
+        
+"""
+
+# Built once at import; the grounded variant swaps the search directive for the pre-fetched results one
+SYSTEM_PROMPT = """
+        You are an expert Legal Adviser and Researcher for Indian Law (LegalAdviser-AI).
+        Your goal is to provide accurate, actionable legal advice in a **natural, conversational, and empathetic manner**.
+        
+        **Target Audience:** General Public (Non-lawyers). Use simple, easy-to-understand English.
+        
+        """ + SEARCH_TOOL_DIRECTIVE + """        Your capabilities cover the following Acts and Laws:
         - Indian Penal Code, 1860 (IPC)
         - Bharatiya Nyaya Sanhita, 2023 (BNS)
         - Code of Criminal Procedure, 1973 (CrPC)
@@ -74,6 +83,19 @@ class ResearchAgent:
         
         **IMPORTANT:** Keep the summary VERY brief. Include 2-3 cases in "relevant_judgments" array, not 4-5.
         """
+GROUNDED_SYSTEM_PROMPT = SYSTEM_PROMPT.replace(SEARCH_TOOL_DIRECTIVE, SEARCH_RESULTS_DIRECTIVE)
+
+RESEARCH_PROMPT = PromptBuilder("research", "researcher", default_tokens=6000)
+
+class ResearchAgent:
+    def __init__(self, backend: LLMBackend = None):
+        self.backend = backend or get_backend()
+        
+        # Initialize the model (ADK Gemini, or the fake backend's FakeLlm)
+        self.model = self.backend.adk_model()
+        
+        # System Prompt with Legal Adviser Persona and Acts
+        self.system_prompt = SYSTEM_PROMPT
         
         class LegalAdviserAgent(Agent):
             pass
@@ -82,14 +104,58 @@ class ResearchAgent:
         self.agent = LegalAdviserAgent(
             name="LegalAdviserAgent",
             model=self.model,
-            tools=[google_search],
+            tools=self.backend.adk_tools(),
             instruction=self.system_prompt
         )
+        # Same persona without tools, for questions that come with pre-fetched search
+        # results: one model call instead of several search/answer turns
+        self.grounded_agent = LegalAdviserAgent(
+            name="LegalAdviserAgent",
+            model=self.model,
+            tools=[],
+            instruction=GROUNDED_SYSTEM_PROMPT
+        )
         
-        # ADK infers app_name from the directory ('agents'), so we match it to avoid warnings
-        self.runner = InMemoryRunner(agent=self.agent, app_name="agents")
+        # ADK infers app_name from the directory ('agents'), so we match it to avoid warnings.
+        # Sessions live in a bounded store so long-running servers do not accumulate them forever.
+        self.session_service = BoundedSessionService.from_env()
+        self.runner = Runner(
+            app_name="agents",
+            agent=self.agent,
+            session_service=self.session_service,
+            artifact_service=InMemoryArtifactService(),
+            memory_service=InMemoryMemoryService()
+        )
+        # Shares the session service, so both runners continue the same ADK conversation
+        self.grounded_runner = Runner(
+            app_name="agents",
+            agent=self.grounded_agent,
+            session_service=self.session_service,
+            artifact_service=self.runner.artifact_service,
+            memory_service=self.runner.memory_service
+        )
 
-    async def research(self, query: str, history: list[dict] = [], user_session_id: str = None) -> ResearchReport:
+    async def research(self, query: str, history: list[dict] = [], user_session_id: str = None,
+                       search_context: Optional[str] = None, statute_context: Optional[str] = None) -> ResearchReport:
+        report = None
+        async for event in self.research_stream(query, history, user_session_id, search_context, statute_context):
+            if event["type"] == "report":
+                report = event["report"]
+        return report
+
+    @trace_span("ResearchAgent", "research_stream")
+    async def research_stream(self, query: str, history: list[dict] = [], user_session_id: str = None,
+                              search_context: Optional[str] = None, statute_context: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Runs the research agent and yields events as the model output arrives:
+        `{"type": "delta", "text": ...}` for each new piece of the summary,
+        `{"type": "judgment", "judgment": SearchResult}` for each cited judgment as soon as
+        it is complete, and a final `{"type": "report", "report": ResearchReport}`.
+
+        With `search_context` (results of the search stage), the agent answers from
+        that context without calling search tools itself. `statute_context` (sections
+        from the local statute index) is added to the question either way.
+        """
         logger.info(f"Starting research for: {query}")
         
         # Query Optimization for specific sources
@@ -97,117 +163,191 @@ class ResearchAgent:
         lower_query = query.lower()
         
         # Append site:devgan.in for specific laws as requested
-        if any(term in lower_query for term in ["ipc", "crpc", "penal code", "criminal procedure", "bns", "bharatiya nyaya sanhita"]):
+        if search_context is None and any(term in lower_query for term in ["ipc", "crpc", "penal code", "criminal procedure", "bns", "bharatiya nyaya sanhita"]):
              search_query = f"{query} (source: devgan.in OR indiankanoon.org)"
         
+        adk_session_id = None
+        start = time.perf_counter()
+        turn_started = time.time()  # ADK event timestamps are wall-clock
+        reported = False  # Set once the report is handed over: the turn is complete from then on
         try:
             # Use the user's session ID for ADK session continuity
             # This ensures conversation history is maintained across queries
             adk_session_id = f"adk_{user_session_id}" if user_session_id else "session_" + os.urandom(4).hex()
             
-            # Always try to create the session - ADK will reuse if it already exists
-            try:
-                await self.runner.session_service.create_session(
+            # Only create the session when it does not exist yet; create_session
+            # would otherwise replace it and drop the conversation so far
+            if self.session_service.has_session(app_name="agents", user_id="researcher", session_id=adk_session_id):
+                logger.info(f"Using existing ADK session: {adk_session_id}")
+            else:
+                await self.session_service.create_session(
                     app_name="agents", 
                     user_id="researcher", 
                     session_id=adk_session_id
                 )
                 logger.info(f"Created new ADK session: {adk_session_id}")
-            except Exception as e:
-                # Session might already exist, which is fine - we'll reuse it
-                logger.info(f"Using existing ADK session: {adk_session_id}")
             
-            # Format history for context
+            # Prepare the full context
+            context = ""
+            # Known IPC/BNS and CrPC/BNSS equivalents, so the model does not search for them
+            table = get_correspondence()
+            mappings = table.describe(query) if table else None
+            if mappings:
+                context += f"<section_mappings>\n{mappings}\n</section_mappings>\n\n"
+            if statute_context:
+                context += f"<statute_text>\n{statute_context}\n</statute_text>\n\n"
+            runner = self.runner
+            if search_context is not None:
+                context += f"<search_results>\n{search_context}\n</search_results>\n\n"
+                runner = self.grounded_runner
+            context += search_query
+            
+            # History for context, fitted to what the rest of the message leaves of the budget
             history_context = ""
             if history:
-                history_context = "<chat_history>\n" + "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in history[-5:]]) + "\n</chat_history>\n\n"
-            
-            # Prepare the full context
-            full_context = history_context + search_query
+                history_text = RESEARCH_PROMPT.history(history, fixed_chars=len(context) + len("<chat_history>\n\n</chat_history>\n\n"))
+                history_context = "<chat_history>\n" + history_text + "\n</chat_history>\n\n"
+            full_context = RESEARCH_PROMPT.finish(history_context + context)
             
             print("\nRESEARCH AGENT")
             print(f"User Query: {query}")
 
-            # Run the agent
-            event_generator = self.runner.run_async(
+            # Run the agent, streaming partial model output as it is generated
+            event_generator = runner.run_async(
                 user_id="researcher",
                 session_id=adk_session_id,
-                new_message=types.Content(role="user", parts=[types.Part(text=full_context)])
+                new_message=types.Content(role="user", parts=[types.Part(text=full_context)]),
+                run_config=RunConfig(streaming_mode=StreamingMode.SSE)
             )
             
             text_response = ""
+            streamed_text = ""
+            saw_partial = False
+            parser = JSONStream(stream_fields=("summary",))
             
+            span = current_span()
+            event_count = 0
             async for event in event_generator:
+                if event_count == 0:
+                    metrics.RESEARCHER_FIRST_EVENT.since(start)
+                event_count += 1
                 # Extract text from event content
+                text = ""
                 if hasattr(event, 'content') and event.content:
-                    if hasattr(event.content, 'parts'):
+                    if hasattr(event.content, 'parts') and event.content.parts:
                         for part in event.content.parts:
                             if part.text:
-                                text_response += part.text
-
-
-            
-            # Robust JSON extraction
-            json_match = re.search(r"```json\s*(.*?)\s*```", text_response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
-            else:
-                # Fallback: try to find the first '{' and last '}'
-                start = text_response.find('{')
-                end = text_response.rfind('}')
-                if start != -1 and end != -1:
-                    json_str = text_response[start:end+1]
+                                text += part.text
+                span.add_event("adk.event", author=event.author or "", partial=bool(event.partial), chars=len(text))
+                
+                if event.partial:
+                    # Partial events carry incremental chunks of the current turn
+                    saw_partial = True
+                    streamed_text += text
+                    parsed = parser.feed(text)
                 else:
-                    json_str = text_response # Hope for the best
-            
-            try:
-                data = json.loads(json_str)
-            except json.JSONDecodeError:
-                logger.warning(f"Failed to parse JSON. Falling back to raw text. Raw response: {text_response}")
-                # Fallback: Treat the entire response as the summary
-                data = {
-                    "key_facts": [],
-                    "summary": text_response, # Use the raw text as the summary
-                    "relevant_judgments": []
-                }
-            
-            # Map to ResearchReport
-            relevant_judgments_data = data.get("relevant_judgments", [])
-            
-            # Print search results
-            if relevant_judgments_data:
-                print(f"\nSearch Results Found: {len(relevant_judgments_data)} judgments/sources")
-                for i, judgment in enumerate(relevant_judgments_data, 1):
-                    print(f"\n[Result #{i}]")
-                    print(f"  Title: {judgment.get('title', 'Unknown')}")
-                    print(f"  URL: {judgment.get('url', 'N/A')}")
-                    print(f"  Snippet: {judgment.get('snippet', 'N/A')}")
-                    print(f"  Source: {judgment.get('source', 'Unknown')}")
-            else:
-                print("\nNo search results found in response")
-            
-            relevant_judgments = [
-                SearchResult(
-                    title=j.get("title", "Unknown"),
-                    url=j.get("url", ""),
-                    snippet=j.get("snippet", ""),
-                    source=j.get("source", "Google Search")
-                ) for j in relevant_judgments_data
-            ]
+                    # The final event of a turn repeats the aggregated text; only
+                    # parse it when the backend did not stream partial chunks
+                    text_response += text
+                    parsed = parser.feed(text) if not saw_partial else ()
+                    saw_partial = False
+                for kind, key, value in parsed:
+                    if kind == "text":
+                        yield {"type": "delta", "text": value}
+                    elif kind == "item" and key == "relevant_judgments" and isinstance(value, dict):
+                        yield {"type": "judgment", "judgment": _search_result(value)}
+
+            text_response = text_response or streamed_text
+            metrics.RESEARCHER_EVENTS.observe(event_count)
+            metrics.RESEARCHER_LATENCY.since(start)
             
-            return ResearchReport(
-                query=query,
-                key_facts=data.get("key_facts", []),
-                relevant_judgments=relevant_judgments,
-                summary=data.get("summary", "")
-            )
+            report = self._build_report(query, text_response, parser)
+            reported = True
+            yield {"type": "report", "report": report}
             
         except Exception as e:
             logger.error(f"Research failed: {e}", exc_info=True)
-            return ResearchReport(
+            metrics.RESEARCHER_ERRORS.inc()
+            metrics.RESEARCHER_LATENCY.since(start)
+            yield {"type": "report", "report": ResearchReport(
                 query=query,
                 key_facts=["Error during research"],
                 relevant_judgments=[],
-                summary=f"Failed to conduct research due to error: {e}"
-            )
+                summary=f"Failed to conduct research due to error: {e}",
+                error=str(e)
+            )}
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelled half-way (discarded speculation, client gone): drop the partial turn,
+            # so the next turn does not see a question without its answer. A consumer that
+            # stops after the report (client gone after `final`) keeps the finished turn.
+            if user_session_id and not reported:
+                self.rollback_session(user_session_id, since=turn_started)
+            raise
+        finally:
+            # One-off sessions are never reused, so drop them straight away
+            if not user_session_id and adk_session_id:
+                self.session_service.evict(app_name="agents", user_id="researcher", session_id=adk_session_id)
+
+    def rollback_session(self, user_session_id: str, since: float) -> int:
+        """Drops the ADK session's events from `since` (`time.time()`) on, e.g. a discarded turn."""
+        return self.session_service.rollback(app_name="agents", user_id="researcher", session_id=f"adk_{user_session_id}",
+                                             since=since)
+
+    def evict_session(self, user_session_id: str):
+        """Drops the ADK session mirroring an expired user session."""
+        self.session_service.evict(app_name="agents", user_id="researcher", session_id=f"adk_{user_session_id}")
+
+    def _build_report(self, query: str, text_response: str, parser: Optional[JSONStream] = None) -> ResearchReport:
+        """
+        Builds the report from the JSON object in the model output, using `parser`
+        when the output was already streamed through it.
+        """
+        if parser is None:
+            parser = JSONStream()
+            parser.feed(text_response)
+        data = parser.close()
+        if parser.truncated and data:
+            metrics.JSON_REPAIRED.inc()
+            logger.warning("Research output was cut off or malformed; using the part that parsed")
+        if not data:
+            metrics.JSON_FALLBACKS.inc()
+            logger.warning(f"Failed to parse JSON. Falling back to raw text. Raw response: {text_response}")
+            # Fallback: Treat the entire response as the summary
+            data = {
+                "key_facts": [],
+                "summary": text_response, # Use the raw text as the summary
+                "relevant_judgments": []
+            }
+        
+        # Map to ResearchReport
+        relevant_judgments_data = [j for j in data.get("relevant_judgments") or [] if isinstance(j, dict)]
+        
+        # Print search results
+        if relevant_judgments_data:
+            print(f"\nSearch Results Found: {len(relevant_judgments_data)} judgments/sources")
+            for i, judgment in enumerate(relevant_judgments_data, 1):
+                print(f"\n[Result #{i}]")
+                print(f"  Title: {judgment.get('title', 'Unknown')}")
+                print(f"  URL: {judgment.get('url', 'N/A')}")
+                print(f"  Snippet: {judgment.get('snippet', 'N/A')}")
+                print(f"  Source: {judgment.get('source', 'Unknown')}")
+        else:
+            print("\nNo search results found in response")
+        
+        relevant_judgments = [_search_result(j) for j in relevant_judgments_data]
+        
+        return ResearchReport(
+            query=query,
+            key_facts=data.get("key_facts", []),
+            relevant_judgments=relevant_judgments,
+            summary=data.get("summary", "")
+        )
+
 
+def _search_result(judgment: dict) -> SearchResult:
+    return SearchResult(
+        title=judgment.get("title", "Unknown"),
+        url=judgment.get("url", ""),
+        snippet=judgment.get("snippet", ""),
+        source=judgment.get("source", "Google Search")
+    )
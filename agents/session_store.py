@@ -0,0 +1,162 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+
+logger = logging.getLogger(__name__)
+
+_Key = Tuple[str, str, str]
+
+
+class BoundedSessionService(InMemorySessionService):
+    """
+    In-memory ADK session service with bounded memory.
+
+    - At most `max_sessions` sessions are kept; the least recently used is evicted first.
+    - Each session keeps only its last `max_events` events, trimmed at user-turn boundaries.
+    - Sessions idle for longer than `ttl_seconds` are dropped by `expire_idle`
+      (and lazily on access).
+
+    The bounds go through the public `create_session` / `get_session` /
+    `delete_session` / `append_event`. Trimming, rollback and eviction edit the
+    base class's `sessions` storage in place, which is why google-adk is pinned
+    in requirements.txt; the constructor fails loudly if that storage changes.
+    """
+    def __init__(self, max_sessions: int = 1000, max_events: int = 50, ttl_seconds: float = 24 * 3600):
+        super().__init__()
+        if not isinstance(getattr(self, "sessions", None), dict):
+            raise RuntimeError("InMemorySessionService no longer keeps its sessions in `sessions`; "
+                               "check the google-adk version pinned in requirements.txt")
+        self.max_sessions = max_sessions
+        self.max_events = max_events
+        self.ttl_seconds = ttl_seconds
+        self._lru: "OrderedDict[_Key, float]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> "BoundedSessionService":
+        return cls(
+            max_sessions=int(os.getenv("ADK_SESSION_MAX", "1000")),
+            max_events=int(os.getenv("ADK_SESSION_MAX_EVENTS", "50")),
+            ttl_seconds=float(os.getenv("SESSION_TTL_HOURS", "24")) * 3600,
+        )
+
+    def _touch(self, key: _Key):
+        self._lru[key] = time.monotonic()
+        self._lru.move_to_end(key)
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        session = await super().create_session(app_name=app_name, user_id=user_id, state=state, session_id=session_id)
+        self._touch((app_name, user_id, session.id))
+        while len(self._lru) > self.max_sessions:
+            oldest = next(iter(self._lru))
+            self._drop(oldest)
+            self.evictions += 1
+            logger.info(f"Evicted least recently used ADK session: {oldest[2]}")
+        return session
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str, config=None) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        last_used = self._lru.get(key)
+        if last_used is not None and time.monotonic() - last_used > self.ttl_seconds:
+            self._drop(key)
+            self.expirations += 1
+            return None
+        session = await super().get_session(app_name=app_name, user_id=user_id, session_id=session_id, config=config)
+        if session is not None:
+            self._touch(key)
+        return session
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        # The base implementation deep-copies the session just to check it exists
+        self._drop((app_name, user_id, session_id))
+
+    def _stored(self, app_name: str, user_id: str, session_id: str) -> Optional[Session]:
+        """The live session in the base class's storage (not the copy `get_session` returns)."""
+        return self.sessions.get(app_name, {}).get(user_id, {}).get(session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        stored = self._stored(session.app_name, session.user_id, session.id)
+        if stored is not None and len(stored.events) > self.max_events:
+            self._trim(stored.events)
+        return event
+
+    def _trim(self, events: list):
+        """
+        Drops the oldest whole turns until at most `max_events` are left. Cuts
+        only before a user message, so the history never starts on a model or
+        tool event, nor separates a function call from its response. A single
+        turn longer than `max_events` is kept whole.
+        """
+        need = len(events) - self.max_events
+        cut = 0
+        for i, event in enumerate(events):
+            if event.author == "user" and i > 0:
+                cut = i
+                if i >= need:
+                    break
+        if cut:
+            del events[:cut]
+
+    def has_session(self, *, app_name: str, user_id: str, session_id: str) -> bool:
+        """Cheap existence check (no deep copy, unlike `get_session`). Expired sessions count as missing."""
+        key = (app_name, user_id, session_id)
+        last_used = self._lru.get(key)
+        if last_used is None:
+            return False
+        if time.monotonic() - last_used > self.ttl_seconds:
+            self._drop(key)
+            self.expirations += 1
+            return False
+        return True
+
+    def rollback(self, *, app_name: str, user_id: str, session_id: str, since: float) -> int:
+        """Drops the events appended at or after `since` (`time.time()`), e.g. a cancelled turn. Returns the number dropped."""
+        stored = self._stored(app_name, user_id, session_id)
+        if stored is None:
+            return 0
+        keep = len(stored.events)
+        while keep and stored.events[keep - 1].timestamp >= since:
+            keep -= 1
+        dropped = len(stored.events) - keep
+        del stored.events[keep:]
+        return dropped
+
+    def evict(self, *, app_name: str, user_id: str, session_id: str):
+        """Drops a session, e.g. when the user session it mirrors expires."""
+        key = (app_name, user_id, session_id)
+        if key in self._lru:
+            self._drop(key)
+
+    def expire_idle(self) -> int:
+        """Drops every session idle for longer than the TTL. Returns the number removed."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = 0
+        # The LRU order is also last-use order, so stop at the first live session
+        while self._lru:
+            key, last_used = next(iter(self._lru.items()))
+            if last_used >= cutoff:
+                break
+            self._drop(key)
+            expired += 1
+        self.expirations += expired
+        return expired
+
+    def _drop(self, key: _Key):
+        app_name, user_id, session_id = key
+        self.sessions.get(app_name, {}).get(user_id, {}).pop(session_id, None)
+        self._lru.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._lru),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -1,26 +1,16 @@
-import google.generativeai as genai
-import os
 import json
 from dtos import AnalysisResult
 import logging
+import time
+from agents.backend import LLMBackend, get_backend
+from agents.prompts import PromptBuilder, Template
+from utils import metrics
 from utils.tracing import trace_span
 
 logger = logging.getLogger(__name__)
 
-class SummarizerAgent:
-    def __init__(self):
-        self.api_key = os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file")
-        
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
-
-    @trace_span("SummarizerAgent", "summarize")
-    def summarize(self, query: str, analysis: AnalysisResult, history: list[dict] = []) -> str:
-        history_text = "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in history[-5:]])
-        
-        prompt = f"""<persona>
+# Prompt template, parsed once (see agents/prompts.py)
+SUMMARY_TEMPLATE = Template("""<persona>
 You are a friendly, knowledgeable Legal Adviser (LegalAdviser-AI) helping the General Public in India. 
 Your goal is to explain complex Indian Laws (IPC, CrPC, BNS, RTI, etc.) in simple, easy-to-understand language.
 Avoid using too much legal jargon. If you must use a legal term, explain it simply.
@@ -28,14 +18,14 @@ Be empathetic and helpful, like a smart friend who knows the law.
 </persona>
 
 <chat_history>
-{history_text}
+{history}
 </chat_history>
 
 <context>
 User Query: "{query}"
-Intent: "{analysis.intent}"
-Reasoning: "{analysis.reasoning}"
-Facts Found: {json.dumps(analysis.key_facts)}
+Intent: "{intent}"
+Reasoning: "{reasoning}"
+Facts Found: {facts}
 </context>
 
 <task>
@@ -67,11 +57,49 @@ Generate a response based on the intent, tailored for a non-lawyer audience.
 
 <output_format>
 Plain text response only. Use Markdown for formatting (bolding key terms, lists).
-</output_format>"""
-        
+</output_format>""")
+
+SUMMARY_PROMPT = PromptBuilder("summarize", "summarizer", default_tokens=3000)
+
+class SummarizerAgent:
+    FALLBACK_REPLY = "I apologize, but I am having trouble generating a response right now."
+
+    def __init__(self, backend: LLMBackend = None):
+        # Gemini by default; LLM_BACKEND=fake swaps in canned responses for load testing
+        self.backend = backend or get_backend()
+
+    @trace_span("SummarizerAgent", "summarize")
+    def summarize(self, query: str, analysis: AnalysisResult, history: list[dict] = []) -> str:
+        prompt = self._build_prompt(query, analysis, history)
+        start = time.perf_counter()
+        try:
+            return self.backend.generate(prompt, kind="summarize")
+        except Exception as e:
+            logger.error(f"Summarization failed: {e}")
+            metrics.SUMMARIZER_ERRORS.inc()
+            return self.FALLBACK_REPLY
+        finally:
+            metrics.SUMMARIZER_LATENCY.since(start)
+
+    @trace_span("SummarizerAgent", "summarize")
+    async def summarize_async(self, query: str, analysis: AnalysisResult, history: list[dict] = []) -> str:
+        """
+        Non-blocking variant of `summarize` for use from the event loop.
+        """
+        prompt = self._build_prompt(query, analysis, history)
+        start = time.perf_counter()
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return await self.backend.generate_async(prompt, kind="summarize")
         except Exception as e:
             logger.error(f"Summarization failed: {e}")
-            return "I apologize, but I am having trouble generating a response right now."
+            metrics.SUMMARIZER_ERRORS.inc()
+            return self.FALLBACK_REPLY
+        finally:
+            metrics.SUMMARIZER_LATENCY.since(start)
+
+    def _build_prompt(self, query: str, analysis: AnalysisResult, history: list[dict]) -> str:
+        facts = json.dumps(analysis.key_facts)
+        fixed_chars = SUMMARY_TEMPLATE.static_chars + len(query) + len(analysis.intent) + len(analysis.reasoning) + len(facts)
+        history_text = SUMMARY_PROMPT.history(history, fixed_chars=fixed_chars)
+        return SUMMARY_PROMPT.finish(SUMMARY_TEMPLATE.render(
+            history=history_text, query=query, intent=analysis.intent, reasoning=analysis.reasoning, facts=facts))
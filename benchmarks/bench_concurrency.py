@@ -0,0 +1,106 @@
+"""
+Concurrency check for the `/chat` pipeline on the fake LLM backend, which
+sleeps for a fixed latency instead of calling Gemini.
+
+With non-blocking agent calls, N concurrent requests should finish in roughly
+the latency of a single request plus the server's own CPU time per request
+(ADK runner, serialization, logging); with the old blocking calls they
+serialize and take roughly N times as long.
+
+    python benchmarks/bench_concurrency.py --requests 20 --latency-ms 200
+    python benchmarks/bench_concurrency.py --mode blocking
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ["LLM_BACKEND"] = "fake"
+# Every request should pay for the analyzer round-trip
+os.environ.setdefault("INTENT_CLASSIFIER_ENABLED", "false")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+# "What is section 420 IPC?" would otherwise be answered from the statute index
+os.environ.setdefault("STATUTE_DIRECT_ANSWERS", "false")
+# Measure the pipeline itself, not the backend concurrency cap
+os.environ.setdefault("LLM_MAX_CONCURRENCY", "0")
+
+import httpx
+
+import main
+from agents.backend import get_backend
+from utils.session import SessionManager
+
+
+def install_fakes(latency: float, mode: str):
+    # The fake backend is shared by all three agents, including the ADK research model
+    backend = get_backend()
+    backend = getattr(backend, "inner", backend)  # Unwrap a BoundedBackend
+    backend.latency_ms = latency * 1000
+    backend.latency_sigma = 0
+    backend.intent = "info"
+
+    if mode == "blocking":
+        # Reproduce the previous behaviour: the sync analyzer call runs on the event loop
+        analyzer = main.orchestrator.analyzer
+
+        async def blocking_analyze(query, history=[]):
+            return analyzer.analyze_query(query, history)
+        analyzer.analyze_query_async = blocking_analyze
+
+
+async def run(n_requests: int) -> list[float]:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i: int) -> float:
+            start = time.perf_counter()
+            response = await client.post("/chat", json={"message": f"What is section 420 IPC? #{i}"})
+            response.raise_for_status()
+            return time.perf_counter() - start
+        return await asyncio.gather(*(one(i) for i in range(n_requests)))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--mode", choices=["async", "blocking"], default="async")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        main.session_manager = SessionManager(storage_file=os.path.join(tmp, "sessions.json"))
+        # Agents are built lazily; build them now so the baseline request does not pay for it
+        main.orchestrator.warm_up()
+        install_fakes(latency, args.mode)
+
+        # Latency of a single request on an idle server is the baseline
+        single = max(asyncio.run(run(1)))
+
+        start = time.perf_counter()
+        durations = asyncio.run(run(args.requests))
+        wall = time.perf_counter() - start
+    result = {
+        "benchmark": "concurrency",
+        "mode": args.mode,
+        "requests": args.requests,
+        "model_latency_ms": args.latency_ms,
+        "single_request_ms": round(single * 1000, 1),
+        "wall_ms": round(wall * 1000, 1),
+        "max_request_ms": round(max(durations) * 1000, 1),
+        "wall_over_single_request": round(wall / single, 2),
+    }
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
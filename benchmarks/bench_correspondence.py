@@ -0,0 +1,98 @@
+"""
+Section-mapping questions ("BNS equivalent of IPC 420?"): the precomputed
+correspondence table vs. the research path the same questions used to take.
+
+The research path runs `ResearchAgent.research` on the fake LLM backend with a
+fixed model latency (`--latency-ms`), standing in for the search-and-answer turn
+a real model needs to look the mapping up. The table path is the orchestrator's
+short-circuit (`CorrespondenceTable.answer`). Also reports table load time and
+per-call cost of `map` and `answer`.
+
+    python benchmarks/bench_correspondence.py
+    python benchmarks/bench_correspondence.py --latency-ms 1500 --rounds 3 --out mapping.json
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import ROOT, latency_summary, time_per_op, write_result
+
+sys.path.insert(0, ROOT)
+
+QUESTIONS = [
+    "What is the BNS equivalent of IPC 420?",
+    "Which BNS section replaced section 302 of the IPC?",
+    "IPC 498A in BNS",
+    "What is the new section for 379 IPC?",
+    "CrPC 438 now",
+    "Section 154 CrPC BNSS",
+    "BNS 318 old section?",
+    "What is the new section for 506 IPC?",
+    "crpc 482 corresponding bnss section",
+    "IPC 124A in BNS",
+]
+
+
+async def research_path(questions: list, rounds: int, latency_ms: float) -> list:
+    from agents.backend import FakeBackend
+    from agents.researcher import ResearchAgent
+
+    researcher = ResearchAgent(FakeBackend(latency_ms=latency_ms, latency_sigma=0.0, seed=1))
+    latencies = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(rounds):
+            for question in questions:
+                start = time.perf_counter()
+                await researcher.research(question)
+                latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=800, help="Fake model latency of the research path")
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over the question set on the research path")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    os.environ["LLM_BACKEND"] = "fake"
+    from tools.correspondence import CorrespondenceTable, is_mapping_question
+
+    start = time.perf_counter()
+    table = CorrespondenceTable.load()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    answered = sum(1 for q in QUESTIONS if table.answer(q))
+    table_latencies = []
+    for _ in range(1000):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            table.answer(question)
+            table_latencies.append(time.perf_counter() - start)
+
+    research_latencies = asyncio.run(research_path(QUESTIONS, args.rounds, args.latency_ms))
+    table_summary = latency_summary(table_latencies)
+    research_summary = latency_summary(research_latencies)
+
+    result = {
+        "benchmark": "correspondence",
+        "config": {"questions": len(QUESTIONS), "fake_latency_ms": args.latency_ms, "rounds": args.rounds},
+        "table": {
+            "mappings": len(table),
+            "load_ms": round(load_ms, 3),
+            "map": time_per_op(lambda: table.map("IPC", "420"), number=20000),
+            "is_mapping_question": time_per_op(lambda: is_mapping_question(QUESTIONS[0]), number=5000),
+            "answered": answered,
+        },
+        "latency": {"table": table_summary, "research": research_summary},
+        "speedup_p50": round(research_summary["p50_ms"] / table_summary["p50_ms"], 1) if table_summary["p50_ms"] else None,
+    }
+    write_result(result, args.out)
+
+
+if __name__ == "__main__":
+    main()
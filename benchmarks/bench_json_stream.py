@@ -0,0 +1,155 @@
+"""
+Throughput of the research agent's JSON extraction on large model outputs,
+and how early the streamed parts become available.
+
+The output is a ```json-fenced research object with a `--summary-kb` summary
+and `--judgments` judgments. Measured:
+
+- `parse`: MB/s of `JSONStream` fed the whole output, and fed in
+  `--chunks` character chunks as the SSE stream delivers it, against the
+  buffered extraction it replaced (fence regex, brace fallback, `json.loads`)
+  and bare `json.loads`
+- `first_output`: share of the output received before the first summary
+  text, the first judgment and the last judgment were available (the buffered
+  extraction has nothing before 100%)
+- `truncated`: outputs cut at `--cuts` evenly spaced points; how many still
+  give the summary and how many judgments, with repair vs. the buffered
+  extraction (which falls back to the raw text)
+
+    python benchmarks/bench_json_stream.py
+    python benchmarks/bench_json_stream.py --summary-kb 256 --judgments 200 --out json_stream.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import ROOT, write_result
+
+sys.path.insert(0, ROOT)
+
+from agents.json_stream import JSONStream
+
+SENTENCE = ("Under Section 420 IPC (now Section 318(4) BNS) cheating with dishonest inducement is punishable "
+            "with up to seven years and a fine; file a complaint with the police or the Magistrate. ")
+
+
+def make_output(summary_kb: int, judgments: int) -> str:
+    summary = (SENTENCE * (summary_kb * 1024 // len(SENTENCE) + 1))[:summary_kb * 1024]
+    data = {
+        "key_facts": [f"Fact {i}: the deposit was paid on {i % 28 + 1} March." for i in range(10)],
+        "summary": summary,
+        "relevant_judgments": [
+            {"title": f"Case {i} v. State of Maharashtra ({1990 + i % 30})",
+             "url": f"https://indiankanoon.org/doc/{100000 + i}/",
+             "snippet": "Intention to deceive must exist at the time of the promise; “mens rea” is essential.",
+             "source": "Indian Kanoon"}
+            for i in range(judgments)
+        ],
+    }
+    return f"Here is what I found:\n```json\n{json.dumps(data, indent=2, ensure_ascii=False)}\n```\n"
+
+
+def buffered_extract(text: str):
+    """The extraction `ResearchAgent._build_report` used before `JSONStream`."""
+    match = re.search(r"```json\s*(.*?)\s*```", text, re.DOTALL)
+    if match:
+        json_str = match.group(1)
+    else:
+        start, end = text.find("{"), text.rfind("}")
+        json_str = text[start:end + 1] if start != -1 and end != -1 else text
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        return None
+
+
+def stream(text: str, chunk: int):
+    parser = JSONStream(stream_fields=("summary",))
+    events = []
+    for i in range(0, len(text), chunk):
+        for event in parser.feed(text[i:i + chunk]):
+            events.append((i + chunk, event))
+    return parser, events, parser.close()
+
+
+def throughput(fn, size: int, min_seconds: float) -> float:
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return round(size * runs / elapsed / 1e6, 2)
+
+
+def first_output(text: str, chunk: int) -> dict:
+    _, events, _ = stream(text, chunk)
+    n = len(text)
+
+    def share(pred):
+        offsets = [min(offset, n) for offset, event in events if pred(event)]
+        return {"first_pct": round(100 * offsets[0] / n, 1), "last_pct": round(100 * offsets[-1] / n, 1)} if offsets else None
+
+    return {
+        "summary_text": share(lambda e: e[0] == "text"),
+        "judgments": share(lambda e: e[0] == "item" and e[1] == "relevant_judgments"),
+        "buffered_pct": 100.0,
+    }
+
+
+def truncated(text: str, cuts: int, judgments: int) -> dict:
+    result = {"cuts": cuts, "stream": {"summary": 0, "judgments": 0}, "buffered": {"summary": 0, "judgments": 0}}
+    start = text.index("{")
+    for k in range(1, cuts + 1):
+        cut = start + (len(text) - start) * k // (cuts + 1)
+        _, _, data = stream(text[:cut], 256)
+        if data and data.get("summary"):
+            result["stream"]["summary"] += 1
+        result["stream"]["judgments"] += len((data or {}).get("relevant_judgments", []))
+        old = buffered_extract(text[:cut])
+        if old and old.get("summary"):
+            result["buffered"]["summary"] += 1
+        result["buffered"]["judgments"] += len((old or {}).get("relevant_judgments", []))
+    result["judgments_possible"] = judgments * cuts
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--summary-kb", type=int, default=64)
+    parser.add_argument("--judgments", type=int, default=50)
+    parser.add_argument("--chunks", default="16,64,256", help="Comma-separated chunk sizes in characters")
+    parser.add_argument("--cuts", type=int, default=20, help="Truncation points for the repair comparison")
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="Minimum time per throughput measurement")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    text = make_output(args.summary_kb, args.judgments)
+    size = len(text.encode("utf-8"))
+    chunks = [int(c) for c in args.chunks.split(",") if c]
+    parse = {
+        "json_loads_mb_s": throughput(lambda: json.loads(text[text.index("{"):text.rindex("}") + 1]), size, args.min_seconds),
+        "buffered_extract_mb_s": throughput(lambda: buffered_extract(text), size, args.min_seconds),
+        "stream_whole_mb_s": throughput(lambda: stream(text, len(text)), size, args.min_seconds),
+    }
+    for chunk in chunks:
+        parse[f"stream_chunk_{chunk}_mb_s"] = throughput(lambda: stream(text, chunk), size, args.min_seconds)
+
+    assert stream(text, chunks[0])[2] == buffered_extract(text), "JSONStream and json.loads disagree"
+    result = {
+        "benchmark": "json_stream",
+        "config": {"summary_kb": args.summary_kb, "judgments": args.judgments, "output_kb": round(size / 1024, 1),
+                   "chunks": chunks},
+        "parse": parse,
+        "first_output": first_output(text, chunks[-1]),
+        "truncated": truncated(text, args.cuts, args.judgments),
+    }
+    write_result(result, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Memory per chat message: `MessageLog` columns vs. the former list of dicts.
+
+Builds `--sessions` histories of `--messages` messages three ways and measures
+the allocations of each with tracemalloc. Message texts are created up front and
+shared by all three, so the figures are the per-message overhead of the
+representation on top of the text:
+
+- `dict_list`: `[{"role": ..., "content": ...}]` with role strings shared, as
+  `add_message` built them.
+- `dict_list_loaded`: the same, with one role string per message, as json.loads
+  produced them when a snapshot or journal was loaded.
+- `message_log`: `MessageLog` (one role byte and one list slot per message).
+
+Also times the reads prompt builders and the history API do: the last 5
+messages and a 30-message page as dicts.
+
+    python benchmarks/bench_message_memory.py
+    python benchmarks/bench_message_memory.py --sessions 5000 --messages 40 --out memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import ROOT, time_per_op, write_result
+
+sys.path.insert(0, ROOT)
+
+
+def make_contents(n_sessions: int, n_messages: int) -> list:
+    return [
+        [f"Question {s}.{m}: my landlord kept my deposit, what can I do?" if m % 2 == 0 else
+         f"Answer {s}.{m}: send a legal notice, then approach the civil court or consumer forum."
+         for m in range(n_messages)]
+        for s in range(n_sessions)
+    ]
+
+
+def dict_list(contents: list) -> list:
+    return [[{"role": "user" if i % 2 == 0 else "model", "content": c} for i, c in enumerate(session)]
+            for session in contents]
+
+
+def dict_list_loaded(contents: list) -> list:
+    # json.loads allocates a fresh role string for every event it decodes
+    roles = [json.loads('"user"'), json.loads('"model"')]
+    return [[{"role": json.loads(json.dumps(roles[i % 2])), "content": c} for i, c in enumerate(session)]
+            for session in contents]
+
+
+def message_logs(contents: list) -> list:
+    from utils.messages import MessageLog
+
+    logs = []
+    for session in contents:
+        log = MessageLog()
+        for i, c in enumerate(session):
+            log.append("user" if i % 2 == 0 else "model", c)
+        logs.append(log)
+    return logs
+
+
+def measure(build, contents: list) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build(contents)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return built, used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=20, help="Messages per session")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    contents = make_contents(args.sessions, args.messages)
+    n = args.sessions * args.messages
+    content_bytes = sum(sys.getsizeof(c) for session in contents for c in session)
+
+    memory, built = {}, {}
+    for name, build in (("dict_list", dict_list), ("dict_list_loaded", dict_list_loaded),
+                        ("message_log", message_logs)):
+        built[name], used = measure(build, contents)
+        memory[name] = {"mb": round(used / 1024 / 1024, 2), "bytes_per_message": round(used / n, 1)}
+
+    legacy, log = built["dict_list"][0], built["message_log"][0]
+    result = {
+        "benchmark": "message_memory",
+        "config": {"sessions": args.sessions, "messages": args.messages},
+        "content_bytes_per_message": round(content_bytes / n, 1),
+        "overhead": memory,
+        "saved_vs_loaded_pct": round(100 * (1 - memory["message_log"]["bytes_per_message"] /
+                                            memory["dict_list_loaded"]["bytes_per_message"]), 1),
+        "reads": {
+            "dict_list_last_5": time_per_op(lambda: [m["content"] for m in legacy[-5:]], number=20000),
+            "message_log_last_5": time_per_op(lambda: [m["content"] for m in log[-5:]], number=20000),
+            "dict_list_page_30": time_per_op(lambda: list(legacy[-30:]), number=20000),
+            "message_log_page_30": time_per_op(lambda: log[-30:].to_list(), number=20000),
+        },
+    }
+    write_result(result, args.out)
+
+
+if __name__ == "__main__":
+    main()
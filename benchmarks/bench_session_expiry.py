@@ -0,0 +1,131 @@
+"""
+Session expiry benchmark: the expiry heap vs. the previous full scan.
+
+Populates a SessionManager with synthetic sessions (a fraction of them already
+past the TTL), then times one cleanup sweep with each strategy and reports
+sweep time, peak memory allocated during the sweep, the expiry heap's own
+footprint and process peak RSS.
+
+    python benchmarks/bench_session_expiry.py --sessions 1000000 --expired-fraction 0.01
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.session import SessionData, SessionManager
+
+
+def populate(manager: SessionManager, n_sessions: int, expired_fraction: float, ttl_hours: float):
+    now = datetime.now()
+    rng = random.Random(42)
+    for i in range(n_sessions):
+        if rng.random() < expired_fraction:
+            last_active = now - timedelta(hours=ttl_hours + rng.random() * ttl_hours)
+        else:
+            last_active = now - timedelta(hours=rng.random() * ttl_hours * 0.9)
+        sid = f"s{i:08d}"
+        manager._sessions[sid] = SessionData.model_construct(
+            session_id=sid, title="New Chat", history=[], metadata={},
+            created_at=last_active, last_active=last_active,
+        )
+    manager._rebuild_expiry_heap()
+
+
+def legacy_cleanup(manager: SessionManager, max_age_hours: float) -> list:
+    """The pre-heap sweep: computes the age of every session."""
+    now = datetime.now()
+    expired_sessions = []
+    for sid, session in manager._sessions.items():
+        age = now - session.last_active
+        if age.total_seconds() > (max_age_hours * 3600):
+            expired_sessions.append(sid)
+    return expired_sessions
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def heap_bytes(manager: SessionManager) -> int:
+    heap = manager._expiry_heap
+    # List slots plus one (float, str) tuple and float per entry; the session IDs are shared
+    return sys.getsizeof(heap) + sum(sys.getsizeof(entry) + sys.getsizeof(entry[0]) for entry in heap)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--expired-fraction", type=float, default=0.01)
+    parser.add_argument("--ttl-hours", type=float, default=24)
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SessionManager(storage_file=os.path.join(tmp, "sessions.json"), compact_after=10**9)
+        start = time.perf_counter()
+        populate(manager, args.sessions, args.expired_fraction, args.ttl_hours)
+        populate_s = time.perf_counter() - start
+
+        # The legacy scan does not mutate, so measure it first on the same data
+        legacy_expired, legacy_s, legacy_peak = timed(legacy_cleanup, manager, args.ttl_hours)
+        heap_size = heap_bytes(manager)
+
+        # Keep copies so the traced re-run of the heap sweep sees the same work
+        heap_snapshot = list(manager._expiry_heap)
+        sessions_snapshot = dict(manager._sessions)
+
+        start = time.perf_counter()
+        heap_expired = manager.cleanup_sessions(max_age_hours=args.ttl_hours)
+        heap_s = time.perf_counter() - start
+
+        manager._expiry_heap = list(heap_snapshot)
+        manager._sessions = dict(sessions_snapshot)
+        tracemalloc.start()
+        manager.cleanup_sessions(max_age_hours=args.ttl_hours)
+        _, heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # A sweep with nothing to expire: the common case on a short tick
+        start = time.perf_counter()
+        manager.cleanup_sessions(max_age_hours=args.ttl_hours)
+        idle_s = time.perf_counter() - start
+        manager.close()
+
+    assert sorted(heap_expired) == sorted(legacy_expired)
+    result = {
+        "benchmark": "session_expiry",
+        "sessions": args.sessions,
+        "expired": len(heap_expired),
+        "populate_s": round(populate_s, 2),
+        "legacy_scan_ms": round(legacy_s * 1000, 2),
+        "legacy_scan_peak_alloc_kb": round(legacy_peak / 1024, 1),
+        "heap_sweep_ms": round(heap_s * 1000, 2),
+        "heap_sweep_peak_alloc_kb": round(heap_peak / 1024, 1),
+        "heap_idle_sweep_us": round(idle_s * 1e6, 2),
+        "expiry_heap_mb": round(heap_size / 1024 / 1024, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Session persistence benchmark: full `sessions.json` rewrites (the previous
+behaviour) vs. the append-only journal with group commit.
+
+Measures the persistence cost of one `/chat` turn (two `add_message` calls)
+against stores pre-populated with 1k/10k/100k sessions.
+
+    python benchmarks/bench_session_store.py --sessions 1000 10000 100000 --out session_store.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.session import SessionData, SessionManager
+
+
+def populate(manager: SessionManager, n_sessions: int, history_len: int):
+    for _ in range(n_sessions):
+        sid = str(uuid.uuid4())
+        manager._sessions[sid] = SessionData(
+            session_id=sid,
+            title="Police refused to register FIR",
+            history=[
+                {"role": "user" if i % 2 == 0 else "model", "content": "What is section 154 CrPC? " * 8}
+                for i in range(history_len)
+            ],
+        )
+    manager._save_sessions()
+
+
+def legacy_save(manager: SessionManager, path: str):
+    """The pre-journal `_save_sessions`: re-serializes every session on each mutation."""
+    data = {}
+    for session_id, session in manager._sessions.items():
+        data[session_id] = session.model_dump(mode='json')
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def summarize(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "iterations": len(samples),
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def bench(n_sessions: int, history_len: int, iterations: int, legacy_iterations: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SessionManager(storage_file=os.path.join(tmp, "sessions.json"),
+                                 compact_after=10**9)
+        populate(manager, n_sessions, history_len)
+        sid = next(iter(manager._sessions))
+
+        # Previous behaviour: one full rewrite per add_message
+        legacy_path = os.path.join(tmp, "legacy.json")
+        legacy = []
+        for _ in range(legacy_iterations):
+            start = time.perf_counter()
+            for role in ("user", "model"):
+                manager._sessions[sid].history.append(role, "Reply " * 20)
+                manager._sessions[sid].last_active = datetime.now()
+                legacy_save(manager, legacy_path)
+            legacy.append(time.perf_counter() - start)
+
+        # Journal: append both events, then a worst-case group commit of one turn
+        journal = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            manager.add_message(sid, "user", "Reply " * 20)
+            manager.add_message(sid, "model", "Reply " * 20)
+            manager.flush()
+            journal.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        manager._save_sessions()
+        compaction = time.perf_counter() - start
+        manager.close()
+
+        return {
+            "sessions": n_sessions,
+            "history_len": history_len,
+            "legacy_full_rewrite": summarize(legacy),
+            "journal_group_commit": summarize(journal),
+            "snapshot_compaction_ms": round(compaction * 1000, 3),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--history-len", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--legacy-iterations", type=int, default=5)
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sessions:
+        result = bench(n, args.history_len, args.iterations, args.legacy_iterations)
+        print(f"{n:>7} sessions | legacy p50 {result['legacy_full_rewrite']['p50_ms']:>10} ms"
+              f" | journal p50 {result['journal_group_commit']['p50_ms']:>8} ms"
+              f" | compaction {result['snapshot_compaction_ms']} ms")
+        results.append(result)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"benchmark": "session_store", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Cold-start cost of the server, each run in a fresh interpreter.
+
+- `import`: `import main` on its own. Agents and sessions are deferred, so this
+  should not load ADK or the Google SDKs.
+- `eager`: `import main` plus building the agents and loading the sessions.
+  This is the work that used to happen before the server could answer anything.
+- `serve`: starts `uvicorn main:app` and polls it. Reports the time from spawn
+  to the first `200` from `/healthz` and from `/`, and to `/readyz` turning
+  ready (sessions loaded, agents built).
+
+The session store is a temporary snapshot of `--sessions` sessions with
+`--turns` turns each; the model backend is the fake one.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --sessions 20000 --runs 5 --out startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import ROOT, write_result
+
+sys.path.insert(0, ROOT)
+
+IMPORT_SNIPPET = """
+import sys, time, json
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+if {eager}:
+    main.orchestrator.warm_up()
+    main.session_manager.load()
+print(json.dumps({{"in_process_s": time.perf_counter() - start, "import_s": imported,
+                  "adk_loaded": "google.adk" in sys.modules, "modules": len(sys.modules),
+                  "sessions": len(main.session_manager)}}))
+"""
+
+
+def write_sessions(path: str, sessions: int, turns: int):
+    from utils.session import SessionManager
+
+    manager = SessionManager(storage_file=path)
+    for i in range(sessions):
+        session_id = manager.create_session()
+        manager.update_title(session_id, f"Startup session {i}")
+        for turn in range(turns):
+            manager.add_message(session_id, "user", f"Question {turn}: my landlord has not returned my deposit.")
+            manager.add_message(session_id, "model", "You can send a legal notice and approach the civil court. " * 4)
+    manager._save_sessions()
+    manager.close()
+
+
+def run_import(env: dict, eager: bool) -> dict:
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET.format(eager=eager)], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    wall = time.perf_counter() - start
+    result = json.loads(out.strip().splitlines()[-1])
+    result["wall_s"] = wall
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def run_serve(env: dict, timeout: float) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    marks = {}
+    try:
+        while time.perf_counter() - start < timeout and len(marks) < 3:
+            for name, path in (("healthz_s", "/healthz"), ("index_s", "/"), ("ready_s", "/readyz")):
+                if name not in marks and _status(base + path) == 200:
+                    marks[name] = time.perf_counter() - start
+            time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return marks
+
+
+def summarize(runs: list) -> dict:
+    keys = [k for k, v in runs[0].items() if isinstance(v, float)]
+    summary = {f"{k[:-2]}_ms": round(statistics.median(r[k] for r in runs if k in r) * 1000, 1) for k in keys}
+    summary.update({k: v for k, v in runs[0].items() if not isinstance(v, float)})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per measurement (medians are reported)")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=60, help="Give up on a server that is not ready by then")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "sessions.json")
+        write_sessions(store, args.sessions, args.turns)
+        env = {**os.environ, "LLM_BACKEND": "fake", "SESSION_STORE_FILE": store, "TRACE_SAMPLE_RATE": "0"}
+
+        result = {
+            "benchmark": "startup",
+            "config": {"runs": args.runs, "sessions": args.sessions, "turns": args.turns,
+                       "store_mb": round(os.path.getsize(store) / 1e6, 1)},
+            "import": summarize([run_import(env, eager=False) for _ in range(args.runs)]),
+            "eager": summarize([run_import(env, eager=True) for _ in range(args.runs)]),
+            "serve": summarize([run_serve(env, args.timeout) for _ in range(args.runs)]),
+        }
+    write_result(result, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Build, open and query cost of the memory-mapped statute index.
+
+The bundled corpus is replicated (with renumbered sections and a few varied
+words) up to `--sections`, so scaling can be measured without the full Acts.
+Reports build time and file size, time to open the index (what start-up pays),
+exact section lookup and BM25 search per call, and RSS before and after opening.
+
+    python benchmarks/bench_statute_index.py
+    python benchmarks/bench_statute_index.py --sections 100000 --out statutes.json
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import ROOT, rss_mb, time_per_op, write_result
+
+sys.path.insert(0, ROOT)
+
+QUERIES = ["punishment for cheating", "anticipatory bail", "husband cruelty dowry", "arrest without warrant",
+           "criminal breach of trust property", "defamation reputation imputation"]
+FILLER = "tenant landlord deposit salary employer cheque notice consumer complaint vehicle accident".split()
+
+
+def synthetic_corpus(n_sections: int, seed: int) -> list:
+    from tools.statutes import load_corpus
+
+    base = load_corpus()
+    rng = random.Random(seed)
+    sections = []
+    for i in range(n_sections):
+        s = base[i % len(base)]
+        copy = i // len(base)
+        if copy == 0:
+            sections.append(s)
+            continue
+        extra = " ".join(rng.choices(FILLER, k=4))
+        sections.append(s.model_copy(update={"section": f"{s.section}X{copy}", "text": f"{s.text} {extra}"}))
+    return sections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=10000, help="Corpus size after replication")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    from tools.statutes import StatuteIndex, build_index
+
+    sections = synthetic_corpus(args.sections, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "statutes.idx")
+        start = time.perf_counter()
+        build_index(sections, path)
+        build_s = time.perf_counter() - start
+
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        index = StatuteIndex(path)
+        open_ms = (time.perf_counter() - start) * 1000
+        rss_after = rss_mb()
+
+        keys = [(s.act, s.section) for s in sections]
+        state = {"i": 0}
+
+        def lookup():
+            state["i"] += 1
+            index.section(*keys[state["i"] % len(keys)])
+
+        def lookup_query():
+            index.lookup("What is section 498A of the Indian Penal Code?")
+
+        def search():
+            state["i"] += 1
+            index.search(QUERIES[state["i"] % len(QUERIES)], limit=3)
+
+        result = {
+            "benchmark": "statute_index",
+            "config": {"sections": args.sections, "seed": args.seed},
+            "build_s": round(build_s, 3),
+            "index_mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+            "terms": index.n_terms,
+            "open_ms": round(open_ms, 3),
+            "rss_mb": {"before_open": rss_before, "after_open": rss_after},
+            "section_lookup": time_per_op(lookup, number=5000),
+            "query_lookup": time_per_op(lookup_query, number=5000),
+            "bm25_search": time_per_op(search, number=200),
+        }
+        index.close()
+    write_result(result, args.out)
+
+
+if __name__ == "__main__":
+    main()
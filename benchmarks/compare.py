@@ -0,0 +1,52 @@
+"""
+Diffs two benchmark result files (from any script's `--out`) leaf by leaf.
+
+    python benchmarks/compare.py before.json after.json
+    python benchmarks/compare.py before.json after.json --threshold 5
+
+Prints every numeric value present in both files with its relative change;
+`--threshold` hides changes smaller than that many percent.
+"""
+import argparse
+import json
+
+
+def flatten(data, prefix: str = "") -> dict:
+    flat = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == "meta":
+                continue
+            flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix] = data
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.0, help="Hide changes below this percentage")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before: {before.get('meta', {}).get('commit')}  after: {after.get('meta', {}).get('commit')}")
+    old, new = flatten(before), flatten(after)
+    width = max((len(k) for k in old if k in new), default=10)
+    for key in old:
+        if key not in new:
+            continue
+        a, b = old[key], new[key]
+        change = (b - a) / a * 100 if a else (0.0 if b == a else float("inf"))
+        if abs(change) < args.threshold:
+            continue
+        print(f"{key:<{width}}  {a:>12g}  {b:>12g}  {change:+8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
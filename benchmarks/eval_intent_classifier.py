@@ -0,0 +1,77 @@
+"""
+Offline evaluation of the local intent pre-classifier against LLM labels.
+
+Input is a JSONL file with one labelled query per line:
+    {"query": "...", "intent": "info|legal_advice|clarify", "llm_ms": 1420}
+`intent` is the label the LLM analyzer produced; `llm_ms` (optional) is the
+analyzer round-trip it took, otherwise `--llm-ms` is used.
+
+    python benchmarks/eval_intent_classifier.py benchmarks/data/intent_labels.sample.jsonl
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.classifier import INTENTS, IntentClassifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("labels", help="JSONL file of LLM-labelled queries")
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--llm-ms", type=float, default=1500, help="Analyzer latency when a row has no llm_ms")
+    parser.add_argument("--repeat", type=int, default=200, help="Timing repetitions per query")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    classifier = IntentClassifier(threshold=args.threshold)
+    rows = [json.loads(line) for line in open(args.labels, encoding="utf-8") if line.strip()]
+
+    correct = confident = confident_correct = 0
+    saved_ms = []
+    timings = []
+    confusion = {label: Counter() for label in INTENTS}
+    for row in rows:
+        intent, confidence = classifier.classify(row["query"])
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            classifier.classify(row["query"])
+        timings.append((time.perf_counter() - start) / args.repeat * 1e6)
+
+        confusion[row["intent"]][intent] += 1
+        correct += intent == row["intent"]
+        if confidence >= args.threshold:
+            confident += 1
+            confident_correct += intent == row["intent"]
+            # A local decision saves the analyzer round-trip, minus the classifier's own cost
+            saved_ms.append(row.get("llm_ms", args.llm_ms) - timings[-1] / 1000)
+        else:
+            saved_ms.append(0.0)
+
+    n = len(rows)
+    result = {
+        "benchmark": "intent_classifier",
+        "queries": n,
+        "threshold": args.threshold,
+        "accuracy_all": round(correct / n, 4),
+        "coverage": round(confident / n, 4),
+        "accuracy_confident": round(confident_correct / confident, 4) if confident else None,
+        "classifier_p50_us": round(statistics.median(timings), 2),
+        "classifier_max_us": round(max(timings), 2),
+        "mean_saved_ms_per_request": round(sum(saved_ms) / n, 1),
+        "confusion": {label: dict(c) for label, c in confusion.items()},
+    }
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Fuzzer for `agents.json_stream.JSONStream`, the incremental parser behind the
+research agent's streamed output.
+
+Random JSON objects (nested containers, escapes, non-ASCII and astral
+characters, numbers in every notation) are wrapped the way models wrap them
+(bare, ```json fences, prose around the object, prose with braces before it)
+and fed in random chunk sizes. Checked for each case:
+
+- `complete`: `close()` equals `json.loads` of the object; the streamed
+  `summary` deltas join to the full summary; `item` and `field` events match
+  the object's top-level arrays and fields, in order
+- `chunking`: the events are the same whatever the chunk boundaries
+- `truncated`: the output cut at a random point never raises; streamed text
+  is a prefix of the summary, every reported item is a real one, and the
+  repaired object only holds keys of the original
+- `mutated`: random characters inserted, deleted or replaced never raise
+
+Exits with status 1 on any failure and prints the failing inputs.
+
+    python benchmarks/fuzz_json_stream.py
+    python benchmarks/fuzz_json_stream.py --cases 20000 --seed 7 --out fuzz.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import ROOT, write_result
+
+sys.path.insert(0, ROOT)
+
+from agents.json_stream import JSONStream
+
+ALPHABET = 'abc XYZ 0189 .,:;{}[]"\\/\'\n\t\r\b\f é ñ 漢字 😀   \x01 ₹ §'
+
+
+def random_string(rng: random.Random, max_len: int = 40) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_len)))
+
+
+def random_number(rng: random.Random):
+    kind = rng.randint(0, 3)
+    if kind == 0:
+        return rng.randint(-10**6, 10**6)
+    if kind == 1:
+        return rng.uniform(-1e3, 1e3)
+    if kind == 2:
+        return rng.choice([0, -0.0, 1e-9, 2.5e21, -1.25e-5])
+    return rng.randint(0, 9)
+
+
+def random_value(rng: random.Random, depth: int):
+    kind = rng.randint(0, 6 if depth < 3 else 3)
+    if kind == 0:
+        return random_string(rng)
+    if kind == 1:
+        return random_number(rng)
+    if kind == 2:
+        return rng.choice([True, False, None])
+    if kind == 3:
+        return random_string(rng, 8)
+    if kind == 4:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {random_string(rng, 10): random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+
+
+def random_document(rng: random.Random) -> dict:
+    doc = {random_string(rng, 10): random_value(rng, 1) for _ in range(rng.randint(0, 3))}
+    doc["summary"] = random_string(rng, 400)
+    doc["relevant_judgments"] = [
+        {"title": random_string(rng), "url": "https://indiankanoon.org/doc/" + str(rng.randint(1, 10**7)) + "/",
+         "snippet": random_string(rng), "source": random_string(rng, 12)}
+        for _ in range(rng.randint(0, 5))
+    ]
+    doc["key_facts"] = [random_string(rng) for _ in range(rng.randint(0, 4))]
+    keys = list(doc)
+    rng.shuffle(keys)
+    return {k: doc[k] for k in keys}
+
+
+def serialize(rng: random.Random, doc: dict) -> str:
+    return json.dumps(doc, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, None, 2, 4]),
+                      separators=rng.choice([None, (",", ":"), (", ", ": ")]) if rng.random() < 0.5 else None)
+
+
+def wrap(rng: random.Random, body: str) -> str:
+    style = rng.randint(0, 4)
+    if style == 0:
+        return body
+    if style == 1:
+        return f"```json\n{body}\n```"
+    if style == 2:
+        return f"Here is the answer:\n```json\n{body}\n```\nLet me know if you need more help."
+    if style == 3:
+        return f"I searched {{twice}} and [found] this: {body} — hope it helps }}"
+    return f"{body}\n\nNote: sections may have {{changed}}."
+
+
+def split(rng: random.Random, text: str) -> list:
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.choice([1, 2, 3, 7, 16, 64, 500])
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+def run(chunks: list):
+    parser = JSONStream(stream_fields=("summary",))
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return parser, events, parser.close()
+
+
+def streamed(events: list, kind: str, key: str = None) -> list:
+    return [value for k, field, value in events if k == kind and (key is None or field == key)]
+
+
+def check_complete(rng: random.Random, doc: dict, text: str) -> str:
+    parser, events, data = run(split(rng, text))
+    if data != doc:
+        return "object differs"
+    if "".join(streamed(events, "text")) != doc["summary"]:
+        return "streamed summary differs"
+    items = [(field, value) for kind, field, value in events if kind == "item"]
+    expected = [(k, v) for k, vs in doc.items() if isinstance(vs, list) for v in vs]
+    if items != expected:
+        return "items differ"
+    fields = {field: value for kind, field, value in events if kind == "field"}
+    if fields != doc or parser.truncated:
+        return "fields differ"
+    _, whole_events, _ = run([text])
+    if _normalize(whole_events) != _normalize(events):
+        return "chunking changes events"
+    return ""
+
+
+def _normalize(events: list) -> list:
+    """Joins consecutive text deltas, which legitimately depend on chunk boundaries."""
+    out = []
+    for kind, field, value in events:
+        if kind == "text" and out and out[-1][0] == "text":
+            out[-1] = ("text", field, out[-1][2] + value)
+        else:
+            out.append((kind, field, value))
+    return out
+
+
+def check_truncated(rng: random.Random, doc: dict, text: str) -> str:
+    cut = rng.randint(0, len(text))
+    parser, events, data = run(split(rng, text[:cut]))
+    if not doc["summary"].startswith("".join(streamed(events, "text"))):
+        return "streamed text is not a prefix of the summary"
+    for kind, field, value in events:
+        if kind == "item" and value not in doc.get(field, []):
+            return "reported an item that is not in the object"
+        if kind == "field" and doc.get(field) != value:
+            return "reported a wrong field"
+    if data is not None:
+        if not isinstance(data, dict) or not set(data) <= set(doc):
+            return "repaired object has foreign keys"
+        for judgment in data.get("relevant_judgments", []):
+            if judgment not in doc["relevant_judgments"]:
+                return "repaired object kept a half-written judgment"
+    return ""
+
+
+def check_mutated(rng: random.Random, text: str) -> str:
+    chars = list(text)
+    for _ in range(rng.randint(1, 5)):
+        if not chars:
+            break
+        at = rng.randrange(len(chars))
+        action = rng.randint(0, 2)
+        if action == 0:
+            chars.insert(at, rng.choice('{}[]",:\\ ntf0-.e'))
+        elif action == 1:
+            del chars[at]
+        else:
+            chars[at] = rng.choice('{}[]",:\\x')
+    data = run(split(rng, "".join(chars)))[2]
+    if data is not None and not isinstance(data, dict):
+        return "result is not an object"
+    return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=5000, help="Random documents (each runs every check)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--show", type=int, default=5, help="Failing inputs to print")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    checks = ("complete", "truncated", "mutated")
+    failures = {name: 0 for name in checks}
+    crashes = 0
+    examples = []
+    start = time.perf_counter()
+    for case in range(args.cases):
+        doc = random_document(rng)
+        text = wrap(rng, serialize(rng, doc))
+        for name in checks:
+            try:
+                if name == "complete":
+                    problem = check_complete(rng, doc, text)
+                elif name == "truncated":
+                    problem = check_truncated(rng, doc, text)
+                else:
+                    problem = check_mutated(rng, text)
+            except Exception as e:
+                crashes += 1
+                problem = f"raised {type(e).__name__}: {e}"
+            if problem:
+                failures[name] += 1
+                if len(examples) < args.show:
+                    examples.append({"case": case, "check": name, "problem": problem, "text": text[:2000]})
+
+    result = {
+        "benchmark": "json_stream_fuzz",
+        "config": {"cases": args.cases, "seed": args.seed},
+        "failures": failures,
+        "crashes": crashes,
+        "seconds": round(time.perf_counter() - start, 2),
+        "examples": examples,
+    }
+    write_result(result, args.out)
+    if any(failures.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
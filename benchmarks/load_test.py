@@ -0,0 +1,244 @@
+"""
+In-process load test of the HTTP API on the fake LLM backend.
+
+Starts `main:app` behind an ASGI transport (no sockets, no Google calls),
+pre-populates sessions with chat history, then drives a weighted mix of
+`POST /chat`, `GET /chat/{id}/history` and `GET /sessions/{id}` from
+`--concurrency` concurrent clients. Reports throughput, per-endpoint
+p50/p95/p99 latency, event-loop lag and RSS growth.
+
+Server output (agent prints, trace logs) is sent to /dev/null so the
+numbers include formatting costs without flooding the terminal.
+
+    python benchmarks/load_test.py --requests 5000 --concurrency 64 --sessions 500 --history-turns 20
+    python benchmarks/load_test.py --mix chat=1 --latency-ms 200 --out before.json
+    python benchmarks/load_test.py --mix history=1 --history-turns 100 --history-limit 30 --revalidate
+    python benchmarks/load_test.py --cassette cassettes/prod.jsonl.gz --time-scale 1.0
+"""
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import ROOT, latency_summary, peak_rss_mb, rss_mb, write_result
+
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("chat", "history", "session"):
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic `asyncio.sleep` wakes up: a direct read of event-loop blocking."""
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+
+def populate(session_manager, n_sessions: int, history_turns: int) -> list:
+    session_ids = []
+    for i in range(n_sessions):
+        session_id = session_manager.create_session()
+        session_manager.update_title(session_id, f"Load test session {i}")
+        for turn in range(history_turns):
+            session_manager.add_message(session_id, "user", f"Question {turn}: my landlord has not returned my deposit of Rs {turn}0,000.")
+            session_manager.add_message(session_id, "model", "You can send a legal notice and then approach the civil court or consumer forum. " * 3)
+        session_ids.append(session_id)
+    session_manager.flush()
+    return session_ids
+
+
+async def drive(main, session_ids: list, args) -> dict:
+    import httpx
+
+    rng = random.Random(args.seed)
+    endpoints = list(args.mix)
+    weights = [args.mix[e] for e in endpoints]
+    latencies = {e: [] for e in endpoints}
+    statuses = Counter()
+    history_bytes = []
+    etags = {}
+    remaining = args.requests
+    counter = 0
+
+    async def one(client, endpoint: str, i: int):
+        session_id = rng.choice(session_ids)
+        start = time.perf_counter()
+        if endpoint == "chat":
+            response = await client.post("/chat", json={
+                "message": f"My employer has not paid my salary for {i % 12 + 1} months, what can I do? (#{i})",
+                "session_id": session_id,
+            })
+        elif endpoint == "history":
+            # Like the browser: gzip accepted, and with --revalidate the last ETag per session is sent back
+            headers = {"Accept-Encoding": "gzip"}
+            if args.revalidate and session_id in etags:
+                headers["If-None-Match"] = etags[session_id]
+            params = {"limit": args.history_limit} if args.history_limit else None
+            response = await client.get(f"/chat/{session_id}/history", params=params, headers=headers)
+            if "etag" in response.headers:
+                etags[session_id] = response.headers["etag"]
+            history_bytes.append(response.num_bytes_downloaded)
+        else:
+            response = await client.get(f"/sessions/{session_id}")
+        latencies[endpoint].append(time.perf_counter() - start)
+        statuses[f"{endpoint}:{response.status_code}"] += 1
+
+    async def worker(client):
+        nonlocal remaining, counter
+        while remaining > 0:
+            remaining -= 1
+            counter += 1
+            await one(client, rng.choices(endpoints, weights)[0], counter)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        # Warm-up requests are not measured
+        for i in range(args.warmup):
+            await one(client, endpoints[i % len(endpoints)], -i)
+        for values in latencies.values():
+            values.clear()
+        statuses.clear()
+        history_bytes.clear()
+
+        flush_task = asyncio.create_task(main.run_journal_flush_task())
+        monitor = LoopLagMonitor()
+        monitor.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        wall = time.perf_counter() - start
+        await monitor.stop()
+        flush_task.cancel()
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(total / wall, 1) if wall else 0.0,
+        "latency": {endpoint: latency_summary(values) for endpoint, values in latencies.items()},
+        "status_codes": dict(statuses),
+        "history_bytes_per_response": round(sum(history_bytes) / len(history_bytes), 1) if history_bytes else None,
+        "loop_lag": latency_summary(monitor.samples),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--sessions", type=int, default=200, help="Sessions created before the run")
+    parser.add_argument("--history-turns", type=int, default=10, help="User/model message pairs per session")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("chat=2,history=6,session=2"),
+                        help="Endpoint weights, e.g. chat=2,history=6,session=2")
+    parser.add_argument("--history-limit", type=int, default=0,
+                        help="Page size for history requests (0 fetches the whole history)")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="Send each session's last history ETag as If-None-Match")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Fake LLM median latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="Fake LLM log-normal latency shape")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake LLM error rate")
+    parser.add_argument("--cassette", help="Replay recorded model traffic from this cassette instead of the fake backend")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier for recorded latencies when replaying")
+    parser.add_argument("--search-latency-ms", type=float,
+                        help="Run the multi-query search stage on the fixture backend with this latency per query")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.cassette:
+        os.environ["LLM_BACKEND"] = "cassette"
+        os.environ["CASSETTE_MODE"] = "replay"
+        os.environ["CASSETTE_FILE"] = args.cassette
+        os.environ["CASSETTE_TIME_SCALE"] = str(args.time_scale)
+    else:
+        os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_LATENCY_SIGMA"] = str(args.latency_sigma)
+    os.environ["FAKE_LLM_ERROR_RATE"] = str(args.error_rate)
+    os.environ["FAKE_LLM_SEED"] = str(args.seed)
+    if args.search_latency_ms is not None:
+        os.environ["SEARCH_BACKEND"] = "fixture"
+        os.environ["SEARCH_FIXTURE_LATENCY_MS"] = str(args.search_latency_ms)
+
+    rss_start = rss_mb()
+    with open(os.devnull, "w") as devnull, tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(devnull):
+            import main
+            from utils.session import SessionManager
+
+            # Logging is configured on import (utils.tracing), so redirect its handlers afterwards
+            for handler in logging.getLogger().handlers:
+                if isinstance(handler, logging.StreamHandler):
+                    handler.setStream(devnull)
+
+            rss_imported = rss_mb()
+            main.session_manager = SessionManager(storage_file=os.path.join(tmp, "sessions.json"))
+            session_ids = populate(main.session_manager, args.sessions, args.history_turns)
+            rss_populated = rss_mb()
+
+            run = asyncio.run(drive(main, session_ids, args))
+            rss_end = rss_mb()
+            main.session_manager.close()
+
+    result = {
+        "benchmark": "load_test",
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "sessions": args.sessions,
+            "history_turns": args.history_turns,
+            "mix": args.mix,
+            "history_limit": args.history_limit,
+            "revalidate": args.revalidate,
+            "fake_latency_ms": args.latency_ms,
+            "fake_latency_sigma": args.latency_sigma,
+            "fake_error_rate": args.error_rate,
+            "cassette": args.cassette,
+            "time_scale": args.time_scale if args.cassette else None,
+            "search_latency_ms": args.search_latency_ms,
+        },
+        **run,
+        "rss_mb": {
+            "start": rss_start,
+            "after_import": rss_imported,
+            "after_populate": rss_populated,
+            "end": rss_end,
+            "growth_during_run": round(rss_end - rss_populated, 1),
+            "peak": peak_rss_mb(),
+        },
+    }
+    write_result(result, args.out)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,155 @@
+"""
+Microbenchmarks for hot helpers on the `/chat` path:
+
+- `SessionManager` persistence: journaling a message, group-committing a batch,
+  writing a full snapshot and loading (snapshot + journal replay) at start-up.
+- History prompt formatting in the analyzer and summarizer.
+- `ResearchAgent` JSON extraction from fenced, bare, prose-wrapped and invalid output.
+
+    python benchmarks/microbench.py --sessions 10000 --history-turns 20 --out micro.json
+    python benchmarks/microbench.py --only prompts,json
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import ROOT, time_per_op, write_result
+
+sys.path.insert(0, ROOT)
+os.environ["LLM_BACKEND"] = "fake"
+
+GROUPS = ("session", "prompts", "json")
+
+
+def make_history(turns: int) -> list:
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"Question {turn}: my landlord has not returned my deposit of Rs {turn}0,000. What can I do?"})
+        history.append({"role": "model", "content": "You can send a legal notice under the rent agreement and then approach the civil court. " * 4})
+    return history
+
+
+def bench_session(n_sessions: int, history_turns: int) -> dict:
+    from utils.session import SessionManager
+
+    results = {}
+    history = make_history(history_turns)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.json")
+        manager = SessionManager(storage_file=path, compact_after=10**9, max_pending=10**9)
+        for _ in range(n_sessions):
+            session_id = manager.create_session()
+            for message in history:
+                manager.add_message(session_id, message["role"], message["content"])
+        manager.flush()
+
+        session_ids = list(manager._sessions)
+        state = {"i": 0}
+
+        def add_message():
+            state["i"] += 1
+            manager.add_message(session_ids[state["i"] % len(session_ids)], "user", "Follow-up question about my deposit?")
+        results["add_message"] = time_per_op(add_message, number=2000)
+
+        def flush_batch():
+            for sid in session_ids[:100]:
+                manager.add_message(sid, "user", "Follow-up question about my deposit?")
+            manager.flush()
+        results["journal_flush_100_events"] = time_per_op(flush_batch, number=20)
+
+        start = time.perf_counter()
+        manager._save_sessions()
+        results["snapshot_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        results["snapshot_mb"] = round(os.path.getsize(path) / 1024 / 1024, 2)
+
+        # Start-up cost: load the snapshot and replay a journal of 10k events on top
+        for i in range(10_000):
+            manager.add_message(session_ids[i % len(session_ids)], "user", "Journalled message")
+        manager.close()
+        start = time.perf_counter()
+        reloaded = SessionManager(storage_file=path, compact_after=10**9)
+        results["load_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        results["loaded_sessions"] = len(reloaded._sessions)
+        reloaded.close()
+    return results
+
+
+def bench_prompts(history_turns: int) -> dict:
+    from agents.analyzer import AnalyzerAgent
+    from agents.prompts import estimate_tokens
+    from agents.summarizer import SummarizerAgent
+    from dtos import AnalysisResult
+    from utils.messages import MessageLog
+
+    analyzer = AnalyzerAgent()
+    summarizer = SummarizerAgent()
+    history = MessageLog(make_history(history_turns))
+    query = "My employer has not paid my salary for three months, what can I do?"
+    analysis = AnalysisResult(intent="clarify", search_queries=[query], key_facts=[], relevant_judgments=[],
+                              reasoning="Needs the state and employment type")
+    # Five-thousand-character messages (the /chat limit): prompts are capped by the per-agent budgets
+    long_history = MessageLog({"role": m["role"], "content": (m["content"] + " ") * 50} for m in make_history(history_turns))
+    return {
+        "history_messages": len(history),
+        "analyzer_query_prompt": time_per_op(lambda: analyzer._build_query_prompt(query, history), number=5000),
+        "summarizer_prompt": time_per_op(lambda: summarizer._build_prompt(query, analysis, history), number=5000),
+        "analyzer_query_prompt_long": time_per_op(lambda: analyzer._build_query_prompt(query, long_history), number=2000),
+        "prompt_tokens": {
+            "analyzer": estimate_tokens(analyzer._build_query_prompt(query, history)),
+            "summarizer": estimate_tokens(summarizer._build_prompt(query, analysis, history)),
+            "analyzer_long": estimate_tokens(analyzer._build_query_prompt(query, long_history)),
+            "summarizer_long": estimate_tokens(summarizer._build_prompt(query, analysis, long_history)),
+            "history_long": sum(estimate_tokens(m["content"]) for m in long_history),
+        },
+    }
+
+
+def bench_json() -> dict:
+    from agents.backend import FakeBackend
+    from agents.researcher import ResearchAgent
+
+    researcher = ResearchAgent()
+    payload = FakeBackend().respond("What is section 420 IPC?", "research")
+    samples = {
+        "fenced": f"```json\n{payload}\n```",
+        "bare": payload,
+        "prose_wrapped": f"Here is what I found after searching:\n{payload}\nLet me know if you need more help.",
+        "invalid": "I could not find anything specific, but you should consult a lawyer. " * 5,
+    }
+    results = {}
+    # _build_report prints its findings; the cost of printing to a pipe is left out
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, text in samples.items():
+            results[name] = time_per_op(lambda: researcher._build_report("What is section 420 IPC?", text), number=2000)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5000, help="Sessions for the persistence benchmarks")
+    parser.add_argument("--history-turns", type=int, default=10, help="User/model message pairs per session")
+    parser.add_argument("--only", default=",".join(GROUPS), help=f"Comma-separated subset of: {', '.join(GROUPS)}")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    groups = [g for g in args.only.split(",") if g]
+    result = {"benchmark": "microbench", "config": {"sessions": args.sessions, "history_turns": args.history_turns}}
+    # Silence INFO logs from the agents (the fake backend warns once on creation)
+    import logging
+    logging.disable(logging.WARNING)
+    if "session" in groups:
+        result["session"] = bench_session(args.sessions, args.history_turns)
+    if "prompts" in groups:
+        result["prompts"] = bench_prompts(args.history_turns)
+    if "json" in groups:
+        result["json_extraction"] = bench_json()
+    write_result(result, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Simulation of model-call tail latency, hedging, deadlines and the circuit
+breaker, on the fake backend with heavy-tailed latencies.
+
+The fake backend answers after a log-normal latency, and `--slow-rate` of its
+calls take `--slow-factor` times longer (an upstream's occasional stuck
+request). Analyzer-style calls go through `BoundedBackend` under four policies:
+
+- `baseline`: no hedging, no deadline
+- `hedged`: a second attempt after the recent p95 latency
+- `deadline`: each call under a `--deadline-ms` request deadline
+- `breaker`: the backend's error rate jumps to `--outage-error-rate` for a
+  while; reports how fast failing calls return once the circuit opens, and
+  when it closes again after the outage
+
+    python benchmarks/sim_tail_latency.py
+    python benchmarks/sim_tail_latency.py --calls 2000 --slow-rate 0.02 --out tail.json
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import ROOT, latency_summary, write_result
+
+sys.path.insert(0, ROOT)
+
+PROMPT = "What can I do if my employer has not paid my salary?"
+
+
+def make_backend(args, hedge: bool = False, breaker=None, error_rate: float = 0.0):
+    from agents.backend import BoundedBackend, FakeBackend
+
+    fake = FakeBackend(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma, error_rate=error_rate,
+                       seed=args.seed, slow_rate=args.slow_rate, slow_factor=args.slow_factor)
+    return BoundedBackend(fake, max_concurrent=args.concurrency * 2, breaker=breaker,
+                          hedge_quantile=0.95 if hedge else None, hedge_min_delay=0.0)
+
+
+async def drive(backend, calls: int, concurrency: int, deadline: float = None) -> dict:
+    from utils.resilience import deadline_scope
+
+    latencies, failures = [], {}
+    remaining = calls
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                with deadline_scope(deadline):
+                    await backend.generate_async(PROMPT, kind="analyze_query", json_mode=True)
+            except Exception as e:
+                failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"latency": latency_summary(latencies), "failures": failures}
+
+
+async def warm_up(backend, calls: int, concurrency: int):
+    """Fills the latency window the hedging delay is derived from."""
+    await drive(backend, calls, concurrency)
+    backend.limiter.admitted = 0
+
+
+async def simulate_breaker(args) -> dict:
+    from utils.resilience import CircuitBreaker
+
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=20, window=5.0, cooldown=args.cooldown)
+    backend = make_backend(args, breaker=breaker)
+    phases = {}
+    for name, error_rate, seconds in (("healthy", 0.0, 1.0), ("outage", args.outage_error_rate, 2.0),
+                                      ("recovery", 0.0, args.cooldown + 1.0)):
+        backend.inner.error_rate = error_rate
+        latencies, outcomes, states = [], {}, set()
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    await backend.generate_async(PROMPT, kind="analyze_query", json_mode=True)
+                    outcome = "ok"
+                except Exception as e:
+                    outcome = type(e).__name__
+                latencies.append((outcome, time.perf_counter() - start))
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                states.add(breaker.state)
+                if outcome == "CircuitOpen":
+                    # Clients back off instead of spinning on fast failures
+                    await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        phases[name] = {
+            "error_rate": error_rate,
+            "outcomes": outcomes,
+            "states_seen": sorted(states),
+            "ok_latency": latency_summary([t for o, t in latencies if o == "ok"]),
+            "failure_latency": latency_summary([t for o, t in latencies if o not in ("ok", "CircuitOpen")]),
+            "short_circuit_latency": latency_summary([t for o, t in latencies if o == "CircuitOpen"]),
+        }
+    phases["final_state"] = breaker.state
+    phases["times_opened"] = breaker.opened
+    return phases
+
+
+async def run(args) -> dict:
+    results = {}
+    baseline = make_backend(args)
+    results["baseline"] = await drive(baseline, args.calls, args.concurrency)
+
+    hedged = make_backend(args, hedge=True)
+    await warm_up(hedged, 100, args.concurrency)
+    hedges = hedged._hedges.value
+    results["hedged"] = await drive(hedged, args.calls, args.concurrency)
+    results["hedged"]["hedges_fired"] = hedged._hedges.value - hedges
+    results["hedged"]["extra_load_pct"] = round(100 * results["hedged"]["hedges_fired"] / args.calls, 1)
+
+    deadline = make_backend(args)
+    results["deadline"] = await drive(deadline, args.calls, args.concurrency, deadline=args.deadline_ms / 1000)
+
+    results["breaker"] = await simulate_breaker(args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Median fake model latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Fraction of calls that are slow")
+    parser.add_argument("--slow-factor", type=float, default=20, help="How much slower the slow calls are")
+    parser.add_argument("--deadline-ms", type=float, default=300, help="Request deadline of the deadline policy")
+    parser.add_argument("--outage-error-rate", type=float, default=0.9)
+    parser.add_argument("--cooldown", type=float, default=1.0, help="Circuit breaker cooldown in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    results = asyncio.run(run(args))
+    result = {
+        "benchmark": "tail_latency",
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        **results,
+    }
+    write_result(result, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,3 +30,4 @@ class ResearchReport(BaseModel):
     key_facts: List[str]
     relevant_judgments: List[SearchResult]
     summary: str
+    error: Optional[str] = None
@@ -1,22 +1,73 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from orchestrator import Orchestrator
+from agents.backend import BoundedBackend
 from dtos import ChatRequest, ChatResponse
+from utils.admission import AdmissionController, Overloaded, SessionLocks
 from utils.session import SessionManager
+from utils.resilience import CircuitOpen, DeadlineExceeded, DeadlineMiddleware
+from tools import statutes
+from utils.startup import Readiness
+from utils.tracing import Tracer, TracingMiddleware
+from utils import http, metrics
 import os
+import json
+import math
+import secrets
+import time
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
 app = FastAPI(title="LegalAdviser-AI API")
+app.add_middleware(DeadlineMiddleware, seconds=float(os.getenv("CHAT_DEADLINE_MS", "60000")) / 1000)
+app.add_middleware(TracingMiddleware, exclude_prefixes=("/static", "/metrics", "/debug", "/healthz", "/readyz"))
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# Initialize Services
+# Initialize Services (cheap: agents are built and sessions read by the startup steps below)
 orchestrator = Orchestrator()
-session_manager = SessionManager()
+session_manager = SessionManager(storage_file=os.getenv("SESSION_STORE_FILE", "sessions.json"), load=False)
+# Bounded chat concurrency with load shedding, and one turn at a time per session
+admission = AdmissionController.from_env()
+session_locks = SessionLocks.from_env()
+SESSION_TTL_HOURS = float(os.getenv("SESSION_TTL_HOURS", "24"))
+SESSION_CLEANUP_INTERVAL_SECONDS = float(os.getenv("SESSION_CLEANUP_INTERVAL_SECONDS", "30"))
+HISTORY_MAX_PAGE = int(os.getenv("HISTORY_MAX_PAGE", "200"))
+
+# Startup steps run on worker threads once the server is listening, so `/`, `/about` and
+# health checks are served at once; endpoints that need a step wait for it (/readyz reports them)
+readiness = Readiness(timeout=float(os.getenv("STARTUP_WAIT_TIMEOUT_MS", "30000")) / 1000)
+readiness.add("sessions", lambda: session_manager.load())
+if os.getenv("WARM_UP_AGENTS", "true").lower() == "true":
+    readiness.add("agents", orchestrator.warm_up)
+
+# Expiring a user session also drops the ADK session that mirrors it
+session_manager.add_expiry_listener(orchestrator.evict_session)
+
+def _adk_session_stats() -> dict:
+    researcher = orchestrator.loaded_agent("researcher")
+    return researcher.session_service.stats() if researcher else {}
+
+def _llm_backend_stats() -> dict:
+    researcher = orchestrator.loaded_agent("researcher")
+    backend = researcher.backend if researcher else None
+    return backend.stats() if isinstance(backend, BoundedBackend) else {}
+
+# Gauges and component stats evaluated at scrape time
+metrics.LIVE_SESSIONS.set_function(lambda: len(session_manager))
+metrics.REGISTRY.register_collector("legaladviser_response_cache", lambda: orchestrator.cache.stats() if orchestrator.cache else {})
+metrics.REGISTRY.register_collector("legaladviser_singleflight", orchestrator.singleflight.stats)
+metrics.REGISTRY.register_collector("legaladviser_speculation", orchestrator.speculation_stats)
+metrics.REGISTRY.register_collector("legaladviser_adk_sessions", _adk_session_stats)
+metrics.REGISTRY.register_collector("legaladviser_admission", lambda: admission.stats() if admission else {})
+metrics.REGISTRY.register_collector("legaladviser_llm_backend", _llm_backend_stats)
+metrics.REGISTRY.register_collector("legaladviser_tools", lambda: orchestrator.search.registry.stats() if orchestrator.search else {})
 
 import asyncio
 
@@ -25,20 +76,51 @@ import asyncio
 # Background Task for Session Cleanup
 async def run_cleanup_task():
     while True:
-        await asyncio.sleep(3600) # Run every hour
-        session_manager.cleanup_sessions(max_age_hours=24)
+        # Sweeps are incremental (expiry heap), so a short tick is cheap
+        await asyncio.sleep(SESSION_CLEANUP_INTERVAL_SECONDS)
+        if not session_manager.loaded:
+            continue
+        session_manager.cleanup_sessions(max_age_hours=SESSION_TTL_HOURS)
+        researcher = orchestrator.loaded_agent("researcher")
+        if researcher:
+            researcher.session_service.expire_idle()
+
+# Background Task for group-committing the session journal
+async def run_journal_flush_task():
+    interval = float(os.getenv("SESSION_FLUSH_INTERVAL_MS", "50")) / 1000
+    while True:
+        await asyncio.sleep(interval)
+        session_manager.flush()
+        if session_manager.compaction_due:
+            # Not awaited: the snapshot is written on a thread while commits go on
+            asyncio.create_task(session_manager.compact())
 
 @app.on_event("startup")
 async def startup_event():
+    readiness.start()
     asyncio.create_task(run_cleanup_task())
+    asyncio.create_task(run_journal_flush_task())
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+@app.on_event("shutdown")
+async def shutdown_event():
+    session_manager.close()
+
+async def _ready(*steps: str):
+    """Waits for the startup steps an endpoint needs; 503 with Retry-After if they take too long."""
+    try:
+        for step in steps:
+            await readiness.wait(step)
+    except Overloaded as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers())
+
+def _validate_message(request: ChatRequest):
     if not request.message or not request.message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
     if len(request.message) > 5000:
         raise HTTPException(status_code=400, detail="Message too long")
-    
+
+def _prepare_session(request: ChatRequest) -> tuple[str, list[dict]]:
+    """Validates or creates the session, sets its title on the first turn and returns its history."""
     session_id = request.session_id
     is_new_session = False
     
@@ -47,18 +129,66 @@ async def chat_endpoint(request: ChatRequest):
         session_id = session_manager.create_session()
         is_new_session = True
         
+    # Get history
+    history = session_manager.get_history(session_id)
+    
+    # Generate Title if new session (simple heuristic: first 50 chars)
+    if is_new_session or len(history) == 0:
+        # Generate a short title from the query
+        title = " ".join(request.message.split()[:6])  # First 6 words
+        if len(title) > 40:
+            title = title[:37] + "..."
+        session_manager.update_title(session_id, title)
+    return session_id, history
+
+async def _admit(request: ChatRequest) -> list:
+    """
+    Takes the session's lock (two tabs on one session run their turns one after
+    the other), then a server admission slot. Sheds with 429/503 and Retry-After
+    instead of queueing past the configured limits. Returns the tickets to release.
+    """
+    tickets = []
     try:
-        # Get history
-        history = session_manager.get_history(session_id)
-        
-        # Generate Title if new session (simple heuristic: first 50 chars)
-        if is_new_session or len(history) == 0:
-            # Generate a short title from the query
-            title = " ".join(request.message.split()[:6])  # First 6 words
-            if len(title) > 40:
-                title = title[:37] + "..."
-            session_manager.update_title(session_id, title)
+        if request.session_id:
+            tickets.append(await session_locks.acquire(request.session_id))
+        if admission:
+            tickets.append(await admission.acquire())
+    except Overloaded as e:
+        _release(tickets)
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers())
+    except BaseException:
+        _release(tickets)
+        raise
+    return tickets
+
+def _error_status(e: Exception) -> tuple[int, dict]:
+    """Status code and headers for a failed chat turn: shedding and an open circuit say when to retry, a deadline is 504."""
+    if isinstance(e, Overloaded):
+        return e.status_code, e.headers()
+    if isinstance(e, CircuitOpen):
+        return 503, {"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    if isinstance(e, DeadlineExceeded):
+        return 504, {}
+    return 500, {}
+
+def _release(tickets: list):
+    for ticket in reversed(tickets):
+        ticket.release()
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest):
+    _validate_message(request)
+    await _ready("sessions", "agents")
+    tickets = await _admit(request)
+    try:
+        session_id, history = _prepare_session(request)
+    except BaseException:
+        _release(tickets)
+        raise
         
+    start = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+    try:
         # Process query with session_id for conversation continuity
         response = await orchestrator.process_query(request.message, history, session_id)
         
@@ -70,24 +200,168 @@ async def chat_endpoint(request: ChatRequest):
         response.session_title = session_manager.get_session(session_id).title
         return response
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        metrics.REQUEST_ERRORS.inc()
+        status_code, headers = _error_status(e)
+        raise HTTPException(status_code=status_code, detail=str(e), headers=headers or None)
+    finally:
+        metrics.IN_FLIGHT.dec()
+        metrics.CHAT_LATENCY.since(start)
+        _release(tickets)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Server-Sent Events variant of /chat. Emits a `meta` event with the session,
+    `delta` events with reply text as it is generated, a `judgment` event per
+    cited judgment as soon as it is complete, then a `final` event
+    carrying the full ChatResponse (including key_facts/relevant_judgments).
+    """
+    _validate_message(request)
+    await _ready("sessions", "agents")
+    # Admission happens before the response starts, so shedding can still answer 429/503
+    tickets = await _admit(request)
+    try:
+        session_id, history = _prepare_session(request)
+    except BaseException:
+        _release(tickets)
+        raise
+
+    async def event_stream():
+        start = time.perf_counter()
+        metrics.IN_FLIGHT.inc()
+        try:
+            yield _sse("meta", {"session_id": session_id, "session_title": session_manager.get_session(session_id).title})
+            async for event in orchestrator.process_query_stream(request.message, history, session_id):
+                if event["type"] == "delta":
+                    yield _sse("delta", {"text": event["text"]})
+                elif event["type"] == "judgment":
+                    yield _sse("judgment", event["judgment"].model_dump(mode="json"))
+                elif event["type"] == "final":
+                    response = event["response"]
+                    session_manager.add_message(session_id, "user", request.message)
+                    session_manager.add_message(session_id, "model", response.reply)
+                    response.session_id = session_id
+                    response.session_title = session_manager.get_session(session_id).title
+                    yield _sse("final", response.model_dump(mode="json"))
+        except Exception as e:
+            metrics.REQUEST_ERRORS.inc()
+            # The response has started: the status that /chat would answer goes in the event
+            status_code, headers = _error_status(e)
+            error = {"detail": str(e), "status": status_code}
+            if "Retry-After" in headers:
+                error["retry_after"] = int(headers["Retry-After"])
+            yield _sse("error", error)
+        finally:
+            metrics.IN_FLIGHT.dec()
+            metrics.CHAT_STREAM_LATENCY.since(start)
+            _release(tickets)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also releases the tickets if the stream never started (release is idempotent)
+        background=BackgroundTask(_release, tickets)
+    )
 
 @app.get("/chat/{session_id}/history")
-async def get_chat_history(session_id: str):
-    """Returns the chat history for a specific session."""
+async def get_chat_history(session_id: str, request: Request, before: Optional[int] = Query(None, ge=0),
+                           limit: Optional[int] = Query(None, ge=1, le=HISTORY_MAX_PAGE)):
+    """
+    Returns the chat history for a specific session, oldest first. With `limit`,
+    returns the `limit` messages before index `before` (default: the newest);
+    `X-Next-Before` carries the cursor for the next older page. Responses carry
+    an ETag derived from the session's version, so unchanged pages revalidate
+    with 304.
+    """
+    await _ready("sessions")
     session = session_manager.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    return session.history
+    messages, total, next_before = session_manager.get_history_page(session_id, before, limit)
+
+    # The version restarts with a recreated session id, so the creation time is part of the tag
+    stamp = f"{int(session.created_at.timestamp() * 1e6):x}"
+    page = "" if before is None and limit is None else f".{'' if before is None else min(before, total)}.{limit or ''}"
+    headers = {"Cache-Control": "private, no-cache", "X-History-Total": str(total)}
+    if next_before is not None:
+        headers["X-Next-Before"] = str(next_before)
+        headers["Link"] = f'</chat/{session_id}/history?before={next_before}&limit={limit}>; rel="next"'
+    response = http.json_response(request, messages, etag=f'W/"{stamp}.{session.version}{page}"', headers=headers)
+
+    if response.status_code == 304:
+        metrics.HISTORY_NOT_MODIFIED.inc()
+    elif "Content-Encoding" in response.headers:
+        metrics.HISTORY_COMPRESSED.inc()
+    else:
+        metrics.HISTORY_IDENTITY.inc()
+    return response
 
 @app.get("/sessions/{session_id}")
 async def get_session_info(session_id: str):
     """Returns session metadata (title)."""
+    await _ready("sessions")
     session = session_manager.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"session_id": session.session_id, "title": session.title}
 
+@app.get("/statutes/search")
+async def search_statutes(q: str, limit: int = 5, act: str = None):
+    """BM25 search over the local statute index."""
+    if orchestrator.statutes is None:
+        raise HTTPException(status_code=404, detail="Statute index disabled")
+    if act is not None and statutes.normalize_act(act) is None:
+        raise HTTPException(status_code=400, detail=f"Unknown act {act!r}; expected one of {', '.join(statutes.ACT_NAMES)}")
+    results = orchestrator.statutes.search(q, limit=max(1, min(limit, 50)), act=act)
+    return [{"score": score, **section.model_dump()} for score, section in results]
+
+@app.get("/statutes/{act}/{section}")
+async def get_statute_section(act: str, section: str):
+    """Exact section lookup, e.g. /statutes/IPC/420."""
+    if orchestrator.statutes is None:
+        raise HTTPException(status_code=404, detail="Statute index disabled")
+    found = orchestrator.statutes.section(act, section)
+    if not found:
+        raise HTTPException(status_code=404, detail="Section not found")
+    return found
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop responds. Does not wait for startup steps."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once sessions are loaded and the agents are built, 503 (with the step states) until then."""
+    readiness.start()
+    checks = readiness.status()
+    if readiness.ready:
+        return {"status": "ready", "checks": checks}
+    status = "failed" if "failed" in checks.values() else "starting"
+    return JSONResponse(status_code=503, content={"status": status, "checks": checks}, headers={"Retry-After": "1"})
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of latency histograms, counters and gauges."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/debug/traces")
+async def get_recent_traces(request: Request, limit: int = 50):
+    """
+    Returns the most recent sampled traces (newest first) from the in-memory ring buffer.
+    Off unless DEBUG_TRACES_ENABLED=true: span inputs hold users' queries and session ids.
+    """
+    if os.getenv("DEBUG_TRACES_ENABLED", "false").lower() != "true":
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = os.getenv("DEBUG_TRACES_TOKEN")
+    if token and not secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Unauthorized", headers={"WWW-Authenticate": "Bearer"})
+    return Tracer.recent_traces(limit=max(1, min(limit, 500)))
+
 # Page Routes
 @app.get("/")
 async def read_root(request: Request):
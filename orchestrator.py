@@ -1,49 +1,416 @@
-from agents.analyzer import AnalyzerAgent
-from agents.researcher import ResearchAgent
-from agents.summarizer import SummarizerAgent
-from dtos import ChatResponse
+from agents.classifier import IntentClassifier
+from dtos import AnalysisResult, ChatResponse, ResearchReport, SearchResult
+from tools.search import MultiQuerySearch
+from tools import statutes
+from tools.correspondence import STATUTE_MAPPED, get_correspondence
+from typing import TYPE_CHECKING, AsyncIterator, Callable
+from utils.cache import ResponseCache, normalize_query
+from utils.resilience import deadline_scope, within_deadline
+from utils import metrics
+from utils.singleflight import SingleFlight
+from utils.tracing import current_span, trace_span
+import asyncio
+import contextvars
 import logging
+import os
+import threading
+import time
+
+if TYPE_CHECKING:
+    from agents.analyzer import AnalyzerAgent
+    from agents.researcher import ResearchAgent
+    from agents.summarizer import SummarizerAgent
 
 logger = logging.getLogger(__name__)
 
+
+def _new_agent(name: str):
+    # Imported here: the researcher pulls in ADK and the Google SDKs, which take seconds
+    if name == "analyzer":
+        from agents.analyzer import AnalyzerAgent
+        return AnalyzerAgent()
+    if name == "researcher":
+        from agents.researcher import ResearchAgent
+        return ResearchAgent()
+    if name == "summarizer":
+        from agents.summarizer import SummarizerAgent
+        return SummarizerAgent()
+    raise ValueError(f"Unknown agent: {name}")
+
+
 class Orchestrator:
+    AGENTS = ("analyzer", "researcher", "summarizer")
+
     def __init__(self):
-        self.analyzer = AnalyzerAgent()
-        self.researcher = ResearchAgent()
-        self.summarizer = SummarizerAgent()
+        # Agents are built on first use or by `warm_up`, so the server starts without loading ADK
+        self._agents: dict = {}
+        self._agents_lock = threading.Lock()
+        self.cache = ResponseCache.from_env()
+        self.singleflight = SingleFlight()
+        # Coalesced runs serve several callers, so they get the server's deadline rather than the first caller's
+        self.shared_deadline = float(os.getenv("CHAT_DEADLINE_MS", "60000")) / 1000
+        self.classifier = IntentClassifier.from_env()
+        self.local_intents = 0
+        self.llm_intents = 0
+        self.speculative_research = os.getenv("SPECULATIVE_RESEARCH", "true").lower() == "true"
+        self.speculative_started = 0
+        self.speculative_cancelled = 0
+        self.speculative_wasted_seconds = 0.0
+        self.search = MultiQuerySearch.from_env()
+        self.statutes = statutes.StatuteIndex.from_env()
+        self.correspondence = get_correspondence()
+        self.statute_direct_answers = os.getenv("STATUTE_DIRECT_ANSWERS", "true").lower() == "true"
+        self.statute_grounding_results = int(os.getenv("STATUTE_GROUNDING_RESULTS", "2"))
+        self.statute_min_score = float(os.getenv("STATUTE_MIN_SCORE", "3.5"))
+
+    @property
+    def analyzer(self) -> "AnalyzerAgent":
+        return self._agents.get("analyzer") or self._build_agent("analyzer")
+
+    @property
+    def researcher(self) -> "ResearchAgent":
+        return self._agents.get("researcher") or self._build_agent("researcher")
+
+    @property
+    def summarizer(self) -> "SummarizerAgent":
+        return self._agents.get("summarizer") or self._build_agent("summarizer")
+
+    def _build_agent(self, name: str):
+        # The lock makes a request racing the warm-up thread wait for its agent instead of building a second one
+        with self._agents_lock:
+            agent = self._agents.get(name)
+            if agent is None:
+                start = time.perf_counter()
+                agent = self._agents[name] = _new_agent(name)
+                logger.info(f"Built {name} agent in {time.perf_counter() - start:.2f}s")
+        return agent
+
+    def loaded_agent(self, name: str):
+        """The agent if it has been built, else None (for stats and housekeeping that must not build it)."""
+        return self._agents.get(name)
+
+    @property
+    def ready(self) -> bool:
+        return all(name in self._agents for name in self.AGENTS)
+
+    def warm_up(self) -> float:
+        """Builds every agent ahead of the first request (blocking; run it on a worker thread). Returns the seconds taken."""
+        start = time.perf_counter()
+        for name in self.AGENTS:
+            getattr(self, name)
+        return time.perf_counter() - start
+
+    def evict_session(self, session_id: str):
+        """Drops the research session mirroring an expired user session, if the researcher exists."""
+        researcher = self.loaded_agent("researcher")
+        if researcher is not None:
+            researcher.evict_session(session_id)
 
+    @trace_span("Orchestrator", "process_query")
     async def process_query(self, query: str, history: list[dict] = [], session_id: str = None) -> ChatResponse:
         logger.info(f"User Query: {query}")
         
+        cached = self._cached_response(query, history)
+        if cached:
+            return cached
+        
+        direct = self._answer_from_statutes(query)
+        if direct:
+            return direct
+        
+        if history:
+            return await self._run_pipeline(query, history, session_id)
+        
+        # Identical stateless queries arriving together share one pipeline run;
+        # each caller gets its own copy of the response, and stops waiting at its own deadline
+        response = await within_deadline(self.singleflight.do(
+            normalize_query(query),
+            lambda: self._run_shared_pipeline(query, history),
+            context=contextvars.Context()
+        ))
+        return response.model_copy(deep=True)
+
+    async def _run_shared_pipeline(self, query: str, history: list[dict]) -> ChatResponse:
+        """
+        The pipeline run shared by coalesced callers. It runs in a fresh context
+        under the server's deadline, so no caller's deadline (clients can shorten
+        theirs) or trace applies to it, and in a one-off research session instead
+        of the first caller's ADK session.
+        """
+        with deadline_scope(self.shared_deadline):
+            return await self._run_pipeline(query, history)
+
+    async def _run_pipeline(self, query: str, history: list[dict], session_id: str = None) -> ChatResponse:
+        speculation = None
         try:
+            statute_context = self._statute_context(query)
             # 1. ROUTER: Analyze Query & Intent
-            analysis = self.analyzer.analyze_query(query, history)
+            analysis = self._classify_locally(query, history)
+            if analysis is None:
+                speculation = self._speculate(query, history, session_id, statute_context)
+                analysis = await self._analyze_with_llm(query, history)
             logger.info(f"Intent detected: {analysis.intent}")
+            current_span().set_attribute("intent", analysis.intent)
             
             # 2. ROUTING LOGIC
             if analysis.intent == "clarify":
+                self._discard(speculation)
                 return await self._run_clarification_flow(query, analysis, history)
             elif analysis.intent == "legal_advice":
                 # Treat legal advice as a specialized research flow
-                return await self._run_research_flow(query, analysis, history, session_id)
+                return await self._run_research_flow(query, analysis, history, session_id, speculation, statute_context)
             else: # intent == "info" or fallback
-                return await self._run_research_flow(query, analysis, history, session_id)
-        except Exception as e:
-            logger.error(f"Orchestrator Error: {e}", exc_info=True)
-            raise e
+                return await self._run_research_flow(query, analysis, history, session_id, speculation, statute_context)
+        except BaseException as e:
+            if speculation is not None:
+                speculation.cancel()
+            if isinstance(e, Exception):
+                logger.error(f"Orchestrator Error: {e}", exc_info=True)
+            raise
+
+    @trace_span("Orchestrator", "process_query_stream")
+    async def process_query_stream(self, query: str, history: list[dict] = [], session_id: str = None) -> AsyncIterator[dict]:
+        """
+        Streaming variant of `process_query`. Yields `{"type": "delta", "text": ...}` events
+        as reply text becomes available, `{"type": "judgment", "judgment": SearchResult}` for
+        each cited judgment as the researcher completes it, then
+        `{"type": "final", "response": ChatResponse}`.
+        """
+        logger.info(f"User Query (stream): {query}")
+        
+        cached = self._cached_response(query, history)
+        if cached:
+            yield {"type": "delta", "text": cached.reply}
+            yield {"type": "final", "response": cached}
+            return
+        
+        direct = self._answer_from_statutes(query)
+        if direct:
+            yield {"type": "delta", "text": direct.reply}
+            yield {"type": "final", "response": direct}
+            return
+        
+        speculation = None
+        try:
+            statute_context = self._statute_context(query)
+            analysis = self._classify_locally(query, history)
+            if analysis is None:
+                speculation = self._speculate(query, history, session_id, statute_context)
+                analysis = await self._analyze_with_llm(query, history)
+            logger.info(f"Intent detected: {analysis.intent}")
+            current_span().set_attribute("intent", analysis.intent)
+            
+            if analysis.intent == "clarify":
+                self._discard(speculation)
+                response = await self._run_clarification_flow(query, analysis, history)
+                yield {"type": "delta", "text": response.reply}
+                yield {"type": "final", "response": response}
+                return
+            
+            logger.info("Flow: Research/Legal (stream)")
+            if speculation:
+                events = speculation.events()
+            else:
+                search_context = await self._search_context(analysis)
+                events = self.researcher.research_stream(query, history, user_session_id=session_id, search_context=search_context,
+                                                         statute_context=statute_context)
+            async for event in events:
+                if event["type"] in ("delta", "judgment"):
+                    yield event
+                elif event["type"] == "report":
+                    report = event["report"]
+                    response = self._build_research_response(analysis, report)
+                    if not report.error:
+                        self._remember(query, history, response)
+                    else:
+                        response = self._degraded_response(query, history, statute_context) or response
+                    yield {"type": "final", "response": response}
+        except BaseException as e:
+            if isinstance(e, Exception):
+                logger.error(f"Orchestrator Error: {e}", exc_info=True)
+            raise
+        finally:
+            # Covers client disconnects (GeneratorExit) as well as errors
+            if speculation is not None:
+                speculation.cancel()
+
+    def _classify_locally(self, query: str, history: list[dict]) -> AnalysisResult | None:
+        """
+        Decides the intent locally when the pre-classifier is confident, so the
+        LLM analyzer round-trip can be skipped.
+        """
+        if self.classifier is not None:
+            intent, confidence = self.classifier.classify(query, history)
+            current_span().add_event("intent.local", intent=intent, confidence=round(confidence, 3))
+            if confidence >= self.classifier.threshold:
+                self.local_intents += 1
+                metrics.count_intent(intent, "local")
+                return self.classifier.to_analysis(query, intent, confidence)
+        return None
+
+    async def _analyze_with_llm(self, query: str, history: list[dict]) -> AnalysisResult:
+        self.llm_intents += 1
+        analysis = await self.analyzer.analyze_query_async(query, history)
+        metrics.count_intent(analysis.intent, "llm")
+        return analysis
+
+    def _speculate(self, query: str, history: list[dict], session_id: str = None,
+                   statute_context: str = None) -> "_Speculation | None":
+        """
+        Starts research concurrently with the LLM analyzer, betting that the intent
+        will not be "clarify" (two of the three intents go to research anyway).
+        Not used with the search stage, whose queries come from the analysis.
+        """
+        if not self.speculative_research or self.search is not None:
+            return None
+        self.speculative_started += 1
+        current_span().add_event("research.speculative_start")
+        return _Speculation(self.researcher.research_stream(query, history, user_session_id=session_id,
+                                                            statute_context=statute_context), session_id)
+
+    def _discard(self, speculation: "_Speculation | None"):
+        if speculation is None:
+            return
+        speculation.cancel()
+        if speculation.session_id:
+            # Finished or not, the research turn answers a question the user is now asked to clarify:
+            # take it out of the ADK session once the task has stopped
+            researcher, since = self.researcher, speculation.started_at
+            speculation.when_done(lambda: researcher.rollback_session(speculation.session_id, since))
+        self.speculative_cancelled += 1
+        self.speculative_wasted_seconds += speculation.elapsed()
+        current_span().add_event("research.speculative_cancel")
+        logger.info("Cancelled speculative research for clarify intent")
+
+    def speculation_stats(self) -> dict:
+        return {
+            "started": self.speculative_started,
+            "cancelled": self.speculative_cancelled,
+            "wasted_rate": round(self.speculative_cancelled / self.speculative_started, 4) if self.speculative_started else 0.0,
+            "wasted_seconds": round(self.speculative_wasted_seconds, 3),
+        }
 
     async def _run_clarification_flow(self, query: str, analysis: ChatResponse, history: list[dict]) -> ChatResponse:
         logger.info("Flow: Clarification")
-        # Summarizer is sync for now, but we can wrap it or just call it
-        reply = self.summarizer.summarize(query, analysis, history)
-        return ChatResponse(reply=reply, analysis=analysis)
+        reply = await self.summarizer.summarize_async(query, analysis, history)
+        response = ChatResponse(reply=reply, analysis=analysis)
+        if reply != self.summarizer.FALLBACK_REPLY:
+            self._remember(query, history, response)
+        return response
 
-    async def _run_research_flow(self, query: str, analysis: ChatResponse, history: list[dict], session_id: str = None) -> ChatResponse:
+    async def _run_research_flow(self, query: str, analysis: ChatResponse, history: list[dict], session_id: str = None,
+                                 speculation: "_Speculation | None" = None, statute_context: str = None) -> ChatResponse:
         logger.info("Flow: Research/Legal")
         
         # Use ResearchAgent (ADK) with session_id for conversation continuity
-        report = await self.researcher.research(query, history, user_session_id=session_id)
+        if speculation is not None:
+            report = await speculation.report()
+        else:
+            search_context = await self._search_context(analysis)
+            report = await self.researcher.research(query, history, user_session_id=session_id, search_context=search_context,
+                                                    statute_context=statute_context)
+        response = self._build_research_response(analysis, report)
+        if not report.error:
+            self._remember(query, history, response)
+            return response
+        return self._degraded_response(query, history, statute_context) or response
+
+    def _answer_from_statutes(self, query: str) -> ChatResponse | None:
+        """
+        Answers "what is section X of <Act>" and "BNS equivalent of IPC 420"
+        questions straight from the local statute data, without any model call.
+        """
+        if not self.statute_direct_answers:
+            return None
+        if self.correspondence is not None:
+            start = time.perf_counter()
+            reply = self.correspondence.answer(query)
+            statutes.STATUTE_LOOKUP_LATENCY.since(start)
+            if reply:
+                STATUTE_MAPPED.inc()
+                current_span().add_event("statute.mapping")
+                logger.info("Answered from the section correspondence table")
+                mappings = self.correspondence.mappings_for(query)
+                return ChatResponse(reply=reply, analysis=AnalysisResult(
+                    intent="info",
+                    search_queries=[],
+                    key_facts=[m.describe() for m in mappings],
+                    relevant_judgments=[],
+                    reasoning="Answered from the IPC/BNS and CrPC/BNSS correspondence table",
+                ))
+        if self.statutes is None or not statutes.is_pure_lookup(query):
+            return None
+        start = time.perf_counter()
+        section = self.statutes.lookup(query)
+        statutes.STATUTE_LOOKUP_LATENCY.since(start)
+        if section is None:
+            return None
+        statutes.STATUTE_DIRECT.inc()
+        current_span().add_event("statute.direct", act=section.act, section=section.section)
+        logger.info(f"Answered from the statute index: {section.citation}")
         
+        heading = f"{section.citation} – {section.title}"
+        analysis = AnalysisResult(
+            intent="info",
+            search_queries=[],
+            key_facts=[heading],
+            relevant_judgments=[SearchResult(title=heading, url=section.url, snippet=section.text[:200], source="Statute text")],
+            reasoning="Answered from the local statute index",
+        )
+        reply = f"**{heading}**\n\n{section.text}"
+        if section.url:
+            reply += f"\n\nSource: {section.url}"
+        return ChatResponse(reply=reply, analysis=analysis)
+
+    def _statute_context(self, query: str) -> str | None:
+        """
+        Statute text to ground research with: the section the query names, or
+        else the best BM25 matches above `statute_min_score`.
+        """
+        if self.statutes is None:
+            return None
+        start = time.perf_counter()
+        section = self.statutes.lookup(query)
+        if section is not None:
+            sections = [section] + self._counterpart_sections(section)
+        elif self.statute_grounding_results:
+            sections = [s for score, s in self.statutes.search(query, self.statute_grounding_results)
+                        if score >= self.statute_min_score]
+        else:
+            sections = []
+        statutes.STATUTE_LOOKUP_LATENCY.since(start)
+        (statutes.STATUTE_GROUNDED if sections else statutes.STATUTE_MISS).inc()
+        if not sections:
+            return None
+        current_span().add_event("statute.grounded", sections=",".join(f"{s.act} {s.section}" for s in sections))
+        return "\n\n".join(f"{s.citation} – {s.title}\n{s.text}" for s in sections)
+
+    def _counterpart_sections(self, section: statutes.StatuteSection) -> list[statutes.StatuteSection]:
+        """The same provision in the other code (IPC 420 -> BNS 318), where the index has it."""
+        if self.correspondence is None:
+            return []
+        found = []
+        for m in self.correspondence.map(section.act, section.section):
+            act, number = (m.new_act, m.new_section) if m.old_act == section.act else (m.old_act, m.old_section)
+            other = self.statutes.section(act, number.split("(", 1)[0]) if number else None
+            if other is not None and other not in found:
+                found.append(other)
+        return found
+
+    async def _search_context(self, analysis: AnalysisResult) -> str | None:
+        """
+        Runs all of the analysis' search queries concurrently and returns the merged
+        results as prompt context. None (the researcher searches on its own) when the
+        search stage is disabled or found nothing.
+        """
+        if self.search is None or not analysis.search_queries:
+            return None
+        bundle = await self.search.search(analysis.search_queries, analysis.priority_domains)
+        current_span().add_event("search.done", queries=len(bundle.queries), results=len(bundle.results),
+                                 errors=len(bundle.errors), context_chars=len(bundle.context))
+        return bundle.context or None
+
+    def _build_research_response(self, analysis: AnalysisResult, report: ResearchReport) -> ChatResponse:
         # Update analysis with facts from report
         analysis.key_facts = report.key_facts
         analysis.relevant_judgments = report.relevant_judgments
@@ -53,3 +420,88 @@ class Orchestrator:
         reply = report.summary
         
         return ChatResponse(reply=reply, analysis=analysis)
+
+    def _degraded_response(self, query: str, history: list[dict], statute_context: str = None) -> ChatResponse | None:
+        """
+        What to answer when research failed (model errors, deadline, open circuit):
+        an expired cached answer to the same question, else the statute text the
+        query was grounded with. None leaves the error report as the answer.
+        """
+        if self.cache is not None:
+            stale = self.cache.get_stale(query, history)
+            if stale is not None:
+                metrics.DEGRADED_STALE_CACHE.inc()
+                current_span().add_event("degraded", source="stale_cache")
+                logger.warning("Research failed; serving an expired cached answer")
+                return stale
+        if statute_context:
+            metrics.DEGRADED_STATUTES.inc()
+            current_span().add_event("degraded", source="statutes")
+            logger.warning("Research failed; answering with the statute text only")
+            reply = ("I could not complete the legal research for this question right now. "
+                     "These are the statutory provisions that appear to apply:\n\n" + statute_context +
+                     "\n\nPlease try again in a little while for a full answer.")
+            return ChatResponse(reply=reply, analysis=AnalysisResult(
+                intent="info",
+                search_queries=[],
+                key_facts=[line for line in statute_context.split("\n") if " – " in line],
+                relevant_judgments=[],
+                reasoning="Degraded answer: research unavailable",
+            ))
+        return None
+
+    def _cached_response(self, query: str, history: list[dict]) -> ChatResponse | None:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(query, history)
+        current_span().set_attribute("cache.hit", cached is not None)
+        if cached:
+            logger.info("Response cache hit")
+        return cached
+
+    def _remember(self, query: str, history: list[dict], response: ChatResponse):
+        # Degraded answers are never cached
+        if self.cache is None or response.analysis is None or response.analysis.reasoning == "Error in analysis":
+            return
+        self.cache.put(query, history, response)
+
+
+class _Speculation:
+    """Runs a research stream in the background and buffers its events until they are consumed."""
+    def __init__(self, events: AsyncIterator[dict], session_id: str = None):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.session_id = session_id
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._task = asyncio.create_task(self._pump(events))
+        # A discarded speculation's error is never awaited; retrieve it so asyncio does not log it as lost
+        self._task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _pump(self, events: AsyncIterator[dict]):
+        try:
+            async for event in events:
+                self._queue.put_nowait(event)
+        finally:
+            self._queue.put_nowait(None)
+
+    async def events(self) -> AsyncIterator[dict]:
+        while (event := await self._queue.get()) is not None:
+            yield event
+        # Re-raises the research stream's error, if it ended with one
+        await self._task
+
+    async def report(self) -> ResearchReport:
+        async for event in self.events():
+            if event["type"] == "report":
+                return event["report"]
+        raise RuntimeError("Speculative research ended without a report")
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def cancel(self):
+        self._task.cancel()
+
+    def when_done(self, fn: Callable[[], object]):
+        """Calls `fn()` once the research task has stopped (at once if it already has)."""
+        self._task.add_done_callback(lambda _: fn())
@@ -6,6 +6,11 @@ const newChatBtn = document.getElementById('new-chat-btn');
 
 let currentSessionId = null;
 
+// History is loaded a page at a time, newest first; older pages load as the user scrolls up
+const HISTORY_PAGE_SIZE = 30;
+let historyCursor = null;   // `before` index of the next older page, null when fully loaded
+let loadingOlder = false;
+
 // --- Session Management ---
 
 function getSessions() {
@@ -61,9 +66,21 @@ function renderHistory() {
     });
 }
 
+async function fetchHistoryPage(id, before = null) {
+    // The browser's HTTP cache revalidates these with If-None-Match, so revisiting an unchanged session costs a 304
+    const params = new URLSearchParams({ limit: HISTORY_PAGE_SIZE });
+    if (before !== null) params.set('before', before);
+    const response = await fetch(`/chat/${id}/history?${params}`);
+    if (!response.ok) return null;
+    const next = response.headers.get('X-Next-Before');
+    return { messages: await response.json(), next: next === null ? null : parseInt(next, 10) };
+}
+
 async function loadSession(id) {
     currentSessionId = id;
     localStorage.setItem('rti_current_session_id', id);
+    historyCursor = null;
+    loadingOlder = false;
 
     // Clear messages (except welcome if needed, but easier to clear all and re-fetch)
     messagesContainer.innerHTML = '';
@@ -71,14 +88,15 @@ async function loadSession(id) {
     // Add Welcome Message
     appendWelcomeMessage();
 
-    // Fetch History
+    // Fetch the newest page of history
     try {
-        const response = await fetch(`/chat/${id}/history`);
-        if (response.ok) {
-            const history = await response.json();
-            history.forEach(msg => {
+        const page = await fetchHistoryPage(id);
+        if (page && currentSessionId === id) {
+            page.messages.forEach(msg => {
                 appendMessage(msg.content, msg.role === 'user');
             });
+            historyCursor = page.next;
+            await fillViewport(id);
         }
     } catch (e) {
         console.error("Failed to load history", e);
@@ -87,6 +105,41 @@ async function loadSession(id) {
     renderHistory(); // Update active state
 }
 
+async function loadOlderMessages() {
+    // Resolves to true when a page was added
+    if (loadingOlder || historyCursor === null) return false;
+    const id = currentSessionId;
+    loadingOlder = true;
+    try {
+        const page = await fetchHistoryPage(id, historyCursor);
+        if (!page || currentSessionId !== id) return false;  // Switched sessions meanwhile
+
+        // Insert above the loaded messages (below the welcome message) without moving what the user sees
+        const main = document.getElementById('chat-container');
+        const offsetFromBottom = main.scrollHeight - main.scrollTop;
+        const anchor = messagesContainer.children[1] || null;
+        page.messages.forEach(msg => {
+            messagesContainer.insertBefore(createMessageElement(msg.content, msg.role === 'user'), anchor);
+        });
+        main.scrollTop = main.scrollHeight - offsetFromBottom;
+        historyCursor = page.next;
+        return true;
+    } catch (e) {
+        console.error("Failed to load older messages", e);
+        return false;
+    } finally {
+        if (currentSessionId === id) loadingOlder = false;
+    }
+}
+
+async function fillViewport(id) {
+    // Short pages don't scroll, so keep loading until the container can scroll or history runs out
+    const main = document.getElementById('chat-container');
+    while (currentSessionId === id && main.scrollHeight <= main.clientHeight) {
+        if (!await loadOlderMessages()) break;
+    }
+}
+
 function appendWelcomeMessage() {
     const wrapperDiv = document.createElement('div');
     wrapperDiv.className = 'flex items-start gap-4 mb-6';
@@ -105,7 +158,7 @@ function appendWelcomeMessage() {
 
 // --- Chat Logic ---
 
-function appendMessage(content, isUser = false) {
+function createMessageElement(content, isUser = false) {
     const wrapperDiv = document.createElement('div');
     wrapperDiv.className = `flex items-start gap-4 ${isUser ? 'justify-end' : ''} mb-6`;
 
@@ -130,7 +183,11 @@ function appendMessage(content, isUser = false) {
     contentDiv.appendChild(textP);
     wrapperDiv.appendChild(avatarDiv);
     wrapperDiv.appendChild(contentDiv);
-    messagesContainer.appendChild(wrapperDiv);
+    return wrapperDiv;
+}
+
+function appendMessage(content, isUser = false) {
+    messagesContainer.appendChild(createMessageElement(content, isUser));
 
     const main = document.getElementById('chat-container');
     main.scrollTop = main.scrollHeight;
@@ -162,6 +219,35 @@ function removeLoading() {
     if (loader) loader.remove();
 }
 
+function appendStreamingMessage() {
+    // Creates an empty model bubble and returns a function that re-renders it
+    appendMessage('');
+    const bubbles = messagesContainer.querySelectorAll('.prose');
+    const target = bubbles[bubbles.length - 1];
+    const main = document.getElementById('chat-container');
+    return (content) => {
+        target.innerHTML = marked.parse(content);
+        main.scrollTop = main.scrollHeight;
+    };
+}
+
+function parseSSE(buffer, onEvent) {
+    // Dispatches complete SSE frames and returns the unconsumed remainder
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = 'message';
+        let data = '';
+        frame.split('\n').forEach(line => {
+            if (line.startsWith('event:')) event = line.slice(6).trim();
+            else if (line.startsWith('data:')) data += line.slice(5).trim();
+        });
+        if (data) onEvent(event, JSON.parse(data));
+    }
+    return buffer;
+}
+
 async function sendMessage() {
     const message = userInput.value.trim();
     if (!message) return;
@@ -173,28 +259,67 @@ async function sendMessage() {
     appendLoading();
 
     try {
-        const response = await fetch('/chat', {
+        const response = await fetch('/chat/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ message: message, session_id: currentSessionId })
         });
 
-        const data = await response.json();
-        removeLoading();
-
-        if (response.ok) {
-            appendMessage(data.reply);
+        if (!response.ok || !response.body) {
+            removeLoading();
+            appendMessage("Sorry, something went wrong.");
+            return;
+        }
 
-            // Update session title if it's "New Chat"
-            let sessions = getSessions();
-            let session = sessions.find(s => s.id === currentSessionId);
-            if (session && session.title === "New Chat") {
-                session.title = message.substring(0, 30) + (message.length > 30 ? "..." : "");
-                localStorage.setItem('rti_sessions', JSON.stringify(sessions));
-                renderHistory();
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let reply = '';
+        let render = null;
+        let finished = false;
+
+        const onEvent = (event, data) => {
+            if (event === 'delta') {
+                if (!render) {
+                    removeLoading();
+                    render = appendStreamingMessage();
+                }
+                reply += data.text;
+                render(reply);
+            } else if (event === 'final') {
+                finished = true;
+                if (!render) {
+                    removeLoading();
+                    render = appendStreamingMessage();
+                }
+                // The final frame carries the authoritative reply text
+                render(data.reply);
+            } else if (event === 'error') {
+                finished = true;
+                removeLoading();
+                appendMessage("Sorry, something went wrong.");
             }
-        } else {
-            appendMessage("Sorry, something went wrong.");
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer = parseSSE(buffer + decoder.decode(value, { stream: true }), onEvent);
+        }
+
+        if (!finished) {
+            removeLoading();
+            appendMessage("Error connecting to server.");
+            return;
+        }
+
+        // Update session title if it's "New Chat"
+        let sessions = getSessions();
+        let session = sessions.find(s => s.id === currentSessionId);
+        if (session && session.title === "New Chat") {
+            session.title = message.substring(0, 30) + (message.length > 30 ? "..." : "");
+            localStorage.setItem('rti_sessions', JSON.stringify(sessions));
+            renderHistory();
         }
     } catch (error) {
         removeLoading();
@@ -208,6 +333,9 @@ async function sendMessage() {
 userInput.addEventListener('keypress', (e) => { if (e.key === 'Enter') sendMessage(); });
 sendBtn.addEventListener('click', sendMessage);
 if (newChatBtn) newChatBtn.addEventListener('click', createNewChat);
+document.getElementById('chat-container').addEventListener('scroll', (e) => {
+    if (e.target.scrollTop < 200) loadOlderMessages();
+}, { passive: true });
 
 // Init
 const savedId = localStorage.getItem('rti_current_session_id');
@@ -0,0 +1,9 @@
+"""
+Shared test setup: the offline fake model backend, and a session store in a
+temporary directory, set before `main` (or any agent) is imported.
+"""
+import os
+import tempfile
+
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("SESSION_STORE_FILE", os.path.join(tempfile.mkdtemp(prefix="legaladviser-tests-"), "sessions.json"))
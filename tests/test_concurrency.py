@@ -0,0 +1,91 @@
+"""
+Model calls must not block the event loop: N concurrent requests on the fake
+backend finish in about one model latency, not N.
+"""
+import asyncio
+import os
+import time
+
+import httpx
+
+from agents.analyzer import AnalyzerAgent
+from agents.backend import FakeBackend, set_backend
+from agents.summarizer import SummarizerAgent
+from dtos import AnalysisResult
+
+LATENCY = 0.2
+N = 10
+
+
+def _wall(coro_factory, n: int) -> float:
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(*(coro_factory(i) for i in range(n)))
+        return time.perf_counter() - start
+    return asyncio.run(run())
+
+
+def test_analyzer_calls_run_concurrently():
+    analyzer = AnalyzerAgent(backend=FakeBackend(latency_ms=LATENCY * 1000, latency_sigma=0, intent="info"))
+    wall = _wall(lambda i: analyzer.analyze_query_async(f"What is section 420 IPC? #{i}"), N)
+    assert wall < 3 * LATENCY, f"{N} analyzer calls took {wall:.2f}s"
+
+
+def test_summarizer_calls_run_concurrently():
+    summarizer = SummarizerAgent(backend=FakeBackend(latency_ms=LATENCY * 1000, latency_sigma=0))
+    analysis = AnalysisResult(intent="info", search_queries=[], key_facts=["Deposit paid in March"],
+                              relevant_judgments=[], reasoning="Cheating under section 420")
+    wall = _wall(lambda i: summarizer.summarize_async(f"Question {i}", analysis), N)
+    assert wall < 3 * LATENCY, f"{N} summarizer calls took {wall:.2f}s"
+
+
+def test_event_loop_keeps_running_during_analysis():
+    analyzer = AnalyzerAgent(backend=FakeBackend(latency_ms=LATENCY * 1000, latency_sigma=0, intent="info"))
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await analyzer.analyze_query_async("What is section 420 IPC?")
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
+
+
+def test_concurrent_chat_requests_take_about_one_request(monkeypatch):
+    monkeypatch.setenv("INTENT_CLASSIFIER_ENABLED", "false")
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "false")
+    monkeypatch.setenv("STATUTE_DIRECT_ANSWERS", "false")
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "0")
+    set_backend(FakeBackend(latency_ms=LATENCY * 1000, latency_sigma=0, intent="info"))
+    import main
+    from utils.session import SessionManager
+
+    monkeypatch.setattr(main, "session_manager", SessionManager(
+        storage_file=os.path.join(os.path.dirname(os.environ["SESSION_STORE_FILE"]), "concurrency.json")))
+    main.orchestrator.warm_up()
+
+    async def run(n: int) -> float:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def one(i: int):
+                response = await client.post("/chat", json={"message": f"What is section 420 IPC? #{i}"})
+                assert response.status_code == 200, response.text
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(n)))
+            return time.perf_counter() - start
+
+    try:
+        single = asyncio.run(run(1))
+        wall = asyncio.run(run(N))
+    finally:
+        set_backend(None)
+    assert wall < 3 * single, f"{N} requests took {wall:.2f}s, one took {single:.2f}s"
@@ -0,0 +1,102 @@
+"""
+The incremental parser behind the research agent's streamed output
+(agents/json_stream.py): events, wrappers, recovery and repair.
+"""
+import json
+import os
+import random
+import sys
+
+import pytest
+
+from agents.json_stream import JSONStream
+
+DOC = {
+    "key_facts": ["Deposit paid in March", "Landlord refuses refund"],
+    "summary": "File a complaint under Section 318(4) BNS — “cheating” — with the police.",
+    "relevant_judgments": [
+        {"title": "A v. State", "url": "https://indiankanoon.org/doc/1/", "score": 0.75},
+        {"title": "B v. State", "url": "https://indiankanoon.org/doc/2/", "score": -12},
+    ],
+    "confidence": 1.5e-3,
+    "final": True,
+}
+
+
+def _run(text: str, chunk: int = 1):
+    parser = JSONStream(stream_fields=("summary",))
+    events = []
+    for i in range(0, len(text), chunk):
+        events.extend(parser.feed(text[i:i + chunk]))
+    return parser, events, parser.close()
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 7, 64, 10_000])
+def test_events_and_result_match_json_loads(chunk):
+    text = f"Here is what I found:\n```json\n{json.dumps(DOC, indent=2, ensure_ascii=False)}\n```\nHope it helps."
+    parser, events, data = _run(text, chunk)
+    assert data == DOC and not parser.truncated
+    assert "".join(v for k, _, v in events if k == "text") == DOC["summary"]
+    assert [v for k, f, v in events if k == "item" and f == "relevant_judgments"] == DOC["relevant_judgments"]
+    assert {f: v for k, f, v in events if k == "field"} == DOC
+
+
+def test_numbers_and_escapes_split_across_chunks():
+    text = json.dumps({"n": -1234.5e6, "s": "tab\there 😀 \\u00e9"}, ensure_ascii=True)
+    for cut in range(1, len(text)):
+        parser = JSONStream()
+        parser.feed(text[:cut])
+        parser.feed(text[cut:])
+        assert parser.close() == json.loads(text), f"split at {cut}"
+
+
+def test_trailing_commas_and_raw_control_characters():
+    data = _run('{"summary": "line one\nline two", "items": [1, 2,], }')[2]
+    assert data == {"summary": "line one\nline two", "items": [1, 2]}
+
+
+def test_recovers_from_braces_in_prose_before_the_object():
+    text = 'I searched {twice} and [found] this: {"summary": "ok", "relevant_judgments": []} — done }'
+    parser, events, data = _run(text, 5)
+    assert data == {"summary": "ok", "relevant_judgments": []}
+    assert not parser.failed
+
+
+def test_malformed_after_reporting_keeps_what_was_parsed():
+    parser, events, data = _run('{"summary": "partial", "key_facts": ["a"] "oops": 1}', 4)
+    assert parser.failed and parser.truncated
+    assert data == {"summary": "partial", "key_facts": ["a"]}
+
+
+def test_truncated_output_is_repaired_without_half_written_items():
+    text = json.dumps(DOC)
+    cut = text.index('"B v. State"') + 4
+    parser, events, data = _run(text[:cut], 16)
+    assert parser.truncated
+    assert data["summary"] == DOC["summary"]
+    assert data["relevant_judgments"] == DOC["relevant_judgments"][:1]
+
+
+def test_truncated_summary_keeps_the_streamed_prefix():
+    summary = "Section 420 IPC is now Section 318(4) BNS"
+    text = json.dumps({"summary": summary})
+    cut = text.index(" now")
+    assert _run(text[:cut])[2] == {"summary": summary[:summary.index(" now")]}
+
+
+def test_no_object_gives_none():
+    assert _run("I could not find anything relevant.")[2] is None
+
+
+def test_fuzzer_finds_no_failures():
+    """A short seeded run of benchmarks/fuzz_json_stream.py's checks."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+    import fuzz_json_stream as fuzz
+
+    rng = random.Random(3)
+    for case in range(300):
+        doc = fuzz.random_document(rng)
+        text = fuzz.wrap(rng, fuzz.serialize(rng, doc))
+        assert fuzz.check_complete(rng, doc, text) == "", f"case {case}: {text[:200]!r}"
+        assert fuzz.check_truncated(rng, doc, text) == "", f"case {case}: {text[:200]!r}"
+        assert fuzz.check_mutated(rng, text) == "", f"case {case}: {text[:200]!r}"
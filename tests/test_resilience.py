@@ -0,0 +1,190 @@
+"""
+Deadlines, hedging and the circuit breaker (utils/resilience.py) and the
+model-call policy built on them (`BoundedBackend`), on the fake backend.
+"""
+import asyncio
+import time
+
+import pytest
+
+from agents.backend import BoundedBackend, FakeBackend
+from utils.resilience import (CallTimeout, CircuitBreaker, CircuitOpen, DeadlineExceeded, deadline_scope, hedged,
+                              within_deadline)
+
+
+async def _sleep(seconds: float, value: str = "done") -> str:
+    await asyncio.sleep(seconds)
+    return value
+
+
+def _open_breaker(cooldown: float = 0.0) -> CircuitBreaker:
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=2, window=30, cooldown=cooldown)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+# within_deadline
+
+def test_within_deadline_without_deadline_or_cap_just_awaits():
+    assert asyncio.run(within_deadline(_sleep(0.01))) == "done"
+
+
+def test_within_deadline_raises_call_timeout_when_the_cap_binds():
+    async def run():
+        with deadline_scope(5):
+            await within_deadline(_sleep(1), cap=0.02)
+
+    with pytest.raises(CallTimeout):
+        asyncio.run(run())
+
+
+def test_within_deadline_raises_plain_deadline_exceeded_when_the_deadline_binds():
+    async def run():
+        with deadline_scope(0.02):
+            await within_deadline(_sleep(1), cap=5)
+
+    with pytest.raises(DeadlineExceeded) as info:
+        asyncio.run(run())
+    assert not isinstance(info.value, CallTimeout)
+
+
+def test_within_deadline_fails_at_once_once_the_deadline_passed():
+    async def run():
+        with deadline_scope(0.01):
+            await asyncio.sleep(0.02)
+            start = time.perf_counter()
+            with pytest.raises(DeadlineExceeded):
+                await within_deadline(_sleep(1))
+            return time.perf_counter() - start
+
+    assert asyncio.run(run()) < 0.01
+
+
+# hedged
+
+def test_hedged_returns_the_faster_second_attempt():
+    delays = iter([1.0, 0.01])
+
+    async def run():
+        hedges = []
+        start = time.perf_counter()
+        result = await hedged(lambda: _sleep(next(delays)), delay=0.02, on_hedge=lambda: hedges.append(1))
+        return result, hedges, time.perf_counter() - start
+
+    result, hedges, elapsed = asyncio.run(run())
+    assert result == "done" and hedges == [1]
+    assert elapsed < 0.5
+
+
+# CircuitBreaker
+
+def test_breaker_opens_on_error_rate_and_fails_fast():
+    breaker = _open_breaker(cooldown=60)
+    with pytest.raises(CircuitOpen) as info:
+        breaker.check()
+    assert info.value.retry_after > 0
+    assert breaker.short_circuited == 1
+
+
+def test_breaker_lets_one_probe_through_and_closes_on_its_success():
+    breaker = _open_breaker()
+    assert breaker.check() is True
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.check() is False
+
+
+def test_breaker_reopens_when_the_probe_fails():
+    breaker = _open_breaker(cooldown=0)
+    breaker.check()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 2
+
+
+def test_released_probe_hands_the_probe_to_the_next_call():
+    breaker = _open_breaker()
+    assert breaker.check() is True
+    breaker.release_probe()
+    assert breaker.check() is True
+
+
+# BoundedBackend
+
+def _backend(latency: float, breaker=None, call_timeout=None) -> BoundedBackend:
+    return BoundedBackend(FakeBackend(latency_ms=latency * 1000, latency_sigma=0, seed=1), max_concurrent=0,
+                          call_timeout=call_timeout, breaker=breaker)
+
+
+def test_cancelled_probe_is_released():
+    breaker = _open_breaker()
+    backend = _backend(0.05, breaker)
+
+    async def run():
+        probe = asyncio.create_task(backend.generate_async("question", kind="summarize"))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # Without the release every later call would fail with CircuitOpen
+        await backend.generate_async("question", kind="summarize")
+
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_request_deadlines_do_not_open_the_breaker():
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=5, window=30, cooldown=60)
+    backend = _backend(0.05, breaker)
+
+    async def call():
+        with deadline_scope(0.005):
+            await backend.generate_async("question", kind="summarize")
+
+    async def run():
+        for _ in range(10):
+            with pytest.raises(DeadlineExceeded):
+                await call()
+
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_call_timeouts_open_the_breaker():
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=5, window=30, cooldown=60)
+    backend = _backend(0.05, breaker, call_timeout=0.005)
+
+    async def run():
+        for _ in range(5):
+            with pytest.raises(CallTimeout):
+                await backend.generate_async("question", kind="summarize")
+        with pytest.raises(CircuitOpen):
+            await backend.generate_async("question", kind="summarize")
+
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_hedging_cuts_the_heavy_tail():
+    """Simulation: 3% of calls are 20x slower; hedging after the p95 removes them from the p99."""
+    def p99(hedge: bool) -> float:
+        fake = FakeBackend(latency_ms=10, latency_sigma=0.1, seed=7, slow_rate=0.03, slow_factor=20)
+        backend = BoundedBackend(fake, max_concurrent=0, hedge_quantile=0.95 if hedge else None, hedge_min_delay=0)
+
+        async def run():
+            durations = []
+            for _ in range(150):
+                start = time.perf_counter()
+                await backend.generate_async("question", kind="analyze_query")
+                durations.append(time.perf_counter() - start)
+            return sorted(durations)[int(len(durations) * 0.99)]
+
+        return asyncio.run(run())
+
+    baseline, with_hedging = p99(False), p99(True)
+    assert with_hedging < baseline / 2, f"p99 {with_hedging * 1000:.0f} ms hedged vs {baseline * 1000:.0f} ms"
@@ -0,0 +1,123 @@
+"""
+Session persistence (utils/journal.py, utils/session.py): group commit,
+crash-safe replay of a torn journal tail, and snapshot compaction.
+"""
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from utils.journal import SessionJournal
+from utils.session import SessionManager
+
+
+def _contents(manager: SessionManager, session_id: str) -> list:
+    return [message["content"] for message in manager.get_history(session_id)]
+
+
+def test_replay_truncates_a_torn_tail(tmp_path):
+    path = str(tmp_path / "sessions.json.journal")
+    journal = SessionJournal(path)
+    for i in range(3):
+        journal.append({"op": "title", "sid": "s", "title": f"t{i}"})
+    journal.flush()
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op":"title","sid":"s","ti')   # Crash mid-write
+
+    replayed = SessionJournal(path)
+    assert [event["title"] for event in replayed.replay()] == ["t0", "t1", "t2"]
+    assert replayed.seq == 3
+    with open(path, "rb") as f:
+        assert f.read().endswith(b"\n")
+
+    # Appends after the repair start on a clean line
+    replayed.append({"op": "title", "sid": "s", "title": "t3"})
+    replayed.flush()
+    replayed.close()
+    assert [event["title"] for event in SessionJournal(path).replay()] == ["t0", "t1", "t2", "t3"]
+
+
+def test_replay_stops_at_a_corrupt_line(tmp_path):
+    path = str(tmp_path / "journal")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"op":"delete","sid":"a","seq":1}\nnot json\n{"op":"delete","sid":"b","seq":3}\n')
+    assert [event["sid"] for event in SessionJournal(path).replay()] == ["a"]
+
+
+def test_sessions_survive_a_restart_through_the_journal(tmp_path):
+    path = str(tmp_path / "sessions.json")
+    manager = SessionManager(storage_file=path)
+    sid = manager.create_session()
+    manager.add_message(sid, "user", "My landlord kept the deposit")
+    manager.add_message(sid, "model", "You can send a legal notice")
+    manager.update_title(sid, "Deposit")
+    manager.close()
+
+    reloaded = SessionManager(storage_file=path)
+    assert _contents(reloaded, sid) == ["My landlord kept the deposit", "You can send a legal notice"]
+    assert reloaded.get_session(sid).title == "Deposit"
+    assert reloaded.get_session(sid).version == 2
+
+
+def test_mutations_are_refused_before_load(tmp_path):
+    manager = SessionManager(storage_file=str(tmp_path / "sessions.json"), load=False)
+    with pytest.raises(RuntimeError):
+        manager.create_session()
+    with pytest.raises(RuntimeError):
+        manager.add_message("s", "user", "hello")
+    assert manager.flush() == 0
+
+
+def test_compaction_keeps_events_appended_while_the_snapshot_is_written(tmp_path):
+    path = str(tmp_path / "sessions.json")
+    manager = SessionManager(storage_file=path, compact_after=10)
+    sid = manager.create_session()
+    for i in range(10):
+        manager.add_message(sid, "user", f"m{i}")
+    manager.flush()
+    assert manager.compaction_due
+
+    write_snapshot = manager._write_snapshot
+
+    async def run():
+        # Messages added on the loop while the worker thread writes the snapshot
+        def slow_write(snapshot):
+            time.sleep(0.1)
+            write_snapshot(snapshot)
+        manager._write_snapshot = slow_write
+        compaction = asyncio.create_task(manager.compact())
+        await asyncio.sleep(0.02)
+        assert not manager.compaction_due
+        for i in range(3):
+            manager.add_message(sid, "model", f"during{i}")
+        manager.flush()
+        await compaction
+
+    asyncio.run(run())
+    manager.close()
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert len(snapshot[sid]["history"]) == 10
+    assert not os.path.exists(f"{path}.journal.old")
+
+    reloaded = SessionManager(storage_file=path)
+    assert _contents(reloaded, sid) == [f"m{i}" for i in range(10)] + [f"during{i}" for i in range(3)]
+
+
+def test_failed_compaction_loses_nothing(tmp_path):
+    path = str(tmp_path / "sessions.json")
+    manager = SessionManager(storage_file=path, compact_after=1)
+    sid = manager.create_session()
+    manager.add_message(sid, "user", "before")
+
+    def fail(snapshot):
+        raise OSError("disk full")
+    manager._write_snapshot = fail
+    asyncio.run(manager.compact())
+    manager.add_message(sid, "user", "after")
+    manager.close()
+
+    assert _contents(SessionManager(storage_file=path), sid) == ["before", "after"]
@@ -0,0 +1,96 @@
+"""
+The bounded ADK session store (agents/session_store.py): LRU and TTL
+eviction, trimming by whole turns and rollback of a discarded turn.
+"""
+import asyncio
+import time
+
+from google.adk.events import Event
+from google.genai import types
+
+from agents.session_store import BoundedSessionService
+
+APP, USER = "agents", "researcher"
+
+
+def _event(author: str, timestamp: float = None) -> Event:
+    event = Event(author=author, invocation_id="turn",
+                  content=types.Content(role="user" if author == "user" else "model", parts=[types.Part(text=author)]))
+    if timestamp is not None:
+        event.timestamp = timestamp
+    return event
+
+
+def _authors(service: BoundedSessionService, session_id: str) -> list:
+    return [event.author for event in service._stored(APP, USER, session_id).events]
+
+
+def _session(service: BoundedSessionService, session_id: str = "s"):
+    return asyncio.run(service.create_session(app_name=APP, user_id=USER, session_id=session_id))
+
+
+def _append(service: BoundedSessionService, session, *events: Event):
+    async def run():
+        for event in events:
+            await service.append_event(session, event)
+    asyncio.run(run())
+
+
+def test_trim_drops_whole_turns():
+    service = BoundedSessionService(max_events=4)
+    session = _session(service)
+    _append(service, session, *(_event(a) for a in ["user", "model", "user", "tool", "model", "user", "model"]))
+    assert _authors(service, "s") == ["user", "model"]
+
+
+def test_trim_never_starts_on_a_model_or_tool_event():
+    events = [_event(a) for a in ["user", "model", "tool", "model", "user", "tool", "tool", "model"]]
+    service = BoundedSessionService(max_events=5)
+    service._trim(events)
+    assert [e.author for e in events] == ["user", "tool", "tool", "model"]
+
+
+def test_trim_keeps_a_single_long_turn_whole():
+    events = [_event(a) for a in ["user", "tool", "tool", "tool", "model"]]
+    BoundedSessionService(max_events=2)._trim(events)
+    assert len(events) == 5
+
+
+def test_rollback_drops_the_events_of_the_discarded_turn():
+    service = BoundedSessionService()
+    session = _session(service)
+    _append(service, session, _event("user", 100.0), _event("model", 101.0),
+            _event("user", 200.0), _event("model", 201.0))
+    assert service.rollback(app_name=APP, user_id=USER, session_id="s", since=200.0) == 2
+    assert _authors(service, "s") == ["user", "model"]
+    assert service.rollback(app_name=APP, user_id=USER, session_id="missing", since=0) == 0
+
+
+def test_least_recently_used_session_is_evicted():
+    service = BoundedSessionService(max_sessions=2)
+    for session_id in ("a", "b"):
+        _session(service, session_id)
+    assert asyncio.run(service.get_session(app_name=APP, user_id=USER, session_id="a")) is not None
+    _session(service, "c")
+    assert not service.has_session(app_name=APP, user_id=USER, session_id="b")
+    assert service.has_session(app_name=APP, user_id=USER, session_id="a")
+    assert service.stats()["evictions"] == 1
+
+
+def test_idle_sessions_expire():
+    service = BoundedSessionService(ttl_seconds=60)
+    _session(service, "old")
+    _session(service, "new")
+    service._lru[(APP, USER, "old")] = time.monotonic() - 120
+    service._lru.move_to_end((APP, USER, "old"), last=False)
+    assert service.expire_idle() == 1
+    assert asyncio.run(service.get_session(app_name=APP, user_id=USER, session_id="old")) is None
+    assert service.has_session(app_name=APP, user_id=USER, session_id="new")
+
+
+def test_delete_session_forgets_it():
+    service = BoundedSessionService()
+    _session(service)
+    asyncio.run(service.delete_session(app_name=APP, user_id=USER, session_id="s"))
+    assert not service.has_session(app_name=APP, user_id=USER, session_id="s")
+    assert service.stats()["sessions"] == 0
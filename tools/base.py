@@ -1,17 +1,31 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any, Dict, Optional
 from pydantic import BaseModel
 
 class ToolResult(BaseModel):
-    content: Any
+    content: Any = None
     error: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = {}
 
+class ToolCall(BaseModel):
+    """A request to run a registered tool with the given arguments."""
+    name: str
+    arguments: Dict[str, Any] = {}
+
 class AgentTool(ABC):
     """
     Abstract base class for Agent Tools, inspired by the Model Context Protocol (MCP).
     Enforces a standard interface for all tools.
+
+    Runtime limits, applied by `ToolRegistry`:
+    - `timeout`: seconds before a call is abandoned with an error result.
+    - `max_concurrency`: calls of this tool allowed to run at once; the rest queue.
+    - `cache_ttl`: seconds a successful result is reused for identical arguments (0 disables caching).
     """
+    timeout: float = 10.0
+    max_concurrency: int = 8
+    cache_ttl: float = 0.0
     
     @property
     @abstractmethod
@@ -26,9 +40,23 @@ class AgentTool(ABC):
         pass
 
     @abstractmethod
-    def execute(self, **kwargs) -> ToolResult:
+    async def execute(self, **kwargs) -> ToolResult:
         """
         Execute the tool with the given arguments.
-        Returns a ToolResult object.
+        Returns a ToolResult object. Must not block the event loop.
         """
         pass
+
+class BlockingAgentTool(AgentTool):
+    """
+    Base class for tools built on blocking code (file, database or HTTP clients without
+    async support). Implement `run`; `execute` runs it in a worker thread.
+    """
+
+    @abstractmethod
+    def run(self, **kwargs) -> ToolResult:
+        """Blocking implementation of the tool."""
+        pass
+
+    async def execute(self, **kwargs) -> ToolResult:
+        return await asyncio.to_thread(self.run, **kwargs)
@@ -0,0 +1,158 @@
+"""
+IPC↔BNS and CrPC↔BNSS section correspondence, e.g. IPC 420 → BNS 318(4).
+
+    python -m tools.correspondence IPC 420
+    python -m tools.correspondence "which BNS section replaced 302 IPC?"
+"""
+import argparse
+import csv
+import logging
+import os
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from tools.statutes import (
+    DEFAULT_CORPUS_DIR, STATUTE_LOOKUPS, find_acts, find_section_references, strip_references, words,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLE = os.path.join(DEFAULT_CORPUS_DIR, "correspondence.csv")
+
+COUNTERPART = {"IPC": "BNS", "BNS": "IPC", "CrPC": "BNSS", "BNSS": "CrPC"}
+
+# Words showing the question is about the old/new numbering
+_MAPPING_CUES = frozenset(
+    "became changed correspond corresponding corresponds equivalent map mapped maps new now old replace "
+    "replaced replacement replaces".split())
+# Words that can appear in a question that asks for the mapping and nothing else
+_MAPPING_WORDS = _MAPPING_CUES | frozenset(
+    "a act after and as be been code criminal does for has in is it its law number of or s sanhita same sec "
+    "section sections the to under was what whats which will".split())
+
+STATUTE_MAPPED = STATUTE_LOOKUPS.labels("mapping")
+
+
+class SectionMapping(NamedTuple):
+    old_act: str
+    old_section: str
+    new_act: str
+    new_section: str   # Empty when the old provision has no counterpart
+    subject: str
+    note: str
+
+    def describe(self) -> str:
+        old = f"{self.old_act} Section {self.old_section}"
+        if not self.new_section:
+            line = f"{old} ({self.subject}) has no equivalent in the {self.new_act}"
+        else:
+            line = f"{old} ({self.subject}) corresponds to {self.new_act} Section {self.new_section}"
+        return f"{line}. {self.note}." if self.note else f"{line}."
+
+
+def _main_section(section: str) -> str:
+    """"318(4)" -> "318": sub-sections share their section's entry."""
+    return section.split("(", 1)[0].strip().upper()
+
+
+class CorrespondenceTable:
+    """
+    Section mappings indexed by both sides, so `map("IPC", "420")` and
+    `map("BNS", "318")` are single dict lookups. One new section can replace
+    several old ones (BNS 318 covers IPC 415, 417 and 420), so lookups return tuples.
+    """
+    def __init__(self, mappings: List[SectionMapping]):
+        index: Dict[Tuple[str, str], List[SectionMapping]] = {}
+        for m in mappings:
+            index.setdefault((m.old_act, _main_section(m.old_section)), []).append(m)
+            if m.new_section:
+                index.setdefault((m.new_act, _main_section(m.new_section)), []).append(m)
+        self._index = {key: tuple(value) for key, value in index.items()}
+        self._count = len(mappings)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TABLE) -> "CorrespondenceTable":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            mappings = [SectionMapping(**row) for row in csv.DictReader(f)]
+        logger.info(f"Loaded {len(mappings)} section mappings from {path}")
+        return cls(mappings)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def map(self, act: str, section: str) -> Tuple[SectionMapping, ...]:
+        return self._index.get((act, _main_section(section)), ())
+
+    def mappings_for(self, query: str) -> List[SectionMapping]:
+        """Mappings of every section the query refers to, without duplicates."""
+        found = []
+        for act, section in find_section_references(query):
+            for m in self.map(act, section):
+                if m not in found:
+                    found.append(m)
+        return found
+
+    def describe(self, query: str) -> Optional[str]:
+        """Prompt context listing the old/new equivalents of the sections in the query."""
+        mappings = self.mappings_for(query)
+        return "\n".join(m.describe() for m in mappings) if mappings else None
+
+    def answer(self, query: str) -> Optional[str]:
+        """Reply to a pure mapping question ("BNS equivalent of IPC 420?"), or None for anything else."""
+        if not is_mapping_question(query):
+            return None
+        references = find_section_references(query)
+        if not all(self.map(*ref) for ref in references):
+            return None
+        lines = [f"- {m.describe()}" for m in self.mappings_for(query)]
+        return (
+            "**Section correspondence**\n\n" + "\n".join(lines) +
+            "\n\nThe BNS and BNSS apply to offences and proceedings from 1 July 2024; "
+            "earlier offences are still dealt with under the IPC and CrPC."
+        )
+
+
+def is_mapping_question(query: str) -> bool:
+    """A question naming sections that only asks for their old/new equivalents."""
+    references = find_section_references(query)
+    if not references:
+        return False
+    referenced_acts = {act for act, _ in references}
+    other_act_named = any(act not in referenced_acts for act in find_acts(query))
+    remaining = words(strip_references(query))
+    asks_for_mapping = other_act_named or any(w in _MAPPING_CUES for w in remaining)
+    return asks_for_mapping and all(w in _MAPPING_WORDS or w.isdigit() for w in remaining)
+
+
+_TABLE: Optional[CorrespondenceTable] = None
+_LOADED = False
+
+
+def get_correspondence() -> Optional[CorrespondenceTable]:
+    """The shared table, loaded on first use (None when STATUTE_CORRESPONDENCE_ENABLED=false)."""
+    global _TABLE, _LOADED
+    if not _LOADED:
+        if os.getenv("STATUTE_CORRESPONDENCE_ENABLED", "true").lower() == "true":
+            _TABLE = CorrespondenceTable.load(os.getenv("STATUTE_CORRESPONDENCE_FILE", DEFAULT_TABLE))
+        _LOADED = True
+    return _TABLE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query", nargs="+", help="An Act and section (IPC 420) or a free-text question")
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    args = parser.parse_args()
+
+    table = CorrespondenceTable.load(args.table)
+    query = " ".join(args.query)
+    mappings = table.mappings_for(query)
+    if not mappings:
+        print(f"No mapping found for: {query}")
+        sys.exit(1)
+    for m in mappings:
+        print(m.describe())
+
+
+if __name__ == "__main__":
+    main()
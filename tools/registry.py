@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from tools.base import AgentTool, ToolCall, ToolResult
+from utils import metrics
+from utils.resilience import timeout_for
+from utils.singleflight import SingleFlight
+from utils.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+TOOL_LATENCY = metrics.Histogram(
+    "legaladviser_tool_duration_seconds", "Tool execution latency (cache hits excluded).", ["tool"])
+TOOL_CALLS = metrics.Counter("legaladviser_tool_calls", "Tool calls by outcome.", ["tool", "outcome"])
+
+
+def cache_key(name: str, arguments: Dict) -> str:
+    """Tool name plus canonical JSON of the arguments (key order does not matter)."""
+    return f"{name}:{json.dumps(arguments, sort_keys=True, separators=(',', ':'), default=str)}"
+
+
+class _TTLCache:
+    """LRU cache whose entries expire individually."""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, ToolResult]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[ToolResult]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: ToolResult, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _Registered:
+    __slots__ = ("tool", "semaphore", "latency", "outcomes")
+
+    def __init__(self, tool: AgentTool):
+        self.tool = tool
+        self.semaphore = asyncio.Semaphore(tool.max_concurrency)
+        self.latency = TOOL_LATENCY.labels(tool.name)
+        self.outcomes = {o: TOOL_CALLS.labels(tool.name, o) for o in ("ok", "error", "timeout", "cached")}
+
+
+class ToolRegistry:
+    """
+    Runs `AgentTool`s by name.
+
+    Every call gets the tool's timeout and concurrency limit, identical calls in
+    flight are collapsed into one execution, and successful results of tools with
+    a `cache_ttl` are reused for identical arguments. Failures come back as
+    `ToolResult(error=...)` rather than exceptions, so one bad tool cannot sink a fan-out.
+
+    `ToolResult.metadata` is extended with `tool`, `latency_ms` (execution time),
+    `queued_ms` (time waiting for a concurrency slot) and `cached`.
+    """
+    def __init__(self, tools: Iterable[AgentTool] = (), max_cache_entries: int = 1024):
+        self._tools: Dict[str, _Registered] = {}
+        self._cache = _TTLCache(max_cache_entries)
+        self._singleflight = SingleFlight()
+        for tool in tools:
+            self.register(tool)
+
+    def register(self, tool: AgentTool) -> AgentTool:
+        if tool.name in self._tools:
+            raise ValueError(f"Tool already registered: {tool.name}")
+        self._tools[tool.name] = _Registered(tool)
+        logger.info(f"Registered tool: {tool.name}")
+        return tool
+
+    def get(self, name: str) -> AgentTool:
+        return self._tools[name].tool
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def describe(self) -> List[Dict[str, str]]:
+        """Name and description of every tool, e.g. for building a model prompt."""
+        return [{"name": r.tool.name, "description": r.tool.description} for r in self._tools.values()]
+
+    async def call(self, name: str, **arguments) -> ToolResult:
+        registered = self._tools.get(name)
+        if registered is None:
+            return ToolResult(error=f"Unknown tool: {name}", metadata={"tool": name})
+
+        key = cache_key(name, arguments)
+        if registered.tool.cache_ttl > 0:
+            cached = self._cache.get(key)
+            if cached is not None:
+                registered.outcomes["cached"].inc()
+                result = cached.model_copy(deep=True)
+                result.metadata = {**(result.metadata or {}), "cached": True, "queued_ms": 0.0}
+                return result
+
+        result = await self._singleflight.do(key, lambda: self._execute(registered, arguments, key))
+        return result.model_copy(deep=True)
+
+    async def call_many(self, calls: Iterable[Union[ToolCall, Tuple[str, Dict]]]) -> List[ToolResult]:
+        """Runs independent tool calls concurrently; results come back in call order."""
+        normalized = [c if isinstance(c, ToolCall) else ToolCall(name=c[0], arguments=c[1]) for c in calls]
+        return list(await asyncio.gather(*(self.call(c.name, **c.arguments) for c in normalized)))
+
+    async def _execute(self, registered: _Registered, arguments: Dict, key: str) -> ToolResult:
+        tool = registered.tool
+        with start_span(f"tool.{tool.name}") as span:
+            queued_at = time.perf_counter()
+            async with registered.semaphore:
+                start = time.perf_counter()
+                # The tool's own timeout, shortened to what is left of the request deadline
+                timeout = timeout_for(tool.timeout)
+                try:
+                    result = await asyncio.wait_for(tool.execute(**arguments),
+                                                    timeout=None if timeout is None else max(0.0, timeout))
+                    outcome = "error" if result.error else "ok"
+                except asyncio.TimeoutError:
+                    # With no timeout and no deadline the TimeoutError came from the tool itself
+                    after = "" if timeout is None else f" after {max(0.0, timeout):.2f}s"
+                    result = ToolResult(error=f"Tool {tool.name} timed out{after}")
+                    outcome = "timeout"
+                except Exception as e:
+                    logger.error(f"Tool {tool.name} failed: {e}", exc_info=True)
+                    result = ToolResult(error=str(e))
+                    outcome = "error"
+                elapsed = time.perf_counter() - start
+            registered.latency.observe(elapsed)
+            registered.outcomes[outcome].inc()
+            span.set_attribute("outcome", outcome)
+
+        result.metadata = {
+            **(result.metadata or {}),
+            "tool": tool.name,
+            "latency_ms": round(elapsed * 1000, 3),
+            "queued_ms": round((start - queued_at) * 1000, 3),
+            "cached": False,
+        }
+        if outcome == "ok" and tool.cache_ttl > 0:
+            self._cache.put(key, result.model_copy(deep=True), tool.cache_ttl)
+        return result
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"tools": len(self._tools), "cache_entries": len(self._cache), **self._singleflight.stats()}
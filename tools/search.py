@@ -0,0 +1,256 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from dtos import SearchResult
+from tools.base import AgentTool, ToolResult
+from tools.registry import ToolRegistry
+from utils import metrics
+from utils.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "data", "search_fixtures.json")
+
+_SITE = re.compile(r"\bsite:(\S+)", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from how i in is it my of on or the to what when which who with".split())
+
+
+class SearchBackend(ABC):
+    """Source of web search results for one query."""
+    name = "base"
+
+    @abstractmethod
+    async def search(self, query: str, max_results: int = 5) -> List[SearchResult]:
+        """Returns up to `max_results` results, best first. Must not block the event loop."""
+
+
+class FixtureSearchBackend(SearchBackend):
+    """
+    Offline backend over a JSON list of `SearchResult` documents. Documents are
+    ranked by how many query terms appear in the title and snippet; a `site:`
+    operator restricts results to that domain. `latency_ms` simulates a remote service.
+    """
+    name = "fixture"
+
+    def __init__(self, path: str = DEFAULT_FIXTURES, latency_ms: float = 0.0):
+        with open(path, "r", encoding="utf-8") as f:
+            self.documents = [SearchResult(**doc) for doc in json.load(f)]
+        self.latency_ms = latency_ms
+        self._terms = [
+            (set(_WORD.findall(doc.title.lower())), set(_WORD.findall(doc.snippet.lower())))
+            for doc in self.documents
+        ]
+        logger.info(f"Loaded {len(self.documents)} search fixtures from {path}")
+
+    async def search(self, query: str, max_results: int = 5) -> List[SearchResult]:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        sites = [s.lower() for s in _SITE.findall(query)]
+        terms = set(_WORD.findall(_SITE.sub(" ", query).lower())) - _STOPWORDS
+        scored = []
+        for i, (doc, (title_terms, snippet_terms)) in enumerate(zip(self.documents, self._terms)):
+            if sites and not any(domain_matches(doc.url, site) for site in sites):
+                continue
+            score = 2 * len(terms & title_terms) + len(terms & snippet_terms)
+            if score:
+                scored.append((-score, i))
+        scored.sort()
+        return [self.documents[i].model_copy() for _, i in scored[:max_results]]
+
+
+class GoogleCustomSearchBackend(SearchBackend):
+    """Google Programmable Search (Custom Search JSON API)."""
+    name = "google_cse"
+    ENDPOINT = "https://www.googleapis.com/customsearch/v1"
+
+    def __init__(self, api_key: str, engine_id: str, timeout: float = 5.0):
+        self.api_key = api_key
+        self.engine_id = engine_id
+        self.timeout = timeout
+
+    def _fetch(self, query: str, max_results: int) -> List[SearchResult]:
+        params = urllib.parse.urlencode({"key": self.api_key, "cx": self.engine_id, "q": query, "num": min(max_results, 10)})
+        with urllib.request.urlopen(f"{self.ENDPOINT}?{params}", timeout=self.timeout) as response:
+            data = json.load(response)
+        return [
+            SearchResult(
+                title=item.get("title", ""),
+                url=item.get("link", ""),
+                snippet=item.get("snippet", ""),
+                source=item.get("displayLink", "web"),
+            ) for item in data.get("items", [])
+        ]
+
+    async def search(self, query: str, max_results: int = 5) -> List[SearchResult]:
+        return await asyncio.to_thread(self._fetch, query, max_results)
+
+
+def create_search_backend(kind: str) -> Optional[SearchBackend]:
+    kind = kind.lower()
+    if kind in ("", "none"):
+        return None
+    if kind == "fixture":
+        return FixtureSearchBackend(
+            os.getenv("SEARCH_FIXTURES", DEFAULT_FIXTURES),
+            latency_ms=float(os.getenv("SEARCH_FIXTURE_LATENCY_MS", "0")),
+        )
+    if kind == "google_cse":
+        api_key, engine_id = os.getenv("GOOGLE_CSE_API_KEY"), os.getenv("GOOGLE_CSE_ID")
+        if not api_key or not engine_id:
+            raise ValueError("GOOGLE_CSE_API_KEY and GOOGLE_CSE_ID must be set for SEARCH_BACKEND=google_cse")
+        return GoogleCustomSearchBackend(api_key, engine_id)
+    raise ValueError(f"Unknown search backend: {kind}")
+
+
+class WebSearchTool(AgentTool):
+    """Runs one query against a `SearchBackend`; `content` is a list of result dicts."""
+    timeout = 5.0
+    max_concurrency = 8
+    cache_ttl = 600.0
+
+    def __init__(self, backend: SearchBackend):
+        self.backend = backend
+
+    @property
+    def name(self) -> str:
+        return "web_search"
+
+    @property
+    def description(self) -> str:
+        return "Searches the web for Indian statutes, judgments and legal commentary"
+
+    async def execute(self, query: str, max_results: int = 5) -> ToolResult:
+        results = await self.backend.search(query, max_results)
+        return ToolResult(content=[r.model_dump() for r in results], metadata={"backend": self.backend.name})
+
+
+def normalize_url(url: str) -> str:
+    """Scheme, `www.`, fragment, default query order and trailing slash do not make two results different."""
+    parts = urllib.parse.urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query)))
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{query}" if query else "")
+
+
+def domain_matches(url: str, domain: str) -> bool:
+    host = urllib.parse.urlsplit(url).netloc.lower()
+    domain = domain.lower().removeprefix("www.")
+    return host == domain or host.endswith("." + domain)
+
+
+class SearchBundle(BaseModel):
+    """Merged results of a multi-query search and the context text built from them."""
+    queries: List[str]
+    results: List[SearchResult]
+    context: str
+    errors: List[str] = []
+
+
+class MultiQuerySearch:
+    """
+    Search stage run before research: every generated query goes through the
+    `web_search` tool concurrently, results are merged and ranked, and the top
+    ones are formatted into a context block of at most `context_chars` characters.
+
+    Ranking is reciprocal rank fusion (a result found by several queries, or
+    ranked high by one, scores higher) multiplied by `1 + priority_boost` for
+    results from one of the analysis' `priority_domains`. Duplicate URLs keep the
+    longest snippet.
+    """
+    RRF_K = 60
+
+    def __init__(self, backend: SearchBackend, registry: ToolRegistry = None, max_queries: int = 4,
+                 results_per_query: int = 5, max_results: int = 8, context_chars: int = 4000,
+                 priority_boost: float = 0.5):
+        self.registry = registry or ToolRegistry()
+        self.tool = WebSearchTool(backend)
+        if self.tool.name not in self.registry:
+            self.registry.register(self.tool)
+        self.max_queries = max_queries
+        self.results_per_query = results_per_query
+        self.max_results = max_results
+        self.context_chars = context_chars
+        self.priority_boost = priority_boost
+
+    @classmethod
+    def from_env(cls, registry: ToolRegistry = None) -> "MultiQuerySearch | None":
+        backend = create_search_backend(os.getenv("SEARCH_BACKEND", "none"))
+        if backend is None:
+            return None
+        search = cls(
+            backend,
+            registry=registry,
+            max_queries=int(os.getenv("SEARCH_MAX_QUERIES", "4")),
+            results_per_query=int(os.getenv("SEARCH_RESULTS_PER_QUERY", "5")),
+            max_results=int(os.getenv("SEARCH_MAX_RESULTS", "8")),
+            context_chars=int(os.getenv("SEARCH_CONTEXT_CHARS", "4000")),
+            priority_boost=float(os.getenv("SEARCH_PRIORITY_BOOST", "0.5")),
+        )
+        search.tool.timeout = float(os.getenv("SEARCH_TIMEOUT", "5.0"))
+        logger.info(f"Multi-query search enabled with the {backend.name} backend")
+        return search
+
+    async def search(self, queries: Iterable[str], priority_domains: Iterable[str] = ()) -> SearchBundle:
+        queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))[:self.max_queries]
+        start = time.perf_counter()
+        with start_span("search.multi_query", attributes={"queries": len(queries)}) as span:
+            outcomes = await self.registry.call_many(
+                (self.tool.name, {"query": q, "max_results": self.results_per_query}) for q in queries)
+            errors = [f"{q}: {r.error}" for q, r in zip(queries, outcomes) if r.error]
+            results = self.merge([r.content or [] for r in outcomes if not r.error], priority_domains)
+            context = self.format_context(results)
+            span.set_attribute("results", len(results))
+            span.set_attribute("context_chars", len(context))
+            if errors:
+                span.set_attribute("errors", len(errors))
+        metrics.SEARCH_LATENCY.since(start)
+        metrics.SEARCH_RESULTS.observe(len(results))
+        if errors:
+            metrics.SEARCH_ERRORS.inc(len(errors))
+            logger.warning(f"{len(errors)} of {len(queries)} search queries failed: {errors}")
+        return SearchBundle(queries=queries, results=results, context=context, errors=errors)
+
+    def merge(self, ranked_lists: List[List[Dict]], priority_domains: Iterable[str] = ()) -> List[SearchResult]:
+        priority_domains = list(priority_domains)
+        scores: Dict[str, float] = {}
+        best: Dict[str, Dict] = {}
+        for ranked in ranked_lists:
+            for rank, item in enumerate(ranked):
+                key = normalize_url(item.get("url", ""))
+                if not key:
+                    continue
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.RRF_K + rank + 1)
+                if key not in best or len(item.get("snippet", "")) > len(best[key].get("snippet", "")):
+                    best[key] = item
+        for key, item in best.items():
+            if any(domain_matches(item["url"], d) for d in priority_domains):
+                scores[key] *= 1 + self.priority_boost
+        ranked_keys = sorted(scores, key=scores.get, reverse=True)[:self.max_results]
+        return [SearchResult(**best[key]) for key in ranked_keys]
+
+    def format_context(self, results: List[SearchResult]) -> str:
+        """Numbered result entries, dropping whole entries once the character budget is used up."""
+        entries, used = [], 0
+        for i, r in enumerate(results, 1):
+            entry = f"[{i}] {r.title}\nURL: {r.url}\nSource: {r.source}\n{r.snippet}"
+            if used + len(entry) > self.context_chars:
+                if not entries:
+                    entries.append(entry[:self.context_chars])
+                break
+            entries.append(entry)
+            used += len(entry) + 2
+        return "\n\n".join(entries)
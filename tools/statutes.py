@@ -0,0 +1,359 @@
+import contextlib
+import glob
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(__file__), "data", "statutes")
+
+ACT_NAMES = {
+    "IPC": "Indian Penal Code, 1860",
+    "BNS": "Bharatiya Nyaya Sanhita, 2023",
+    "CrPC": "Code of Criminal Procedure, 1973",
+    "BNSS": "Bharatiya Nagarik Suraksha Sanhita, 2023",
+}
+
+# Longest aliases first, so "bnss" is not read as "bns"
+_ACT_ALIASES = [
+    ("bharatiya nagarik suraksha sanhita", "BNSS"),
+    ("bharatiya nyaya sanhita", "BNS"),
+    ("code of criminal procedure", "CrPC"),
+    ("criminal procedure code", "CrPC"),
+    ("indian penal code", "IPC"),
+    ("penal code", "IPC"),
+    ("cr.p.c", "CrPC"),
+    ("crpc", "CrPC"),
+    ("bnss", "BNSS"),
+    ("bns", "BNS"),
+    ("ipc", "IPC"),
+]
+_ACT_BY_ALIAS = dict(_ACT_ALIASES)
+_ACT_PATTERN = "|".join(re.escape(alias) for alias, _ in _ACT_ALIASES)
+_ACT = re.compile(rf"(?<![a-z])({_ACT_PATTERN})(?![a-z])")
+_SECTION = r"(\d{1,3}[a-z]{0,2})(?:\s*\(\d+\))?"
+_PREFIX = r"(?:sections?|sec\.?|u/s\.?|s\.)"
+# A section written next to its Act: "IPC 420", "IPC section 420" / "420 IPC", "section 420 of the IPC"
+_ACT_SECTION = re.compile(rf"(?<![a-z])({_ACT_PATTERN})\s+(?:{_PREFIX}\s*)?{_SECTION}(?![\w(])")
+_SECTION_ACT = re.compile(rf"(?:\b{_PREFIX}\s*)?\b{_SECTION}\s+(?:of\s+(?:the\s+)?)?({_ACT_PATTERN})(?![a-z])")
+# "section 420" with the Act named elsewhere in the query
+_BARE_SECTION = re.compile(rf"\b{_PREFIX}\s*{_SECTION}(?![\w(])")
+# Words that can surround a section reference in a question that only asks for the text
+_LOOKUP_WORDS = frozenset(
+    "a about act an code define definition does explain for in is law me meaning of please provision "
+    "punishment read s say says sec section show tell text the under what whats".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and any as at be by for from he him his if in into is it its of on or such that the this to "
+    "under was which who whoever with".split())
+
+_MAGIC = b"LAIX"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHIIf5Q")
+_DOC = struct.Struct("<QII")       # blob offset, blob length, document length in tokens
+_KEY = struct.Struct("<QII")       # key offset, key length, doc id
+_TERM = struct.Struct("<QIIQ")     # term offset, term length, document frequency, postings offset
+_POSTING = struct.Struct("<II")    # doc id, term frequency
+
+STATUTE_LOOKUPS = metrics.Counter(
+    "legaladviser_statute_lookups", "Queries answered or grounded from the local statute index.", ["outcome"])
+STATUTE_DIRECT = STATUTE_LOOKUPS.labels("direct")
+STATUTE_GROUNDED = STATUTE_LOOKUPS.labels("grounded")
+STATUTE_MISS = STATUTE_LOOKUPS.labels("miss")
+STATUTE_LOOKUP_LATENCY = metrics.STAGE_LATENCY.labels("statute_lookup")
+
+
+class StatuteSection(BaseModel):
+    act: str
+    section: str
+    title: str
+    text: str
+    url: str = ""
+
+    @property
+    def citation(self) -> str:
+        return f"Section {self.section}, {ACT_NAMES.get(self.act, self.act)}"
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def section_key(act: str, section: str) -> str:
+    return f"{act.lower()}:{section.upper()}"
+
+
+def normalize_act(act: str) -> Optional[str]:
+    """The Act code (`IPC`, `CrPC`, ...) for a code, alias or full name in any case; None when unknown."""
+    name = re.sub(r",?\s*\d{4}$", "", act.strip().lower())
+    return _ACT_BY_ALIAS.get(name) or _ACT_BY_ALIAS.get(name.rstrip("."))
+
+
+def find_act(query: str) -> Optional[str]:
+    match = _ACT.search(query.lower())
+    return _ACT_BY_ALIAS[match.group(1)] if match else None
+
+
+def find_acts(query: str) -> List[str]:
+    """Every Act named in the query, in order of first mention."""
+    return list(dict.fromkeys(_ACT_BY_ALIAS[m.group(1)] for m in _ACT.finditer(query.lower())))
+
+
+def find_section_references(query: str) -> List[Tuple[str, str]]:
+    """
+    Every explicit section reference in the query as `(act, section)`, in order,
+    e.g. "IPC 420", "section 498A of the Indian Penal Code", "u/s 173 BNSS".
+    A bare "section 420" belongs to the nearest Act mentioned. Sub-sections are
+    ignored: "103(1) BNS" refers to section 103.
+    """
+    lower = query.lower()
+    candidates = [(m.start(), m.end(), _ACT_BY_ALIAS[m.group(1)], m.group(2)) for m in _ACT_SECTION.finditer(lower)]
+    candidates += [(m.start(), m.end(), _ACT_BY_ALIAS[m.group(2)], m.group(1)) for m in _SECTION_ACT.finditer(lower)]
+    acts = [(m.start(), _ACT_BY_ALIAS[m.group(1)]) for m in _ACT.finditer(lower)]
+    if acts:
+        for m in _BARE_SECTION.finditer(lower):
+            nearest = min(acts, key=lambda a: abs(a[0] - m.start()))[1]
+            candidates.append((m.start(), m.end(), nearest, m.group(1)))
+
+    references, end = [], -1
+    for start, stop, act, section in sorted(candidates):
+        if start < end:
+            continue
+        end = stop
+        reference = (act, section.upper())
+        if reference not in references:
+            references.append(reference)
+    return references
+
+
+def parse_section_reference(query: str) -> Optional[Tuple[str, str]]:
+    """The first section reference in the query (see `find_section_references`)."""
+    references = find_section_references(query)
+    return references[0] if references else None
+
+
+def strip_references(query: str) -> str:
+    """The query in lower case with section references and Act names removed."""
+    lower = query.lower()
+    for pattern in (_ACT_SECTION, _SECTION_ACT, _BARE_SECTION, _ACT):
+        lower = pattern.sub(" ", lower)
+    return lower
+
+
+def is_pure_lookup(query: str) -> bool:
+    """True when the query asks for a section and nothing else ("what is section 420 ipc?")."""
+    return all(w in _LOOKUP_WORDS or w.isdigit() for w in words(strip_references(query)))
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def load_corpus(directory: str = DEFAULT_CORPUS_DIR) -> List[StatuteSection]:
+    """Reads every `*.jsonl` file in `directory`: one section per line."""
+    sections = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.jsonl"))):
+        with open(path, "r", encoding="utf-8") as f:
+            sections.extend(StatuteSection(**json.loads(line)) for line in f if line.strip())
+    return sections
+
+
+def build_index(sections: Iterable[StatuteSection], path: str) -> int:
+    """
+    Writes the on-disk index for `StatuteIndex`: fixed-size document, key and
+    term tables (keys and terms sorted for binary search), postings lists and a
+    string area with the documents as JSON. Written to a uniquely named
+    temporary file next to `path` and renamed, so readers never see a partial
+    index and concurrent builders (several workers starting at once) do not
+    write over each other.
+    """
+    sections = list(sections)
+    strings = bytearray()
+
+    def add_string(data: bytes) -> Tuple[int, int]:
+        strings.extend(data)
+        return len(strings) - len(data), len(data)
+
+    docs, doc_lengths, keys = [], [], []
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    for doc_id, s in enumerate(sections):
+        docs.append(add_string(s.model_dump_json().encode("utf-8")))
+        # Title words count twice; the act abbreviation lets "cheating ipc" prefer IPC sections
+        tokens = tokenize(s.title) * 2 + tokenize(s.text) + [s.act.lower()]
+        doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term, []).append((doc_id, tf))
+        keys.append((section_key(s.act, s.section).encode("utf-8"), doc_id))
+
+    keys.sort()
+    terms = sorted((t.encode("utf-8"), p) for t, p in postings.items())
+    n_docs, n_terms = len(docs), len(terms)
+    avgdl = sum(doc_lengths) / n_docs if n_docs else 0.0
+
+    off_docs = _HEADER.size
+    off_keys = off_docs + n_docs * _DOC.size
+    off_terms = off_keys + len(keys) * _KEY.size
+    off_postings = off_terms + n_terms * _TERM.size
+    off_strings = off_postings + sum(len(p) for _, p in terms) * _POSTING.size
+
+    out = bytearray(_HEADER.pack(_MAGIC, _VERSION, 0, n_docs, n_terms, avgdl,
+                                 off_docs, off_keys, off_terms, off_postings, off_strings))
+    for (blob_off, blob_len), length in zip(docs, doc_lengths):
+        out += _DOC.pack(off_strings + blob_off, blob_len, length)
+    for key, doc_id in keys:
+        key_off, key_len = add_string(key)
+        out += _KEY.pack(off_strings + key_off, key_len, doc_id)
+    postings_blob = bytearray()
+    for term, plist in terms:
+        term_off, term_len = add_string(term)
+        out += _TERM.pack(off_strings + term_off, term_len, len(plist), off_postings + len(postings_blob))
+        for doc_id, tf in plist:
+            postings_blob += _POSTING.pack(doc_id, tf)
+    out += postings_blob + strings
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".statutes-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(out)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+    logger.info(f"Built statute index {path}: {n_docs} sections, {n_terms} terms, {len(out)} bytes")
+    return n_docs
+
+
+class StatuteIndex:
+    """
+    Read-only view of an index file written by `build_index`, memory-mapped so
+    opening it costs a header read regardless of corpus size. Exact section
+    lookups and term lookups are binary searches over the mapped tables; only
+    the documents that are returned get decoded.
+    """
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.n_docs, self.n_terms, self.avgdl,
+         self._off_docs, self._off_keys, self._off_terms, self._off_postings, _) = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError(f"Not a statute index (version {_VERSION}): {path}")
+        # uint32 views for the scoring loop: postings are (doc id, tf) pairs and the
+        # document length is the 4th word of each document record (little-endian hosts)
+        self._view = memoryview(self._mm)
+        self._doc_words = self._view[self._off_docs:self._off_docs + self.n_docs * _DOC.size].cast("I")
+
+    @classmethod
+    def from_env(cls) -> "StatuteIndex | None":
+        if os.getenv("STATUTE_INDEX_ENABLED", "true").lower() != "true":
+            return None
+        corpus_dir = os.getenv("STATUTE_CORPUS_DIR", DEFAULT_CORPUS_DIR)
+        path = os.getenv("STATUTE_INDEX_FILE", os.path.join(corpus_dir, "statutes.idx"))
+        try:
+            return cls.open_or_build(corpus_dir, path)
+        except OSError as e:
+            # E.g. a read-only app directory: serve without the index rather than fail to start
+            logger.error(f"Statute index disabled, could not open or build {path}: {e} "
+                         f"(set STATUTE_INDEX_FILE to a writable path)")
+            return None
+
+    @classmethod
+    def open_or_build(cls, corpus_dir: str, path: str) -> "StatuteIndex":
+        """Opens the index, rebuilding it first when it is missing, outdated or older than the corpus."""
+        corpus_files = glob.glob(os.path.join(corpus_dir, "*.jsonl"))
+        if os.path.exists(path):
+            newest = max((os.path.getmtime(p) for p in corpus_files), default=0.0)
+            if os.path.getmtime(path) >= newest:
+                try:
+                    return cls(path)
+                except (ValueError, struct.error) as e:
+                    logger.warning(f"Rebuilding statute index: {e}")
+        build_index(load_corpus(corpus_dir), path)
+        return cls(path)
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def close(self):
+        for view in (getattr(self, "_doc_words", None), getattr(self, "_view", None)):
+            if view is not None:
+                view.release()
+        self._mm.close()
+        self._file.close()
+
+    def document(self, doc_id: int) -> StatuteSection:
+        blob_off, blob_len, _ = _DOC.unpack_from(self._mm, self._off_docs + doc_id * _DOC.size)
+        return StatuteSection.model_validate_json(self._mm[blob_off:blob_off + blob_len])
+
+    def _bisect(self, table_off: int, record: struct.Struct, count: int, target: bytes) -> Optional[tuple]:
+        lo, hi = 0, count
+        mm = self._mm
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = record.unpack_from(mm, table_off + mid * record.size)
+            key = mm[entry[0]:entry[0] + entry[1]]
+            if key < target:
+                lo = mid + 1
+            elif key > target:
+                hi = mid
+            else:
+                return entry
+        return None
+
+    def section(self, act: str, section: str) -> Optional[StatuteSection]:
+        act = normalize_act(act) or act
+        entry = self._bisect(self._off_keys, _KEY, self.n_docs, section_key(act, section).encode("utf-8"))
+        return self.document(entry[2]) if entry else None
+
+    def lookup(self, query: str) -> Optional[StatuteSection]:
+        """The section a query refers to explicitly, if it is in the corpus."""
+        reference = parse_section_reference(query)
+        return self.section(*reference) if reference else None
+
+    def search(self, query: str, limit: int = 5, act: str = None) -> List[Tuple[float, StatuteSection]]:
+        """BM25 over title and text; `act` (code, alias or full name) restricts results to one Act."""
+        if act is not None:
+            act = normalize_act(act) or act
+        scores: Dict[int, float] = {}
+        doc_words = self._doc_words
+        k1, base, per_word = self.K1, self.K1 * (1 - self.B), self.K1 * self.B / self.avgdl if self.avgdl else 0.0
+        for term in set(tokenize(query)):
+            entry = self._bisect(self._off_terms, _TERM, self.n_terms, term.encode("utf-8"))
+            if entry is None:
+                continue
+            _, _, df, post_off = entry
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5)) * (k1 + 1)
+            postings = self._view[post_off:post_off + df * _POSTING.size].cast("I")
+            for i in range(0, 2 * df, 2):
+                doc_id, tf = postings[i], postings[i + 1]
+                norm = base + per_word * doc_words[4 * doc_id + 3]
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf / (tf + norm)
+            postings.release()
+
+        results = []
+        for doc_id, score in heapq.nlargest(limit if act is None else len(scores), scores.items(), key=lambda kv: kv[1]):
+            doc = self.document(doc_id)
+            if act is None or doc.act == act:
+                results.append((round(score, 4), doc))
+                if len(results) == limit:
+                    break
+        return results
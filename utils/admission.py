@@ -0,0 +1,259 @@
+"""
+Admission control: bounded concurrency with a bounded FIFO wait queue, and
+per-session serialization of chat turns.
+
+    admission = AdmissionController.from_env()
+    ticket = await admission.acquire()      # raises Overloaded when shedding
+    try:
+        ...
+    finally:
+        ticket.release()
+
+The same `ConcurrencyLimiter` caps in-flight calls per LLM backend
+(`LLM_MAX_CONCURRENCY`, see `agents/backend.py`).
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from utils import metrics
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing work that would wait too long. Maps to an HTTP error with Retry-After."""
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(f"{reason} (retry after {retry_after:.0f}s)")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class Ticket:
+    """A held slot. `release` is idempotent, so every exit path can call it."""
+    __slots__ = ("_limiter", "_start", "released")
+
+    def __init__(self, limiter: "ConcurrencyLimiter"):
+        self._limiter = limiter
+        self._start = time.perf_counter()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._limiter._release(time.perf_counter() - self._start)
+
+
+class ConcurrencyLimiter:
+    """
+    A FIFO semaphore with a bounded wait queue and wait-time budget.
+
+    `acquire` takes a free slot immediately. Otherwise it queues, unless the
+    queue is full or the wait predicted from the queue position and the recent
+    hold time (EWMA) exceeds `max_wait`. Either way it raises `Overloaded`
+    right away rather than making the caller wait for a slot it would not get
+    in time. Waiters still queued after `max_wait` give up with `Overloaded` too.
+    """
+    def __init__(self, max_concurrent: int, max_queue: Optional[int] = None, max_wait: Optional[float] = None,
+                 name: str = "admission", queue_gauge=None, active_gauge=None, wait_histogram=None,
+                 rejected=None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._hold_ewma = 0.0
+        self._queue_gauge = queue_gauge
+        self._active_gauge = active_gauge
+        self._wait_histogram = wait_histogram
+        self._rejected = rejected or {}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self, position: Optional[int] = None) -> float:
+        """Seconds until a request queued at `position` (default: the back of the queue) gets a slot."""
+        position = len(self._waiters) if position is None else position
+        return (position + 1) * self._hold_ewma / max(1, self.max_concurrent)
+
+    def _reject(self, reason: str, status_code: int = 503) -> Overloaded:
+        self.rejected += 1
+        counter = self._rejected.get(reason)
+        if counter is not None:
+            counter.inc()
+        return Overloaded(status_code, f"{self.name} {reason.replace('_', ' ')}", self.estimated_wait())
+
+    def _update_gauges(self):
+        if self._queue_gauge is not None:
+            self._queue_gauge.set(len(self._waiters))
+        if self._active_gauge is not None:
+            self._active_gauge.set(self.active)
+
+    async def acquire(self) -> Ticket:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            self._update_gauges()
+            if self._wait_histogram is not None:
+                self._wait_histogram.observe(0.0)
+            return Ticket(self)
+
+        if self.max_queue is not None and len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+        if self.max_wait is not None and self._hold_ewma and self.estimated_wait() > self.max_wait:
+            raise self._reject("deadline")
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self._update_gauges()
+        try:
+            if self.max_wait is None:
+                await waiter
+            else:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.active -= 1
+                self._wake_next()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            self._update_gauges()
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("deadline") from None
+            raise
+        finally:
+            if self._wait_histogram is not None:
+                self._wait_histogram.since(start)
+        self.admitted += 1
+        return Ticket(self)
+
+    def _wake_next(self):
+        while self._waiters and self.active < self.max_concurrent:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes straight to the waiter, so newcomers cannot overtake the queue
+                self.active += 1
+                waiter.set_result(None)
+
+    def _release(self, held: float):
+        self._hold_ewma = held if not self._hold_ewma else 0.8 * self._hold_ewma + 0.2 * held
+        self.active -= 1
+        self._wake_next()
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def slot(self):
+        ticket = await self.acquire()
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queue_depth": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "hold_ewma_ms": round(self._hold_ewma * 1000, 1),
+        }
+
+
+class AdmissionController(ConcurrencyLimiter):
+    """Global admission of chat requests, configured from ADMISSION_* settings."""
+    @classmethod
+    def from_env(cls) -> Optional["AdmissionController"]:
+        max_concurrent = int(os.getenv("ADMISSION_MAX_CONCURRENT", "64"))
+        if max_concurrent <= 0:
+            return None
+        return cls(
+            max_concurrent=max_concurrent,
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "256")),
+            max_wait=float(os.getenv("ADMISSION_MAX_WAIT_MS", "10000")) / 1000,
+            name="server",
+            queue_gauge=metrics.ADMISSION_QUEUE_DEPTH,
+            active_gauge=metrics.ADMISSION_ACTIVE,
+            wait_histogram=metrics.ADMISSION_WAIT_LATENCY,
+            rejected={"queue_full": metrics.ADMISSION_QUEUE_FULL, "deadline": metrics.ADMISSION_DEADLINE},
+        )
+
+
+class SessionLocks:
+    """
+    One asyncio.Lock per session id, so turns on the same session (two tabs)
+    run one at a time and their history writes cannot interleave. Locks are
+    dropped when nobody holds or waits for them.
+    """
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "SessionLocks":
+        return cls(timeout=float(os.getenv("SESSION_LOCK_TIMEOUT_MS", "30000")) / 1000)
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    async def acquire(self, session_id: str) -> "_SessionTicket":
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        self._users[session_id] = self._users.get(session_id, 0) + 1
+        try:
+            if self.timeout is None:
+                await lock.acquire()
+            else:
+                await asyncio.wait_for(lock.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._drop(session_id)
+            metrics.ADMISSION_SESSION_BUSY.inc()
+            raise Overloaded(429, "session busy with another request", self.timeout) from None
+        except BaseException:
+            self._drop(session_id)
+            raise
+        return _SessionTicket(self, session_id, lock)
+
+    def _drop(self, session_id: str):
+        users = self._users[session_id] - 1
+        if users:
+            self._users[session_id] = users
+        else:
+            del self._users[session_id]
+            del self._locks[session_id]
+
+
+class _SessionTicket:
+    __slots__ = ("_locks", "_session_id", "_lock", "released")
+
+    def __init__(self, locks: SessionLocks, session_id: str, lock: asyncio.Lock):
+        self._locks = locks
+        self._session_id = session_id
+        self._lock = lock
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._lock.release()
+            self._locks._drop(self._session_id)
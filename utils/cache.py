@@ -0,0 +1,232 @@
+import hashlib
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Set
+
+from dtos import ChatResponse
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\d+[a-z]?")
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cases, strips punctuation and collapses whitespace so trivially different phrasings share a key."""
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def history_digest(history: list[dict], turns: int = 5) -> str:
+    """Stable digest of the last `turns` messages, used to key context-dependent turns."""
+    h = hashlib.sha1()
+    for msg in history[-turns:]:
+        h.update(msg["role"].encode())
+        h.update(b"\x00")
+        h.update(msg["content"].encode())
+        h.update(b"\x01")
+    return h.hexdigest()
+
+
+def _trigrams(text: str) -> Counter:
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class _CacheEntry:
+    __slots__ = ("response", "expires_at", "size", "vector", "norm", "numbers")
+
+    def __init__(self, response: ChatResponse, expires_at: float, size: int,
+                 vector: Optional[Counter], numbers: Optional[frozenset]):
+        self.response = response
+        self.expires_at = expires_at
+        self.size = size
+        self.vector = vector
+        self.norm = math.sqrt(sum(v * v for v in vector.values())) if vector else 0.0
+        self.numbers = numbers
+
+
+class ResponseCache:
+    """
+    In-memory cache of ChatResponses in front of the orchestrator pipeline.
+
+    - Exact matches are keyed on the normalized query.
+    - Optionally, stateless queries are also matched by cosine similarity over
+      character trigrams (CPU-only, no model). Queries must contain the same
+      numbers to match, so "section 420" never serves "section 421".
+    - Entries expire after `ttl_seconds`; LRU eviction keeps the cache under
+      `max_entries` and `max_bytes`. Expired entries are kept for another
+      `stale_seconds` for `get_stale`, the fallback when the model is failing.
+    - Turns with history bypass the cache, or are keyed on a digest of the recent
+      history when `history_mode="digest"`.
+    """
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 similarity_threshold: float = 0.0, history_mode: str = "bypass", stale_seconds: float = 0.0):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.similarity_threshold = similarity_threshold
+        self.history_mode = history_mode
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._index: Dict[str, Set[str]] = {}   # trigram -> keys of stateless entries
+        self._bytes = 0
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        if os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+            max_bytes=int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "64")) * 1024 * 1024),
+            # Exact match only unless a deployment opts in: trigrams cannot tell
+            # "can the landlord evict" from "can the tenant evict"
+            similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0")),
+            history_mode=os.getenv("RESPONSE_CACHE_HISTORY_MODE", "bypass"),
+            stale_seconds=float(os.getenv("RESPONSE_CACHE_STALE_SECONDS", "86400")),
+        )
+
+    def _key(self, normalized: str, history: list[dict]) -> Optional[str]:
+        if not history:
+            return normalized
+        if self.history_mode == "digest":
+            return f"{normalized}#{history_digest(history)}"
+        return None
+
+    def get(self, query: str, history: list[dict] = []) -> Optional[ChatResponse]:
+        normalized = normalize_query(query)
+        key = self._key(normalized, history)
+        if key is None:
+            self.bypassed += 1
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None and not self._expired(key, entry):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.response.model_copy(deep=True)
+
+        if not history and self.similarity_threshold > 0:
+            similar = self._find_similar(normalized)
+            if similar is not None:
+                self._entries.move_to_end(similar)
+                self.similar_hits += 1
+                return self._entries[similar].response.model_copy(deep=True)
+
+        self.misses += 1
+        return None
+
+    def get_stale(self, query: str, history: list[dict] = []) -> Optional[ChatResponse]:
+        """An exact-match entry even if it expired less than `stale_seconds` ago (no similarity matching)."""
+        key = self._key(normalize_query(query), history)
+        entry = self._entries.get(key) if key is not None else None
+        if entry is None or entry.expires_at + self.stale_seconds <= time.monotonic():
+            return None
+        self.stale_hits += 1
+        return entry.response.model_copy(deep=True)
+
+    def put(self, query: str, history: list[dict], response: ChatResponse):
+        normalized = normalize_query(query)
+        key = self._key(normalized, history)
+        if key is None:
+            return
+
+        stored = response.model_copy(deep=True, update={"session_id": None, "session_title": None})
+        size = len(normalized) + len(stored.model_dump_json())
+        if size > self.max_bytes:
+            return
+        vector = numbers = None
+        if not history and self.similarity_threshold > 0:
+            vector = _trigrams(normalized)
+            numbers = frozenset(_NUMBER.findall(normalized))
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _CacheEntry(stored, time.monotonic() + self.ttl_seconds, size, vector, numbers)
+        self._bytes += size
+        if vector:
+            for gram in vector:
+                self._index.setdefault(gram, set()).add(key)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _find_similar(self, normalized: str) -> Optional[str]:
+        vector = _trigrams(normalized)
+        numbers = frozenset(_NUMBER.findall(normalized))
+        candidates: Counter = Counter()
+        for gram, count in vector.items():
+            for key in self._index.get(gram, ()):
+                candidates[key] += count * self._entries[key].vector[gram]
+        if not candidates:
+            return None
+
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        matches = []
+        for key, dot in candidates.items():
+            entry = self._entries[key]
+            if entry.numbers != numbers:
+                continue
+            score = dot / (norm * entry.norm)
+            if score >= self.similarity_threshold:
+                matches.append((score, key))
+        # Best first; an expired match is skipped in favour of the next one
+        for _, key in sorted(matches, reverse=True):
+            if not self._expired(key, self._entries[key]):
+                return key
+        return None
+
+    def _expired(self, key: str, entry: _CacheEntry) -> bool:
+        now = time.monotonic()
+        if entry.expires_at > now:
+            return False
+        # Past its TTL; dropped once it is too old to serve as a stale fallback either
+        if entry.expires_at + self.stale_seconds <= now:
+            self._remove(key)
+            self.expirations += 1
+        return True
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if entry.vector:
+            for gram in entry.vector:
+                keys = self._index.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._index[gram]
+
+    def clear(self):
+        self._entries.clear()
+        self._index.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "stale_hits": self.stale_hits,
+            "hit_rate": round((self.hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,97 @@
+"""
+Conditional-request and content-encoding helpers for JSON endpoints that
+handle caching themselves (currently the chat history API).
+"""
+import gzip
+import json
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:  # Optional: brotli is preferred over gzip when installed
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("HTTP_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("HTTP_BROTLI_QUALITY", "5"))
+
+
+def _accepted_codings(accept_encoding: str) -> Dict[str, float]:
+    """`"gzip, br;q=0.5, *;q=0"` -> {"gzip": 1.0, "br": 0.5, "*": 0.0}"""
+    codings = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[name.strip().lower()] = q
+    return codings
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The content coding to use for a response ("br", "gzip"), or None for identity."""
+    if not accept_encoding:
+        return None
+    codings = _accepted_codings(accept_encoding)
+    wildcard = codings.get("*", 0.0)
+    for name in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if codings.get(name, wildcard) > 0:
+            return name
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `etag` (RFC 9110 §13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def json_response(request: Request, content: Any, etag: Optional[str] = None,
+                  headers: Optional[Dict[str, str]] = None,
+                  min_size: int = COMPRESS_MIN_BYTES) -> Response:
+    """
+    Serializes `content` as JSON. Answers 304 when the request's If-None-Match
+    matches `etag`, and compresses bodies of at least `min_size` bytes with the
+    best coding the client accepts.
+    """
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    if etag:
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if len(body) >= min_size else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
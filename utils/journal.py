@@ -0,0 +1,108 @@
+import json
+import os
+from typing import Any, Dict, Iterator, List
+
+
+class SessionJournal:
+    """
+    Append-only log of session events.
+    Events are buffered in memory and written in batches (group commit) by `flush`,
+    so many mutations share a single write (and optional fsync).
+
+    Compaction `rotate`s the log aside while the snapshot is written and
+    `discard_rotated`s it afterwards; until then `replay` reads both files.
+    """
+    def __init__(self, path: str, fsync: bool = False):
+        self._path = path
+        self._rotated_path = f"{path}.old"
+        self._fsync = fsync
+        self._pending: List[str] = []
+        self._file = None
+        self.seq = 0            # Sequence number of the last appended event
+        self.entries = 0        # Events written since the last reset (compaction)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def append(self, event: Dict[str, Any]) -> int:
+        """Buffers an event and returns its sequence number."""
+        self.seq += 1
+        event["seq"] = self.seq
+        self._pending.append(json.dumps(event, separators=(",", ":")) + "\n")
+        return self.seq
+
+    def flush(self) -> int:
+        """Writes all buffered events in one batch. Returns the number of events written."""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, []
+        if self._file is None:
+            self._file = open(self._path, "a", encoding="utf-8")
+        self._file.write("".join(batch))
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+        self.entries += len(batch)
+        return len(batch)
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields events from disk in order: a log rotated by an unfinished
+        compaction first, then the current one.
+        A torn or corrupt line (e.g. a crash mid-write) ends the replay of its
+        file and is truncated away so that later appends start on a clean line.
+        """
+        yield from self._replay_file(self._rotated_path)
+        yield from self._replay_file(self._path)
+
+    def _replay_file(self, path: str) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return
+        good_offset = 0
+        torn = False
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("torn write")
+                    event = json.loads(line)
+                except ValueError:
+                    torn = True
+                    break
+                good_offset += len(line)
+                self.seq = max(self.seq, event.get("seq", 0))
+                self.entries += 1
+                yield event
+        if torn:
+            print(f"Truncating corrupt journal tail in {path} at byte {good_offset}")
+            with open(path, "r+b") as f:
+                f.truncate(good_offset)
+
+    def rotate(self):
+        """
+        Moves the written log aside before a snapshot is taken; later events
+        go to a fresh file. Call `flush` first. A log left rotated by a failed
+        compaction is kept, and the current one appended to it.
+        """
+        self.close()
+        if os.path.exists(self._path):
+            if os.path.exists(self._rotated_path):
+                with open(self._path, "rb") as src, open(self._rotated_path, "ab") as dst:
+                    dst.write(src.read())
+                os.remove(self._path)
+            else:
+                os.replace(self._path, self._rotated_path)
+        self.entries = 0
+
+    def discard_rotated(self):
+        """Deletes the rotated log once the snapshot that supersedes it is on disk."""
+        try:
+            os.remove(self._rotated_path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
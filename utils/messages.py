@@ -0,0 +1,127 @@
+"""
+Compact, append-only chat history storage.
+
+A history held as `List[Dict[str, str]]` pays for a dict and a role string per
+message. `MessageLog` keeps two columns instead: roles as one byte each in a
+`bytearray` (interned through a small code table) and contents as references
+in a list, so each message costs about nine bytes on top of its text.
+Messages read back as `{"role": ..., "content": ...}` dicts, built on access,
+and slices are zero-copy views.
+"""
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, Union
+
+# Role codes; roles outside this table are added on first use (up to 256)
+_ROLES: List[str] = ["user", "model", "assistant", "system"]
+_ROLE_CODES: Dict[str, int] = {role: code for code, role in enumerate(_ROLES)}
+
+
+def _role_code(role: str) -> int:
+    code = _ROLE_CODES.get(role)
+    if code is None:
+        if len(_ROLES) >= 256:
+            raise ValueError(f"Too many distinct message roles (adding {role!r})")
+        code = _ROLE_CODES[role] = len(_ROLES)
+        _ROLES.append(role)
+    return code
+
+
+class _Messages(Sequence):
+    """Read access shared by MessageLog and its views, over the log's window `[start, stop)`."""
+    __slots__ = ()
+
+    def _window(self):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        _, start, stop = self._window()
+        return stop - start
+
+    def __getitem__(self, index: Union[int, slice]):
+        log, start, stop = self._window()
+        if isinstance(index, slice):
+            first, last, step = index.indices(stop - start)
+            if step != 1:
+                return [log._message(start + i) for i in range(first, last, step)]
+            return MessageView(log, start + first, start + max(first, last))
+        if index < 0:
+            index += stop - start
+        if not 0 <= index < stop - start:
+            raise IndexError("message index out of range")
+        return log._message(start + index)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        log, start, stop = self._window()
+        roles = _ROLES
+        return ({"role": roles[code], "content": content}
+                for code, content in zip(log._roles[start:stop], log._contents[start:stop]))
+
+    def to_list(self) -> List[Dict[str, str]]:
+        return list(self)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (_Messages, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} messages)"
+
+
+class MessageView(_Messages):
+    """A read-only window onto a MessageLog. The log only grows, so a view stays valid."""
+    __slots__ = ("_log", "_start", "_stop")
+
+    def __init__(self, log: "MessageLog", start: int, stop: int):
+        self._log = log
+        self._start = start
+        self._stop = stop
+
+    def _window(self):
+        return self._log, self._start, self._stop
+
+
+class MessageLog(_Messages):
+    """
+    Append-only chat history. Reads like a list of `{"role", "content"}` dicts
+    (`len`, indexing, iteration, `history[-5:]`) and serializes to one with
+    `to_list()`.
+    """
+    __slots__ = ("_roles", "_contents", "summary")
+
+    def __init__(self, messages: Iterable[Dict[str, str]] = ()):
+        self._roles = bytearray()
+        self._contents: List[str] = []
+        # Rolling summary of older messages, kept by the prompt builders (agents/prompts.py); not persisted
+        self.summary = None
+        self.extend(messages)
+
+    @classmethod
+    def coerce(cls, value) -> "MessageLog":
+        """Accepts a MessageLog or a list of message dicts (snapshots, API payloads)."""
+        return value if isinstance(value, MessageLog) else cls(value or ())
+
+    def _window(self):
+        return self, 0, len(self._contents)
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+    def append(self, role: str, content: str):
+        self._roles.append(_role_code(role))
+        self._contents.append(content)
+
+    def extend(self, messages: Iterable[Dict[str, str]]):
+        """Appends message dicts in bulk; column-wise, so loading a snapshot costs two passes instead of an append per message."""
+        messages = messages if isinstance(messages, list) else list(messages)
+        codes = _ROLE_CODES
+        roles = [message["role"] for message in messages]
+        self._contents.extend([message["content"] for message in messages])
+        self._roles.extend([codes[role] if role in codes else _role_code(role) for role in roles])
+
+    def _message(self, index: int) -> Dict[str, str]:
+        return {"role": _ROLES[self._roles[index]], "content": self._contents[index]}
+
+    def tail(self, n: int) -> MessageView:
+        """The last `n` messages as a view, for prompt builders."""
+        return MessageView(self, max(0, len(self) - n), len(self))
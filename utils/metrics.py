@@ -0,0 +1,308 @@
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, from sub-millisecond persistence up to slow LLM turns
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        REGISTRY.register(self)
+
+    def labels(self, *values: str):
+        """
+        Returns the child for these label values, creating it on first use.
+        Bind children once (e.g. at import time) and keep the reference on hot paths.
+        """
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _series(self) -> Iterable[Tuple[Tuple[str, ...], object]]:
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in self._series():
+            lines.extend(child._render_samples(self.name, self.labelnames, values))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.value = 0
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        child = Counter.__new__(Counter)
+        child.value = 0
+        return child
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def _render_samples(self, name, labelnames, values):
+        return [f"{name}_total{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down. A gauge backed by `set_function` is evaluated
+    at scrape time, so it costs nothing on the request path.
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.value = 0
+        self._fn: Optional[Callable[[], float]] = None
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        child = Gauge.__new__(Gauge)
+        child.value = 0
+        child._fn = None
+        return child
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set_function(self, fn: Callable[[], float]):
+        self._fn = fn
+
+    def _render_samples(self, name, labelnames, values):
+        value = self.value
+        if self._fn is not None:
+            try:
+                value = self._fn()
+            except Exception:
+                value = math.nan
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(value) if value == value else 'NaN'}"]
+
+
+class Histogram(_Metric):
+    """
+    Cumulative histogram with fixed buckets. `observe` is a bisect over a tuple and
+    two in-place updates: no locks (all recording happens on the event loop thread)
+    and no per-observation containers.
+    """
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._reset()
+        super().__init__(name, documentation, labelnames)
+
+    def _reset(self):
+        # One slot per bucket plus +Inf; cumulated only when rendering
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self):
+        child = Histogram.__new__(Histogram)
+        child.buckets = self.buckets
+        child._reset()
+        return child
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def since(self, start: float):
+        """Observes the seconds elapsed since a `time.perf_counter()` reading."""
+        self.observe(time.perf_counter() - start)
+
+    def _render_samples(self, name, labelnames, values):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {self.count}")
+        return lines
+
+
+class Registry:
+    """
+    Holds every metric plus collectors: callables returning `{name: value}` dicts
+    that are exported as gauges at scrape time (used to fold in component stats).
+    """
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, float]]]] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def register_collector(self, prefix: str, collect: Callable[[], Dict[str, float]]):
+        self._collectors.append((prefix, collect))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, collect in self._collectors:
+            try:
+                stats = collect()
+            except Exception:
+                continue
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Application metrics ---------------------------------------------------
+
+STAGE_LATENCY = Histogram(
+    "legaladviser_stage_duration_seconds", "Latency of each pipeline stage.", ["stage"])
+ANALYZER_LATENCY = STAGE_LATENCY.labels("analyzer")
+RESEARCHER_LATENCY = STAGE_LATENCY.labels("researcher")
+RESEARCHER_FIRST_EVENT = STAGE_LATENCY.labels("researcher_first_event")
+SUMMARIZER_LATENCY = STAGE_LATENCY.labels("summarizer")
+SESSION_FLUSH_LATENCY = STAGE_LATENCY.labels("session_flush")
+SESSION_SNAPSHOT_LATENCY = STAGE_LATENCY.labels("session_snapshot")
+SESSION_LOAD_LATENCY = STAGE_LATENCY.labels("session_load")
+SEARCH_LATENCY = STAGE_LATENCY.labels("search")
+ADMISSION_WAIT_LATENCY = STAGE_LATENCY.labels("admission_wait")
+
+RESEARCHER_EVENTS = Histogram(
+    "legaladviser_researcher_adk_events", "ADK events per research run.", buckets=COUNT_BUCKETS)
+
+SEARCH_RESULTS = Histogram(
+    "legaladviser_search_results", "Merged results handed to research per multi-query search.", buckets=COUNT_BUCKETS)
+
+REQUEST_LATENCY = Histogram(
+    "legaladviser_request_duration_seconds", "End-to-end latency of chat requests.", ["endpoint"])
+CHAT_LATENCY = REQUEST_LATENCY.labels("chat")
+CHAT_STREAM_LATENCY = REQUEST_LATENCY.labels("chat_stream")
+
+HISTORY_RESPONSES = Counter(
+    "legaladviser_history_responses", "Chat history responses by outcome.", ["outcome"])
+HISTORY_IDENTITY = HISTORY_RESPONSES.labels("identity")
+HISTORY_COMPRESSED = HISTORY_RESPONSES.labels("compressed")
+HISTORY_NOT_MODIFIED = HISTORY_RESPONSES.labels("not_modified")
+
+INTENTS = Counter("legaladviser_intents", "Detected intents by source.", ["intent", "source"])
+JSON_FALLBACKS = Counter(
+    "legaladviser_json_parse_fallbacks", "Research outputs that were not valid JSON and were used as raw text.")
+JSON_REPAIRED = Counter(
+    "legaladviser_json_repaired", "Research outputs that were cut off or malformed and were used as far as they parsed.")
+ERRORS = Counter("legaladviser_errors", "Errors by stage.", ["stage"])
+ANALYZER_ERRORS = ERRORS.labels("analyzer")
+RESEARCHER_ERRORS = ERRORS.labels("researcher")
+SUMMARIZER_ERRORS = ERRORS.labels("summarizer")
+SEARCH_ERRORS = ERRORS.labels("search")
+REQUEST_ERRORS = ERRORS.labels("request")
+DEADLINE_ERRORS = ERRORS.labels("deadline")
+
+ADMISSION_QUEUE_DEPTH = Gauge("legaladviser_admission_queue_depth", "Chat requests waiting for an admission slot.")
+ADMISSION_ACTIVE = Gauge("legaladviser_admission_active", "Chat requests holding an admission slot.")
+ADMISSION_REJECTED = Counter(
+    "legaladviser_admission_rejected", "Chat requests shed with 429/503 by reason.", ["reason"])
+ADMISSION_QUEUE_FULL = ADMISSION_REJECTED.labels("queue_full")
+ADMISSION_DEADLINE = ADMISSION_REJECTED.labels("deadline")
+ADMISSION_SESSION_BUSY = ADMISSION_REJECTED.labels("session_busy")
+
+LLM_QUEUE_DEPTH = Gauge("legaladviser_llm_queue_depth", "Model calls waiting for a backend slot.", ["backend"])
+LLM_ACTIVE = Gauge("legaladviser_llm_active", "Model calls in flight per backend.", ["backend"])
+LLM_SLOT_WAIT = Histogram(
+    "legaladviser_llm_slot_wait_seconds", "Time model calls waited for a backend slot.", ["backend"])
+
+LLM_HEDGES = Counter("legaladviser_llm_hedges", "Second attempts started by hedged model calls.", ["backend"])
+LLM_SHORT_CIRCUITED = Counter(
+    "legaladviser_llm_short_circuited", "Model calls failed fast by an open circuit breaker.", ["backend"])
+LLM_CIRCUIT_STATE = Gauge(
+    "legaladviser_llm_circuit_state", "Circuit breaker state per backend (0 closed, 1 half-open, 2 open).", ["backend"])
+DEGRADED_RESPONSES = Counter(
+    "legaladviser_degraded_responses", "Answers served from a fallback after research failed.", ["source"])
+DEGRADED_STALE_CACHE = DEGRADED_RESPONSES.labels("stale_cache")
+DEGRADED_STATUTES = DEGRADED_RESPONSES.labels("statutes")
+
+IN_FLIGHT = Gauge("legaladviser_requests_in_flight", "Chat requests currently being processed.")
+LIVE_SESSIONS = Gauge("legaladviser_live_sessions", "User sessions held in memory.")
+PROMPT_TOKENS = Histogram(
+    "legaladviser_prompt_tokens", "Estimated size of each model prompt in tokens (chars / 4).", ["kind"],
+    buckets=TOKEN_BUCKETS)
+PROMPT_HISTORY_MESSAGES = Counter(
+    "legaladviser_prompt_history_messages", "History messages condensed to fit prompt budgets.", ["action"])
+PROMPT_MESSAGES_SUMMARIZED = PROMPT_HISTORY_MESSAGES.labels("summarized")
+PROMPT_MESSAGES_CLIPPED = PROMPT_HISTORY_MESSAGES.labels("clipped")
+PROMPT_MESSAGES_DROPPED = PROMPT_HISTORY_MESSAGES.labels("dropped")
+
+STARTUP_SECONDS = Gauge(
+    "legaladviser_startup_seconds", "Time taken by each startup step (sessions, agents).", ["step"])
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+_INTENT_COUNTERS = {
+    source: {intent: INTENTS.labels(intent, source) for intent in ("info", "legal_advice", "clarify")}
+    for source in ("local", "llm")
+}
+
+
+def count_intent(intent: str, source: str):
+    """Increments the intent counter through pre-bound children (label lookups only for unexpected values)."""
+    child = _INTENT_COUNTERS.get(source, {}).get(intent)
+    if child is None:
+        child = INTENTS.labels(intent, source)
+    child.inc()
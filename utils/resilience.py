@@ -0,0 +1,242 @@
+"""
+Deadlines, hedged calls and a circuit breaker for calls to slow or failing upstreams.
+
+The deadline lives in a ContextVar, so a deadline set when a request starts
+(`deadline_scope`) reaches every model call made on its behalf, through the
+orchestrator and into tasks spawned along the way, without being passed around.
+
+    with deadline_scope(30):
+        ...
+        text = await within_deadline(backend_call(), cap=LLM_CALL_TIMEOUT)
+"""
+import asyncio
+import contextlib
+import contextvars
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+T = TypeVar("T")
+
+_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request's deadline (or a call's own timeout) passed before the call finished."""
+
+
+class CallTimeout(DeadlineExceeded):
+    """The call's own timeout (`cap`) passed before the request's deadline did."""
+
+
+class CircuitOpen(RuntimeError):
+    """The circuit breaker is failing calls fast while the upstream recovers."""
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Sets a deadline `seconds` from now for the enclosed code; an earlier enclosing deadline wins."""
+    if seconds is None or seconds <= 0:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _DEADLINE.get()
+    token = _DEADLINE.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one."""
+    deadline = _DEADLINE.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def timeout_for(cap: Optional[float] = None) -> Optional[float]:
+    """The timeout for a call: the time left on the deadline, capped at `cap`."""
+    left = remaining()
+    if left is None:
+        return cap
+    return left if cap is None else min(left, cap)
+
+
+async def within_deadline(awaitable: Awaitable[T], cap: Optional[float] = None) -> T:
+    """
+    Awaits `awaitable`, raising DeadlineExceeded once the deadline passes, or
+    CallTimeout once `cap` seconds pass first.
+    """
+    left = remaining()
+    timeout = timeout_for(cap)
+    if timeout is None:
+        return await awaitable
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("deadline already passed")
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        error = CallTimeout if cap is not None and (left is None or cap <= left) else DeadlineExceeded
+        raise error(f"timed out after {timeout:.2f}s") from None
+
+
+async def hedged(attempt: Callable[[], Awaitable[T]], delay: float,
+                 on_hedge: Optional[Callable[[], None]] = None) -> T:
+    """
+    Runs `attempt()`. If it has not finished after `delay` seconds, starts a
+    second `attempt()` and returns whichever succeeds first; the other is
+    cancelled. Only for idempotent calls. Fails only once both attempts failed.
+    """
+    attempts = [asyncio.ensure_future(attempt())]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if done:
+            return attempts[0].result()
+        if on_hedge is not None:
+            on_hedge()
+        attempts.append(asyncio.ensure_future(attempt()))
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # The losing attempt, or both when the caller is cancelled
+        for task in attempts:
+            if not task.done():
+                task.cancel()
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware giving every request under `prefixes` a deadline of
+    `seconds`, or less when the client sends `X-Request-Timeout-Ms`. Pure
+    ASGI, so streamed response bodies run under the deadline too.
+    """
+    def __init__(self, app, seconds: float, prefixes: tuple = ("/chat",)):
+        self.app = app
+        self.seconds = seconds
+        self.prefixes = prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+        seconds = self.seconds
+        for name, value in scope["headers"]:
+            if name == b"x-request-timeout-ms":
+                try:
+                    requested = float(value) / 1000
+                except ValueError:
+                    break
+                if requested > 0:
+                    seconds = min(seconds, requested) if seconds > 0 else requested
+                break
+        with deadline_scope(seconds):
+            await self.app(scope, receive, send)
+
+
+class LatencyTracker:
+    """Recent latencies of one kind of call; `quantile` backs the hedging delay."""
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._sorted: Optional[list] = None
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The q-quantile of the window, or None until `min_samples` were observed."""
+        if len(self._samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class CircuitBreaker:
+    """
+    Closed -> open when at least `min_calls` of the calls in the last `window`
+    seconds ended and `error_rate` of them failed. While open, `check` raises
+    CircuitOpen at once. After `cooldown` seconds one probe call is let through
+    (half-open): its success closes the circuit, its failure opens it again.
+    A probe that ends without an outcome (cancelled, or out of request time)
+    must be given back with `release_probe`, so the next call can probe.
+    """
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, error_rate: float = 0.5, min_calls: int = 20, window: float = 30.0, cooldown: float = 10.0):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened = 0
+        self.short_circuited = 0
+        self._outcomes: Deque[tuple] = deque()   # (monotonic time, failed)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def check(self) -> bool:
+        """Raises CircuitOpen unless a call may go ahead now; True when that call is the half-open probe."""
+        if self.state == self.CLOSED:
+            return False
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.short_circuited += 1
+        retry_after = self.retry_after()
+        raise CircuitOpen(f"circuit open after {self.error_rate:.0%} errors, retrying in {retry_after:.0f}s", retry_after)
+
+    def release_probe(self):
+        """Ends a probe that did not `record` an outcome; no-op once it did."""
+        if self.state == self.HALF_OPEN:
+            self._probing = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at)) if self.state != self.CLOSED else 0.0
+
+    def record(self, success: bool):
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            self._probing = False
+            if success:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                self._failures = 0
+            else:
+                self._open(now)
+            return
+        if self.state == self.OPEN:
+            return  # Calls admitted before the circuit opened
+
+        self._outcomes.append((now, not success))
+        self._failures += not success
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._failures -= self._outcomes.popleft()[1]
+        if len(self._outcomes) >= self.min_calls and self._failures >= self.error_rate * len(self._outcomes):
+            self._open(now)
+
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self._opened_at = now
+        self.opened += 1
+
+    def stats(self) -> dict:
+        return {"state": self.state, "opened": self.opened, "short_circuited": self.short_circuited,
+                "window_calls": len(self._outcomes), "window_failures": self._failures}
@@ -1,40 +1,92 @@
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
 import uuid
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_serializer, field_validator
 from datetime import datetime
+import heapq
 import json
 import os
+import time
 from pathlib import Path
+from utils import metrics
+from utils.journal import SessionJournal
+from utils.messages import MessageLog
 
 class SessionData(BaseModel):
     session_id: str
     title: str = "New Chat"
-    history: List[Dict[str, str]] = []
+    # Compact column store; reads (and serializes) as a list of {"role", "content"} dicts
+    history: MessageLog = Field(default_factory=MessageLog)
+    # Bumped on every history change; clients revalidate cached history pages against it
+    version: int = 0
     metadata: Dict[str, str] = {}
     created_at: datetime = Field(default_factory=datetime.now)
     last_active: datetime = Field(default_factory=datetime.now)
     
     class Config:
+        arbitrary_types_allowed = True
         json_encoders = {
             datetime: lambda v: v.isoformat()
         }
 
+    @field_validator("history", mode="before")
+    @classmethod
+    def _coerce_history(cls, value):
+        return MessageLog.coerce(value)
+
+    @field_serializer("history")
+    def _serialize_history(self, history: MessageLog) -> List[Dict[str, str]]:
+        return history.to_list()
+
 class SessionManager:
     """
     Manages user sessions and chat history.
-    Now persists to disk to survive server restarts.
+    Persists to disk to survive server restarts: every mutation is appended to a
+    journal that is group-committed by `flush`, and the journal is periodically
+    compacted into a full snapshot (`sessions.json`) by `compact`, which writes
+    it on a worker thread.
+
+    With `load=False` nothing is read from disk until `load()` is called (the
+    server does that on a worker thread after startup); mutations raise
+    `RuntimeError` before then.
     """
-    def __init__(self, storage_file: str = "sessions.json"):
+    def __init__(self, storage_file: str = "sessions.json", journal_file: Optional[str] = None,
+                 compact_after: Optional[int] = None, max_pending: int = 512, load: bool = True):
         self._sessions: Dict[str, SessionData] = {}
         self._storage_file = storage_file
+        self._journal = SessionJournal(
+            journal_file or f"{storage_file}.journal",
+            fsync=os.getenv("SESSION_JOURNAL_FSYNC", "false").lower() == "true"
+        )
+        self._compact_after = compact_after or int(os.getenv("SESSION_JOURNAL_COMPACT_EVENTS", "10000"))
+        self._max_pending = max_pending
+        self._expiry_listeners: List[Callable[[str], None]] = []
+        # Min-heap of (last_active timestamp, session_id). Entries are never updated in
+        # place: touching a session pushes a new entry, and stale ones are skipped on pop.
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self.loaded = False
+        self._compacting = False
+        if load:
+            self.load()
+
+    def load(self):
+        """Reads the snapshot and journal from disk (blocking). Runs once; later calls do nothing."""
+        if self.loaded:
+            return
+        start = time.perf_counter()
         self._load_sessions()
+        self._rebuild_expiry_heap()
+        self.loaded = True
+        metrics.SESSION_LOAD_LATENCY.since(start)
 
     def _load_sessions(self):
-        """Load sessions from disk if file exists."""
+        """Load the snapshot from disk if it exists, then replay the journal on top of it."""
+        snapshot_seq = 0
         if os.path.exists(self._storage_file):
             try:
                 with open(self._storage_file, 'r') as f:
                     data = json.load(f)
+                    snapshot_seq = data.pop("__journal_seq__", 0)
                     for session_id, session_dict in data.items():
                         # Convert ISO format strings back to datetime
                         session_dict['created_at'] = datetime.fromisoformat(session_dict['created_at'])
@@ -45,63 +97,240 @@ class SessionManager:
                 print(f"Error loading sessions: {e}")
                 self._sessions = {}
 
+        replayed = 0
+        try:
+            for event in self._journal.replay():
+                # Events already folded into the snapshot are skipped, which makes
+                # a crash between snapshot write and journal truncation harmless.
+                if event.get("seq", 0) <= snapshot_seq:
+                    continue
+                self._apply_event(event)
+                replayed += 1
+        except Exception as e:
+            print(f"Error replaying session journal: {e}")
+        self._journal.seq = max(self._journal.seq, snapshot_seq)
+        if replayed:
+            print(f"Replayed {replayed} journal events")
+
+    def _apply_event(self, event: dict):
+        """Applies a single journal event to the in-memory store."""
+        op = event["op"]
+        sid = event["sid"]
+        if op == "create":
+            ts = datetime.fromisoformat(event["ts"])
+            self._sessions[sid] = SessionData(session_id=sid, created_at=ts, last_active=ts)
+        elif op == "msg":
+            session = self._sessions.get(sid)
+            if session is None:
+                session = self._sessions[sid] = SessionData(session_id=sid)
+            session.history.append(event["role"], event["content"])
+            session.version += 1
+            session.last_active = datetime.fromisoformat(event["ts"])
+        elif op == "title":
+            if sid in self._sessions:
+                self._sessions[sid].title = event["title"]
+        elif op == "delete":
+            self._sessions.pop(sid, None)
+
+    def _rebuild_expiry_heap(self):
+        self._expiry_heap = [(session.last_active.timestamp(), sid) for sid, session in self._sessions.items()]
+        heapq.heapify(self._expiry_heap)
+
+    def _touch(self, session: SessionData):
+        """Schedules the session for expiry based on its current last_active."""
+        heapq.heappush(self._expiry_heap, (session.last_active.timestamp(), session.session_id))
+        # Bound the stale entries left behind by frequently touched sessions
+        if len(self._expiry_heap) > 2 * len(self._sessions) + 1024:
+            self._rebuild_expiry_heap()
+
+    def _require_loaded(self):
+        # Journalling before the snapshot is read would put these events ahead of the ones on disk
+        if not self.loaded:
+            raise RuntimeError("Sessions are not loaded yet")
+
+    def _record(self, event: dict):
+        """Appends an event to the journal; flushes early if the batch grows too large."""
+        self._journal.append(event)
+        if self._journal.pending >= self._max_pending:
+            self.flush()
+
+    def flush(self) -> int:
+        """Group-commits buffered journal events to disk."""
+        if not self.loaded:
+            return 0
+        try:
+            start = time.perf_counter()
+            written = self._journal.flush()
+            if written:
+                metrics.SESSION_FLUSH_LATENCY.since(start)
+            return written
+        except Exception as e:
+            print(f"Error flushing session journal: {e}")
+            return 0
+
+    @property
+    def compaction_due(self) -> bool:
+        """True once the journal holds `compact_after` events and no compaction is running."""
+        return self.loaded and not self._compacting and self._journal.entries >= self._compact_after
+
+    async def compact(self):
+        """
+        Compacts the journal into a snapshot. The sessions are captured on the
+        event loop; serializing and writing them runs on a worker thread, so
+        requests keep being served (and journalled) meanwhile.
+        """
+        if not self.loaded or self._compacting:
+            return
+        self._compacting = True
+        try:
+            start = time.perf_counter()
+            snapshot = self._capture_snapshot()
+            await asyncio.to_thread(self._write_snapshot, snapshot)
+            self._journal.discard_rotated()
+            metrics.SESSION_SNAPSHOT_LATENCY.since(start)
+        except Exception as e:
+            print(f"Error saving sessions: {e}")
+        finally:
+            self._compacting = False
+
+    def close(self):
+        """Flushes pending events and releases the journal file."""
+        self.flush()
+        self._journal.close()
+
     def _save_sessions(self):
-        """Save sessions to disk."""
+        """Writes a full snapshot to disk in the calling thread (used outside the event loop)."""
         try:
-            data = {}
-            for session_id, session in self._sessions.items():
-                data[session_id] = session.model_dump(mode='json')
-            with open(self._storage_file, 'w') as f:
-                json.dump(data, f, indent=2)
+            start = time.perf_counter()
+            self._write_snapshot(self._capture_snapshot())
+            self._journal.discard_rotated()
+            metrics.SESSION_SNAPSHOT_LATENCY.since(start)
         except Exception as e:
             print(f"Error saving sessions: {e}")
 
+    def _capture_snapshot(self) -> tuple:
+        """
+        Records the store as of the last journalled event and rotates the journal,
+        so events appended while the snapshot is written land in a fresh file.
+        Histories only grow, so each is captured as the live log plus its length.
+        """
+        self._journal.flush()
+        seq = self._journal.seq
+        self._journal.rotate()
+        sessions = [
+            (session, session.title, session.version, dict(session.metadata),
+             session.created_at, session.last_active, len(session.history))
+            for session in self._sessions.values()
+        ]
+        return seq, sessions
+
+    def _write_snapshot(self, snapshot: tuple):
+        seq, sessions = snapshot
+        data = {"__journal_seq__": seq}
+        for session, title, version, metadata, created_at, last_active, length in sessions:
+            data[session.session_id] = {
+                "session_id": session.session_id,
+                "title": title,
+                "history": session.history[:length].to_list(),
+                "version": version,
+                "metadata": metadata,
+                "created_at": created_at.isoformat(),
+                "last_active": last_active.isoformat(),
+            }
+        tmp_file = f"{self._storage_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_file, self._storage_file)
+
     def create_session(self) -> str:
         """Creates a new session and returns the session_id."""
+        self._require_loaded()
         session_id = str(uuid.uuid4())
-        self._sessions[session_id] = SessionData(session_id=session_id)
-        self._save_sessions()
+        session = self._sessions[session_id] = SessionData(session_id=session_id)
+        self._touch(session)
+        self._record({"op": "create", "sid": session_id, "ts": session.created_at.isoformat()})
         return session_id
 
+    def __len__(self) -> int:
+        return len(self._sessions)
+
     def get_session(self, session_id: str) -> Optional[SessionData]:
         """Retrieves a session by ID."""
         return self._sessions.get(session_id)
 
     def add_message(self, session_id: str, role: str, content: str):
         """Adds a message to the session history and updates last_active."""
+        self._require_loaded()
         if session_id not in self._sessions:
             # Auto-create if missing (or could raise error depending on policy)
-            self._sessions[session_id] = SessionData(session_id=session_id)
+            created = self._sessions[session_id] = SessionData(session_id=session_id)
+            self._record({"op": "create", "sid": session_id, "ts": created.created_at.isoformat()})
         
         session = self._sessions[session_id]
-        session.history.append({"role": role, "content": content})
+        session.history.append(role, content)
+        session.version += 1
         session.last_active = datetime.now()
-        self._save_sessions()
+        self._touch(session)
+        self._record({"op": "msg", "sid": session_id, "role": role, "content": content,
+                      "ts": session.last_active.isoformat()})
 
-    def get_history(self, session_id: str) -> List[Dict[str, str]]:
-        """Returns the chat history for a session."""
+    def get_history(self, session_id: str) -> MessageLog:
+        """Returns the chat history for a session (a live, read-only MessageLog)."""
         session = self.get_session(session_id)
-        return session.history if session else []
+        return session.history if session else MessageLog()
+
+    def get_history_page(self, session_id: str, before: Optional[int] = None,
+                         limit: Optional[int] = None) -> Tuple[List[Dict[str, str]], int, Optional[int]]:
+        """
+        Returns `(messages, total, next_before)` for the `limit` messages preceding
+        index `before` (default: the newest), oldest first. `next_before` is the
+        cursor for the next older page, or None once the start is reached.
+        """
+        history = self.get_history(session_id)
+        total = len(history)
+        end = total if before is None else max(0, min(before, total))
+        start = 0 if limit is None else max(0, end - limit)
+        return history[start:end].to_list(), total, (start if start > 0 else None)
 
     def update_title(self, session_id: str, title: str):
         """Updates the title of a session."""
+        self._require_loaded()
         if session_id in self._sessions:
             self._sessions[session_id].title = title
-            self._save_sessions()
+            self._record({"op": "title", "sid": session_id, "title": title})
+
+    def add_expiry_listener(self, callback: Callable[[str], None]):
+        """Registers a callback invoked with the session_id of every expired session."""
+        self._expiry_listeners.append(callback)
 
-    def cleanup_sessions(self, max_age_hours: int = 24):
-        """Removes sessions inactive for more than max_age_hours."""
-        now = datetime.now()
+    def cleanup_sessions(self, max_age_hours: float = 24) -> List[str]:
+        """
+        Removes sessions inactive for more than max_age_hours and returns their IDs.
+        Pops only the expired end of the expiry heap, so a sweep costs
+        O(expired * log n) rather than a scan of every session.
+        """
+        self._require_loaded()
+        cutoff = datetime.now().timestamp() - max_age_hours * 3600
         expired_sessions = []
-        for sid, session in self._sessions.items():
-            age = now - session.last_active
-            if age.total_seconds() > (max_age_hours * 3600):
-                expired_sessions.append(sid)
+        heap = self._expiry_heap
+        while heap and heap[0][0] < cutoff:
+            ts, sid = heapq.heappop(heap)
+            session = self._sessions.get(sid)
+            # Skip entries invalidated by a later touch or an earlier deletion
+            if session is None or session.last_active.timestamp() != ts:
+                continue
+            del self._sessions[sid]
+            expired_sessions.append(sid)
         
         for sid in expired_sessions:
-            del self._sessions[sid]
+            self._record({"op": "delete", "sid": sid})
+            for callback in self._expiry_listeners:
+                try:
+                    callback(sid)
+                except Exception as e:
+                    print(f"Error in session expiry listener: {e}")
         
         if expired_sessions:
             print(f"Cleaned up {len(expired_sessions)} expired sessions.")
-            self._save_sessions()
-
+            self.flush()
+        return expired_sessions
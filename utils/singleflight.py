@@ -0,0 +1,59 @@
+import asyncio
+import contextvars
+import logging
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one in-flight execution.
+
+    The shared work runs in its own task and every caller awaits it through
+    `asyncio.shield`, so a caller being cancelled (e.g. a client disconnecting)
+    never cancels the work the other callers are waiting on.
+
+    The task copies the first caller's context (deadline, span) unless
+    `context` is given; pass a fresh `contextvars.Context()` when that caller's
+    state must not leak into the work shared with the others.
+    """
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]], context: Optional[contextvars.Context] = None) -> T:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.create_task(fn()) if context is None else context.run(asyncio.create_task, fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            self.collapsed += 1
+            logger.info(f"Joined in-flight request ({self.collapsed} collapsed so far)")
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": self.in_flight,
+        }
@@ -0,0 +1,87 @@
+"""
+Startup steps that run after the server starts listening instead of before.
+
+Loading sessions and building the agents (which imports ADK and the Google
+SDKs) take seconds. Run as `Readiness` steps on worker threads, they leave the
+event loop free to serve pages and health checks in the meantime. Endpoints
+that depend on a step wait for it:
+
+    readiness = Readiness()
+    readiness.add("sessions", session_manager.load)
+    ...
+    await readiness.wait("sessions")    # raises Overloaded(503) if it takes too long
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from utils import metrics
+from utils.admission import Overloaded
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """
+    Named, blocking startup steps, each run once on a worker thread. `start`
+    is idempotent and is also triggered by the first `wait`, so the steps run
+    even when the ASGI lifespan events are not (in-process test clients).
+    """
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._steps: Dict[str, Callable[[], object]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.durations: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+
+    def add(self, name: str, step: Callable[[], object]):
+        self._steps[name] = step
+
+    def start(self):
+        for name, step in self._steps.items():
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.get_running_loop().create_task(self._run(name, step))
+
+    async def _run(self, name: str, step: Callable[[], object]):
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(step)
+        except Exception as e:
+            # A failed step is reported by /readyz; requests then hit the same error themselves
+            logger.error(f"Startup step {name} failed: {e}", exc_info=True)
+            self.errors[name] = str(e)
+        finally:
+            self.durations[name] = time.perf_counter() - start
+            metrics.STARTUP_SECONDS.labels(name).set(self.durations[name])
+            logger.info(f"Startup step {name} finished in {self.durations[name]:.2f}s")
+
+    async def wait(self, name: str):
+        """Waits for step `name` (no-op for unknown steps). Raises Overloaded(503) after `timeout` seconds."""
+        if name not in self._steps:
+            return
+        self.start()
+        task = self._tasks[name]
+        if task.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded(503, f"server starting up ({name})", self.timeout or 1.0) from None
+
+    def status(self) -> Dict[str, str]:
+        """`{step: "pending" | "running" | "ready" | "failed"}`"""
+        status = {}
+        for name in self._steps:
+            task = self._tasks.get(name)
+            if task is None:
+                status[name] = "pending"
+            elif not task.done():
+                status[name] = "running"
+            else:
+                status[name] = "failed" if name in self.errors else "ready"
+        return status
+
+    @property
+    def ready(self) -> bool:
+        return all(state == "ready" for state in self.status().values())
@@ -1,8 +1,15 @@
 import logging
 import json
+import os
+import random
 import time
-from typing import Any, Dict
-from functools import wraps
+import inspect
+import reprlib
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from functools import lru_cache, wraps
 
 # Configure basic logging
 logging.basicConfig(
@@ -13,12 +20,204 @@ logging.basicConfig(
 
 logger = logging.getLogger("LegalAdviser-Trace")
 
+SERVICE_NAME = "legaladviser-ai"
+MAX_EVENTS_PER_SPAN = 128
+
+
+class _PayloadRepr(reprlib.Repr):
+    """`repr` capped at every level, so a large payload is never stringified in full first."""
+    def __init__(self, limit: int):
+        super().__init__()
+        self.maxstring = self.maxother = limit
+        self.maxlist = self.maxtuple = self.maxset = self.maxdict = 10
+
+    def repr_instance(self, x: Any, level: int) -> str:
+        # Pydantic models (the agents' results) are walked field by field under the same caps
+        fields = getattr(type(x), "model_fields", None)
+        if fields is None:
+            return super().repr_instance(x, level)
+        if level <= 0:
+            return f"{type(x).__name__}(...)"
+        parts, size = [], 0
+        for name in fields:
+            part = f"{name}={self.repr1(getattr(x, name, None), level - 1)}"
+            parts.append(part)
+            size += len(part)
+            if size >= self.maxother:
+                parts.append("...")
+                break
+        return f"{type(x).__name__}({', '.join(parts)})"
+
+
+@lru_cache(maxsize=4)
+def _payload_repr(limit: int) -> _PayloadRepr:
+    return _PayloadRepr(limit)
+
+
+def _truncate(value: Any, limit: int) -> str:
+    if not isinstance(value, str):
+        text = _payload_repr(limit).repr(value)
+        return text[:limit] + "..." if len(text) > limit else text
+    text = value
+    if len(text) > limit:
+        return text[:limit] + f"...[{len(text) - limit} more]"
+    return text
+
+
+class Span:
+    """
+    A timed operation within a trace. Spans nest through a context variable, so
+    children created anywhere below (including in tasks spawned from the same
+    context) attach to the right parent without being passed around.
+    """
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "events", "status", "status_message")
+
+    sampled = True
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: str = "internal",
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.events: List[tuple] = []
+        self.status = "unset"
+        self.status_message = ""
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        if not isinstance(value, (str, int, float, bool)):
+            value = _truncate(value, Tracer.payload_limit)
+        elif isinstance(value, str) and len(value) > Tracer.payload_limit:
+            value = _truncate(value, Tracer.payload_limit)
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        if len(self.events) < MAX_EVENTS_PER_SPAN:
+            self.events.append((time.time_ns(), name, attributes))
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.status_message = _truncate(str(error), Tracer.payload_limit)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "events": [{"time_ns": t, "name": n, "attributes": a} for t, n, a in self.events],
+            "status": self.status,
+            "status_message": self.status_message,
+        }
+
+
+class _NonRecordingSpan:
+    """Stand-in for spans of unsampled traces: every operation is a no-op."""
+    sampled = False
+    trace_id = span_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def add_event(self, name: str, **attributes):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+
+_NON_RECORDING = _NonRecordingSpan()
+_current_span: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """All spans sharing one root, completed when the root span ends."""
+    __slots__ = ("trace_id", "spans", "root")
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name if self.root else "",
+            "duration_ms": round(self.root.duration_ms, 3) if self.root else 0,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON (`ExportTraceServiceRequest`) encoding of the trace."""
+        kinds = {"internal": 1, "server": 2, "client": 3}
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "utils.tracing"},
+                "spans": [{
+                    "traceId": self.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": kinds.get(span.kind, 1),
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+                    "events": [{
+                        "timeUnixNano": str(t),
+                        "name": n,
+                        "attributes": [_otlp_attribute(k, v) for k, v in a.items()],
+                    } for t, n, a in span.events],
+                    "status": {"code": 2 if span.status == "error" else 0, "message": span.status_message},
+                } for span in self.spans],
+            }],
+        }]}
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
 class Tracer:
     """
     Simple tracing utility to log agent activities and tool calls.
     Mimics the observability patterns from Day 4 of the Kaggle Agents course.
+
+    Traces are head-sampled at the root span (`TRACE_SAMPLE_RATE`); unsampled
+    traces cost one random draw and no allocations. Completed traces are kept in
+    an in-memory ring buffer (`TRACE_BUFFER_SIZE`) and, if `TRACE_EXPORT_FILE`
+    is set, appended to it as OTLP/JSON lines. With `TRACE_LOG_SPANS=true` every
+    sampled span is also logged as a JSON line.
     """
-    
+    sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+    payload_limit = int(os.getenv("TRACE_PAYLOAD_LIMIT", "256"))
+    export_file = os.getenv("TRACE_EXPORT_FILE") or None
+    recent: "deque[Trace]" = deque(maxlen=int(os.getenv("TRACE_BUFFER_SIZE", "200")))
+    log_spans = os.getenv("TRACE_LOG_SPANS", "false").lower() == "true"
+
     @staticmethod
     def trace_agent(agent_name: str, action: str, inputs: Dict[str, Any] = None, outputs: Any = None, duration: float = 0.0):
         """
@@ -41,27 +240,173 @@ class Tracer:
         }
         logger.info(json.dumps(event, default=json_serializer))
 
+    @classmethod
+    def recent_traces(cls, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent completed traces, newest first."""
+        traces = list(cls.recent)[-limit:]
+        return [trace.to_dict() for trace in reversed(traces)]
+
+    @classmethod
+    def _finish_trace(cls, trace: Trace):
+        cls.recent.append(trace)
+        if cls.export_file:
+            try:
+                with open(cls.export_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace.to_otlp(), separators=(",", ":")) + "\n")
+            except Exception as e:
+                logger.warning(f"Trace export failed: {e}")
+
+
+def current_span():
+    """The active span, or a no-op span when there is none (or the trace is unsampled)."""
+    return _current_span.get() or _NON_RECORDING
+
+
+def _open_span(name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+    parent = _current_span.get()
+    if parent is None:
+        if Tracer.sample_rate < 1.0 and random.random() >= Tracer.sample_rate:
+            return _NON_RECORDING
+        trace = Trace()
+        span = Span(trace, name, None, kind, attributes)
+        trace.root = span
+        return span
+    if not parent.sampled:
+        return _NON_RECORDING
+    return Span(parent.trace, name, parent.span_id, kind, attributes)
+
+
+def _close_span(span):
+    if span.sampled:
+        span.end_ns = time.time_ns()
+        span.trace.spans.append(span)
+        if span is span.trace.root:
+            Tracer._finish_trace(span.trace)
+
+
+@contextmanager
+def start_span(name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+    """
+    Opens a span as a child of the current one, or a new (sampled or not) trace
+    when there is no current span. Works in both sync and async code.
+    """
+    span = _open_span(name, kind, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        _close_span(span)
+
+
 def trace_span(agent_name: str, action_name: str):
     """
     Decorator to trace a function execution as a span.
+    Works on regular functions, `async def` functions and async generators.
+    Arguments and results are only stringified for sampled traces, and are
+    capped at `TRACE_PAYLOAD_LIMIT` characters while being stringified.
     """
+    span_name = f"{agent_name}.{action_name}"
+
+    def record(span, args, kwargs, outputs, start_time):
+        if not span.sampled:
+            return
+        limit = Tracer.payload_limit
+        inputs = {
+            "args": [_truncate(a, limit) for a in args[1:]], # Skip self
+            "kwargs": {k: _truncate(v, limit) for k, v in kwargs.items()}
+        }
+        # Already capped: stored as is rather than truncated again by set_attribute
+        span.attributes["inputs"] = json.dumps(inputs)
+        outputs = None if outputs is None else _truncate(outputs, limit)
+        if outputs is not None:
+            span.attributes["outputs"] = outputs
+        if Tracer.log_spans:
+            Tracer.trace_agent(agent_name, action_name, inputs, outputs, time.time() - start_time)
+
     def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                # The span is made current only while the generator body runs, so it
+                # never leaks into the consumer's context between items
+                start_time = time.time()
+                span = _open_span(span_name)
+                agen = func(*args, **kwargs)
+                try:
+                    while True:
+                        token = _current_span.set(span)
+                        try:
+                            item = await agen.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            _current_span.reset(token)
+                        yield item
+                    record(span, args, kwargs, None, start_time)
+                except Exception as e:
+                    span.record_error(e)
+                    record(span, args, kwargs, {"error": str(e)}, start_time)
+                    raise
+                finally:
+                    await agen.aclose()
+                    _close_span(span)
+            return async_gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start_time = time.time()
+                with start_span(span_name) as span:
+                    try:
+                        result = await func(*args, **kwargs)
+                        record(span, args, kwargs, result, start_time)
+                        return result
+                    except Exception as e:
+                        record(span, args, kwargs, {"error": str(e)}, start_time)
+                        raise
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             start_time = time.time()
-            inputs = {
-                "args": [str(a) for a in args[1:]], # Skip self
-                "kwargs": kwargs
-            }
-            
-            try:
-                result = func(*args, **kwargs)
-                duration = time.time() - start_time
-                Tracer.trace_agent(agent_name, action_name, inputs, result, duration)
-                return result
-            except Exception as e:
-                duration = time.time() - start_time
-                Tracer.trace_agent(agent_name, action_name, inputs, {"error": str(e)}, duration)
-                raise
+            with start_span(span_name) as span:
+                try:
+                    result = func(*args, **kwargs)
+                    record(span, args, kwargs, result, start_time)
+                    return result
+                except Exception as e:
+                    record(span, args, kwargs, {"error": str(e)}, start_time)
+                    raise
         return wrapper
     return decorator
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of every HTTP request. Being pure ASGI
+    (rather than `BaseHTTPMiddleware`), the span also covers streamed response bodies.
+    """
+    def __init__(self, app, exclude_prefixes: tuple = ("/static",)):
+        self.app = app
+        self.exclude_prefixes = exclude_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        with start_span(f"{scope['method']} {scope['path']}", kind="server") as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+            route = scope.get("route")
+            if span.sampled and route is not None:
+                # Name by route template so /chat/{session_id}/history traces group together
+                span.name = f"{scope['method']} {route.path}"